@@ -1,16 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, abort
 from models import db, User, Client, Vendor, Contact, Tag, Product, Transaction, BillItem, Payment, Bill, StockMovement  # Import models here
 from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from decimal import Decimal
-from routes.inventory import inventory
+from routes.inventory import inventory, PRODUCT_ROWS
 from routes.purchase_invoices import bp as purchase_invoices_bp
+from routes.bills import bp as bills_bp
+from routes.exports import bp as exports_bp
+from services.exchange_rates import RateProvider, FALLBACK_RATES
+from services.rate_sources import SOURCE_TYPES, BCP_URL, ER_API_URL, CircuitBreaker, FirstGoodRates, StaticSource
+from services.rate_history import RateHistory
+from services.currency import RateSnapshot
+from services.money import round_cents, sum_by_currency
+from services.dashboard import dashboard_cache, build_dashboard_summary, SUMMARY_MODELS
+from services.cash_flow import cash_flow_totals, rebuild_cash_flow_rollup
+from services.billing import BillError, add_bill_items, paid_bills_page, BILL_ROW_LOADERS, BILL_ROW_WITH_PAYMENTS_LOADERS, BILL_DETAIL_LOADERS
+from services.numbering import bill_numbers, sku_numbers
+from services.product_import import ProductImporter, detect_format, IMPORT_FORMATS, IMPORT_CHUNK_SIZE
+from services.stock_snapshots import snapshot_policy, take_snapshots
+from services.sql_profiler import sql_profiler
+from services.metrics import request_metrics, count_cache
+from services.database import database_url
+from services.tenancy import tenant_scope
+from services.rows import RowView
+from services.json_encoding import FastJSONProvider
+from services.data_versions import data_versions, LIST_DATASETS
+import click
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-import requests
 from functools import lru_cache
 import logging
-from bs4 import BeautifulSoup
 import os
 import json
 
@@ -19,9 +38,30 @@ app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
 # Configure SQLAlchemy
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()  # DATABASE_URL, default sqlite:///database.db
+app.config['DB_ENGINE_PROFILE'] = os.environ.get('DB_ENGINE_PROFILE', 'auto')  # 'none' for library defaults
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['EXCHANGE_RATES_API_URL'] = 'https://open.er-api.com/v6/latest/PYG'
+app.config['EXCHANGE_RATES_API_URL'] = os.environ.get('EXCHANGE_RATES_API_URL', ER_API_URL)
+app.config['BCP_RATES_URL'] = os.environ.get('BCP_RATES_URL', BCP_URL)
+app.config['RATE_SOURCES'] = os.environ.get('RATE_SOURCES', 'er-api,bcp').split(',')  # queried in parallel; or 'static'
+app.config['RATE_SOURCE_TIMEOUT'] = float(os.environ.get('RATE_SOURCE_TIMEOUT', 5))  # read timeout, seconds
+app.config['RATE_BREAKER_FAILURES'] = int(os.environ.get('RATE_BREAKER_FAILURES', 3))  # failures in a row that open a source's circuit
+app.config['RATE_BREAKER_RESET'] = int(os.environ.get('RATE_BREAKER_RESET', 60))  # seconds before an open circuit is retried
+app.config['EXCHANGE_RATE_REFRESH_INTERVAL'] = int(os.environ.get('EXCHANGE_RATE_REFRESH_INTERVAL', 900))  # seconds
+app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))  # seconds
+app.config['STOCK_SNAPSHOT_EVERY'] = int(os.environ.get('STOCK_SNAPSHOT_EVERY', 5000))  # movements, 0 to disable
+app.config['BILL_NUMBER_FORMAT'] = os.environ.get('BILL_NUMBER_FORMAT', 'BILL-{year}-{seq:06d}')  # {seq}, {year}, {user}
+app.config['BILL_NUMBER_RESET'] = os.environ.get('BILL_NUMBER_RESET', 'yearly')  # or 'never'
+app.config['NUMBER_BLOCK_SIZE'] = int(os.environ.get('NUMBER_BLOCK_SIZE', 20))  # numbers each worker reserves at once
+app.config['SQL_PROFILER'] = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'yes')  # Server-Timing, logs and /debug/sql
+app.config['TENANT_SCOPE_STRICT'] = os.environ.get('TENANT_SCOPE_STRICT', '').lower() in ('1', 'true', 'yes')  # raise on SQL that skips the user_id filter
+app.config['JSON_BACKEND'] = os.environ.get('JSON_BACKEND', 'auto')  # orjson when installed, or 'stdlib'
+
+# Before anything builds the Jinja environment, so |tojson uses it too
+app.json = FastJSONProvider(app)
 
 # Set the upload folder path
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -38,6 +78,8 @@ login_manager.login_view = 'login'
 # Register blueprints
 app.register_blueprint(inventory)
 app.register_blueprint(purchase_invoices_bp, url_prefix='/api')
+app.register_blueprint(bills_bp)
+app.register_blueprint(exports_bp)
 
 # Custom template filters
 @app.template_filter('format_currency')
@@ -80,9 +122,11 @@ class ExchangeRateCache:
         if key in self.cache:
             data, timestamp = self.cache[key]
             if datetime.now() - timestamp < self.ttl:
+                count_cache('exchange_rate', 'hit')
                 return data
             else:
                 del self.cache[key]
+        count_cache('exchange_rate', 'miss')
         return None
 
     def set(self, key, value):
@@ -91,8 +135,49 @@ class ExchangeRateCache:
 # Initialize the cache
 exchange_rate_cache = ExchangeRateCache()
 
+# Every rate we fetch is kept, so conversions can use the rate of the day
+rate_history = RateHistory()
+
+def record_rates(table):
+    """Persist a refreshed rate table; runs on the refresher thread."""
+    with app.app_context():
+        rate_history.record_many(table['rates'], source=table['source'])
+
+def make_rate_source(name):
+    if name == 'static':
+        return StaticSource(FALLBACK_RATES)
+    urls = {'er-api': app.config['EXCHANGE_RATES_API_URL'], 'bcp': app.config['BCP_RATES_URL']}
+    return SOURCE_TYPES[name](
+        urls[name],
+        timeout=(3.05, app.config['RATE_SOURCE_TIMEOUT']),
+        breaker=CircuitBreaker(app.config['RATE_BREAKER_FAILURES'], app.config['RATE_BREAKER_RESET'])
+    )
+
+# PYG rates from the first source to answer, served from memory and
+# refreshed in the background
+rate_sources = FirstGoodRates(make_rate_source(name.strip()) for name in app.config['RATE_SOURCES'])
+rate_provider = RateProvider(
+    rate_sources,
+    refresh_interval=app.config['EXCHANGE_RATE_REFRESH_INTERVAL'],
+    fallback=FALLBACK_RATES,
+    source='live',
+    on_refresh=record_rates
+)
+
+def pyg_rate(table, currency):
+    """PYG per unit of currency from a rate table, or None if it has none"""
+    if currency == 'PYG':
+        return Decimal('1')
+    if table['source'] == 'fallback':
+        # Last recorded rate beats the hard-coded defaults
+        known_rate = rate_history.rate_on(currency)
+        if known_rate is not None:
+            return known_rate
+    rate = table['rates'].get(currency)
+    return Decimal(str(rate)) if rate else None
+
 def get_exchange_rate(from_currency, to_currency='PYG'):
-    """Get real-time exchange rate from one currency to another (defaults to PYG)"""
+    """Get the current exchange rate from one currency to another (defaults to PYG)"""
     if from_currency == to_currency:
         return Decimal('1')
     
@@ -102,71 +187,82 @@ def get_exchange_rate(from_currency, to_currency='PYG'):
     if cached_rate is not None:
         return cached_rate
     
-    try:
-        # Using exchangerate.host API (free, no API key required)
-        params = {
-            'base': from_currency,
-            'symbols': to_currency
-        }
-        response = requests.get(app.config['EXCHANGE_RATES_API_URL'], params=params, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get('success', True) and data.get('rates', {}).get(to_currency):
-            rate = Decimal(str(data['rates'][to_currency]))
-            logging.info(f"Retrieved exchange rate: 1 {from_currency} = {rate} {to_currency}")
-            # Cache the rate
-            exchange_rate_cache.set(cache_key, rate)
-            return rate
-        else:
-            raise ValueError("Exchange rate not found in response")
-            
-    except Exception as e:
-        logging.error(f"Error fetching exchange rate: {e}")
-        # Default rates as fallback (you should update these periodically)
-        default_rates = {
-            'USD': Decimal('7250'),  # 1 USD = 7250 PYG
-            'EUR': Decimal('7900'),  # 1 EUR = 7900 PYG
-            'GBP': Decimal('9200'),  # 1 GBP = 9200 PYG
-        }
-        
-        if from_currency in default_rates:
-            logging.warning(f"Using fallback rate for {from_currency}")
-            return default_rates[from_currency]
-        elif to_currency in default_rates:
-            # If converting to PYG from another currency, use inverse rate
-            base_rate = default_rates[from_currency]
-            return Decimal('1') / base_rate if base_rate != 0 else Decimal('1')
-        
+    table = rate_provider.get()
+    from_rate, to_rate = pyg_rate(table, from_currency), pyg_rate(table, to_currency)
+    if from_rate is None or to_rate is None:
+        logging.warning(f"No rate for {from_currency} to {to_currency}; using 1")
         return Decimal('1')
-
-def convert_to_pyg(amount, from_currency):
-    """Convert any amount to PYG using real-time rates"""
+    rate = from_rate / to_rate
+    if table['source'] != 'fallback':
+        exchange_rate_cache.set(cache_key, rate)
+    return rate
+
+def get_rate_on(currency, on_date):
+    """Get the PYG rate in effect on a given date, falling back to the live rate"""
+    rate = rate_history.rate_on(currency, on_date)
+    if rate is None:
+        rate = get_exchange_rate(currency)
+    return rate
+
+def rate_snapshot():
+    """Rates to PYG frozen for the current request, one lookup per currency"""
+    if 'rate_snapshot' not in g:
+        g.rate_snapshot = RateSnapshot(get_exchange_rate)
+    return g.rate_snapshot
+
+def convert_many_to_pyg(items):
+    """Convert (amount, currency, date) tuples to PYG using the rate of each date"""
+    return rate_history.convert_batch(items, fallback=get_exchange_rate)
+
+def convert_to_pyg(amount, from_currency, on_date=None):
+    """Convert any amount to PYG using real-time rates, or the rate of on_date if given"""
     if from_currency == 'PYG':
         return amount
-    rate = get_exchange_rate(from_currency)
+    rate = get_rate_on(from_currency, on_date) if on_date else get_exchange_rate(from_currency)
     converted = amount * rate
     logging.info(f"Converted {amount} {from_currency} to {converted} PYG (rate: {rate})")
     return converted
 
+# Dashboard figures per user, dropped as soon as the user writes
+dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+dashboard_cache.track_writes(SUMMARY_MODELS)
+
+# Versions behind the list APIs' ETags, bumped by the same writes
+data_versions.track_writes(LIST_DATASETS)
+
+# Checkpoint stock levels every STOCK_SNAPSHOT_EVERY movements
+snapshot_policy.every = app.config['STOCK_SNAPSHOT_EVERY']
+snapshot_policy.install()
+
+# Bill numbers and SKUs from per-user counters, reserved a block at a time
+bill_numbers.configure(app.config['BILL_NUMBER_FORMAT'], app.config['BILL_NUMBER_RESET'], app.config['NUMBER_BLOCK_SIZE'])
+sku_numbers.configure(block_size=app.config['NUMBER_BLOCK_SIZE'])
+
+# Opt-in SQL profiling per request (SQL_PROFILER=1)
+sql_profiler.init_app(app)
+
+# Every ORM query in a logged-in request only sees the user's rows
+tenant_scope.init_app(app)
+
+# Prometheus metrics at /metrics
+request_metrics.init_app(app)
+
 # Routes
 @app.route('/')
 @login_required
 def home():
-    # Get counts for dashboard
-    clients = Client.query.filter_by(user_id=current_user.id).all()
-    vendors = Vendor.query.filter_by(user_id=current_user.id).all()
-    products = Product.query.filter_by(user_id=current_user.id).all()
-    active_bills = Bill.query.filter_by(status='Unpaid').all()
+    # Get counts and totals for dashboard
+    user_id = current_user.id
+    summary = dashboard_cache.get_or_build(
+        user_id,
+        lambda: build_dashboard_summary(user_id, rate_snapshot())
+    )
     
     # Get recent transactions
     recent_transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).limit(5).all()
     
     return render_template('home.html',
-                         clients=clients,
-                         vendors=vendors,
-                         products=products,
-                         active_bills=active_bills,
+                         summary=summary,
                          recent_transactions=recent_transactions)
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -206,10 +302,36 @@ def register():
         return redirect(url_for('login'))
     return render_template('register.html')
 
+# Read-only rows for the list pages and the pickers on the bill and invoice forms
+CLIENT_ROWS = RowView({
+    'id': Client.id,
+    'name': Client.name,
+    'email': Client.email,
+    'tax_id': Client.tax_id,
+    'payment_terms': Client.payment_terms,
+    'notes': Client.notes
+})
+VENDOR_ROWS = RowView({
+    'id': Vendor.id,
+    'name': Vendor.name,
+    'email': Vendor.email,
+    'tax_id': Vendor.tax_id,
+    'payment_terms': Vendor.payment_terms,
+    'notes': Vendor.notes
+})
+
+# The product columns the pickers on the bill and invoice forms read, as in Product.to_dict()
+PRODUCT_PAGE_FIELDS = ('id', 'name', 'description', 'sku', 'category', 'unit', 'purchase_price', 'sell_price',
+                       'stock_qty', 'tax_rate')
+
+def user_rows(view, model, names=None):
+    """All of the current user's rows of ``model`` as plain rows of ``view``, in id order"""
+    return view.fetch(view.select(names).where(model.user_id == current_user.id).order_by(model.id))
+
 @app.route('/clients')
 @login_required
 def clients():
-    clients = Client.query.filter_by(user_id=current_user.id).all()
+    clients = user_rows(CLIENT_ROWS, Client)
     return render_template('clients.html', clients=clients)
 
 @app.route('/create_client', methods=['POST'])
@@ -242,7 +364,7 @@ def create_client():
 @app.route('/vendors')
 @login_required
 def vendors():
-    vendors = Vendor.query.filter_by(user_id=current_user.id).all()
+    vendors = user_rows(VENDOR_ROWS, Vendor)
     return render_template('vendors.html', vendors=vendors)
 
 @app.route('/create_vendor', methods=['POST'])
@@ -319,114 +441,76 @@ def delete_vendor(vendor_id):
 @app.route('/products')
 @login_required
 def products():
-    products = Product.query.filter_by(user_id=current_user.id).all()
+    products = user_rows(PRODUCT_ROWS, Product, PRODUCT_PAGE_FIELDS + ('min_stock',))
     return render_template('products.html', products=products)
 
 @app.route('/bills')
 @login_required
 def bills():
-    active_bills = Bill.query.filter_by(user_id=current_user.id, status='Unpaid').all()
-    partially_paid_bills = Bill.query.filter_by(user_id=current_user.id, status='Partially Paid').all()
-    historic_bills = Bill.query.filter_by(user_id=current_user.id, status='Paid').all()
+    # Unpaid and partially paid in one query; the template splits them by status
+    active_bills = Bill.query.options(*BILL_ROW_WITH_PAYMENTS_LOADERS).filter(
+        Bill.user_id == current_user.id, Bill.status.in_(['Unpaid', 'Partially Paid'])
+    ).order_by(Bill.id).all()
+    try:
+        historic_bills, next_cursor = paid_bills_page(current_user.id, request.args.get('cursor'))
+    except ValueError:
+        abort(400)
     
     # Calculate total pending amount in PYG
-    partially_paid_total = sum(
-        convert_to_pyg(bill.total_amount - (bill.paid_amount or 0), bill.currency)
-        for bill in partially_paid_bills
-    )
+    partially_paid_total = rate_snapshot().convert_totals(sum_by_currency(
+        db.session, Bill.total_amount - db.func.coalesce(Bill.paid_amount, 0), Bill.currency,
+        Bill.user_id == current_user.id, Bill.status == 'Partially Paid'
+    ))
     
-    clients = Client.query.filter_by(user_id=current_user.id).all()
-    products = Product.query.filter_by(user_id=current_user.id).all()
+    # The bill form fetches products from /api/products, a page or a search at a time
+    clients = user_rows(CLIENT_ROWS, Client)
     
     return render_template('bills.html',
-                         active_bills=active_bills + partially_paid_bills,
+                         active_bills=active_bills,
                          historic_bills=historic_bills,
+                         next_cursor=next_cursor,
                          partially_paid_total=partially_paid_total,
-                         clients=clients,
-                         products=products)
+                         clients=clients)
 
 @app.route('/create_bill', methods=['POST'])
 @login_required
 def create_bill():
     data = request.form
     
-    # Auto-generate bill number
-    last_bill = Bill.query.filter_by(user_id=current_user.id).order_by(Bill.id.desc()).first()
-    bill_number = f"BILL-{last_bill.id + 1 if last_bill else 1}"
-
     # Create the new bill
+    issue_date = datetime.strptime(data['issue_date'], '%Y-%m-%d')
     new_bill = Bill(
         user_id=current_user.id,
-        bill_number=bill_number,
+        bill_number=bill_numbers.next(current_user.id, on=issue_date),
         client_id=data['client_id'],
-        issue_date=datetime.strptime(data['issue_date'], '%Y-%m-%d'),
+        issue_date=issue_date,
         due_date=datetime.strptime(data['due_date'], '%Y-%m-%d'),
         currency=data['currency'],
         notes=data.get('notes'),
         status='Unpaid'
     )
     
-    # Calculate totals
-    subtotal = Decimal('0')
-    total_tax = Decimal('0')
-    
     # Process items
     product_ids = request.form.getlist('items[][product_id]')
     quantities = request.form.getlist('items[][quantity]')
     prices = request.form.getlist('items[][price]')
     tax_rates = request.form.getlist('items[][tax_rate]')
     
-    for i in range(len(product_ids)):
-        if product_ids[i]:  # Only process if product is selected
-            quantity = Decimal(quantities[i])
-            price = Decimal(prices[i])
-            tax_rate = Decimal(tax_rates[i] or '0')
-            
-            # Get the product
-            product = Product.query.get(product_ids[i])
-            if not product:
-                flash(f'Product with ID {product_ids[i]} not found', 'error')
-                return redirect(url_for('bills'))
-            
-            # Check stock availability
-            if product.stock_qty < float(quantity):
-                flash(f'Insufficient stock for {product.name}. Available: {product.stock_qty}', 'error')
-                return redirect(url_for('bills'))
-            
-            item_subtotal = quantity * price
-            item_tax = item_subtotal * (tax_rate / 100)
-            
-            subtotal += item_subtotal
-            total_tax += item_tax
-            
-            # Add bill item
-            new_bill.items.append(BillItem(
-                product_id=product_ids[i],
-                quantity=quantity,
-                price=price,
-                tax_rate=tax_rate
-            ))
-            
-            # Update product stock
-            old_stock = product.stock_qty
-            product.stock_qty = product.stock_qty - float(quantity)
-            
-            # Create stock movement record
-            movement = StockMovement(
-                product_id=product.id,
-                quantity=-float(quantity),  # Negative for deduction
-                type='sale',
-                source_type='bill',
-                source_id=new_bill.id
-            )
-            db.session.add(movement)
-    
-    new_bill.total_amount = subtotal + total_tax
+    lines = [{
+        'product_id': int(product_ids[i]),
+        'quantity': Decimal(quantities[i]),
+        'price': Decimal(prices[i]),
+        'tax_rate': Decimal(tax_rates[i] or '0')
+    } for i in range(len(product_ids)) if product_ids[i]]  # Only process if product is selected
     
     try:
         db.session.add(new_bill)
+        add_bill_items(new_bill, lines)
         db.session.commit()
         flash('Bill created successfully!', 'success')
+    except BillError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
     except Exception as e:
         db.session.rollback()
         flash(f'Error creating bill: {str(e)}', 'error')
@@ -436,21 +520,24 @@ def create_bill():
 @app.route('/mark_paid/<int:bill_id>', methods=['POST'])
 @login_required
 def mark_paid(bill_id):
-    bill = Bill.query.get_or_404(bill_id)
+    bill = Bill.query.filter_by(id=bill_id, user_id=current_user.id).first_or_404()
     
     payment_amount = Decimal(request.form.get('payment_amount'))
     payment_currency = request.form.get('payment_currency', bill.currency)
     payment_method = request.form.get('payment_method')
     notes = request.form.get('notes')
+    payment_date = datetime.utcnow().date()
 
     # Convert payment to bill's currency if different
     if payment_currency != bill.currency:
-        # First convert to PYG, then to bill's currency
-        amount_in_pyg = convert_to_pyg(payment_amount, payment_currency)
+        # First convert to PYG, then to bill's currency, at the rates of the payment date
+        amount_in_pyg = convert_to_pyg(payment_amount, payment_currency, on_date=payment_date)
         if bill.currency != 'PYG':
-            payment_amount = amount_in_pyg / get_exchange_rate(bill.currency)
+            payment_amount = amount_in_pyg / get_rate_on(bill.currency, payment_date)
         else:
             payment_amount = amount_in_pyg
+        # To the cent, as it is stored, before comparing it with the balance
+        payment_amount = round_cents(payment_amount)
 
     # Validate payment amount
     remaining_balance = bill.total_amount - (bill.paid_amount or Decimal('0'))
@@ -466,7 +553,7 @@ def mark_paid(bill_id):
     # Update bill status
     if bill.paid_amount >= bill.total_amount:
         bill.status = 'Paid'
-        bill.paid_date = datetime.utcnow().date()
+        bill.paid_date = payment_date
     else:
         bill.status = 'Partially Paid'
 
@@ -476,7 +563,7 @@ def mark_paid(bill_id):
         amount=payment_amount,
         original_currency=payment_currency,
         original_amount=Decimal(request.form.get('payment_amount')),
-        payment_date=datetime.utcnow().date(),
+        payment_date=payment_date,
         payment_method=payment_method,
         notes=f"{notes}\nOriginal payment: {request.form.get('payment_amount')} {payment_currency}"
     )
@@ -486,9 +573,9 @@ def mark_paid(bill_id):
     transaction = Transaction(
         user_id=current_user.id,
         type='INCOME',
-        amount=float(payment_amount),
+        amount=payment_amount,
         currency=bill.currency,
-        date=datetime.utcnow().date(),
+        date=payment_date,
         description=f'Payment for Bill #{bill.bill_number}',
         source_module='bill',
         source_id=bill.id
@@ -528,7 +615,7 @@ def create_transaction():
     transaction = Transaction(
         user_id=current_user.id,
         type=data['type'],
-        amount=float(data['amount']),
+        amount=Decimal(str(data['amount'])),
         description=data['description'],
         date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
         status='CONFIRMED'
@@ -543,54 +630,63 @@ def create_transaction():
             'type': transaction.type,
             'amount': transaction.amount,
             'description': transaction.description,
-            'date': transaction.date.isoformat(),
+            'date': transaction.date,
             'status': transaction.status
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to create transaction'}), 500
 
+TRANSACTION_ROWS = RowView({
+    'id': Transaction.id,
+    'type': Transaction.type,
+    'amount': Transaction.amount,
+    'currency': Transaction.currency,
+    'date': Transaction.date,
+    'description': Transaction.description,
+    'status': Transaction.status
+})
+
 @app.route('/api/transactions', methods=['GET'])
 @login_required
+@data_versions.conditional('transactions')
 def list_transactions():
     period = request.args.get('period', 'monthly')
     start_date, end_date = calculate_period_range(period)
     
-    transactions = Transaction.query.filter(
+    transactions = TRANSACTION_ROWS.fetch(TRANSACTION_ROWS.select().where(
         Transaction.user_id == current_user.id,
         Transaction.date >= start_date,
         Transaction.date <= end_date
-    ).order_by(Transaction.date.desc()).all()
-    
-    return jsonify([{
-        'id': t.id,
-        'type': t.type,
-        'amount': t.amount,
-        'currency': t.currency,
-        'date': t.date.isoformat(),
-        'description': t.description,
-        'status': t.status
-    } for t in transactions])
+    ).order_by(Transaction.date.desc()))
+    
+    return app.json.array_response(TRANSACTION_ROWS.dicts(transactions))
 
 @app.route('/api/transactions/summary', methods=['GET'])
 @login_required
 def transaction_summary():
     period = request.args.get('period', 'monthly')
-    start_date, end_date = calculate_period_range(period)
+    if request.args.get('start_date') and request.args.get('end_date'):
+        try:
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        period = 'custom'
+    else:
+        start_date, end_date = calculate_period_range(period)
     
-    transactions = Transaction.query.filter(
-        Transaction.user_id == current_user.id,
-        Transaction.date >= start_date,
-        Transaction.date <= end_date
-    ).all()
+    # Read the pre-aggregated daily rollup instead of every transaction
+    totals = cash_flow_totals(current_user.id, start_date, end_date, by_day=True)
     
-    income = sum(t.amount for t in transactions if t.type == 'INCOME')
-    expenses = sum(t.amount for t in transactions if t.type == 'EXPENSE')
+    # Totals in PYG, each day at that day's rate from the in-memory history
+    income = round_cents(sum(convert_many_to_pyg(totals.get('INCOME', [])), Decimal('0')))
+    expenses = round_cents(sum(convert_many_to_pyg(totals.get('EXPENSE', [])), Decimal('0')))
     
     return jsonify({
         'period': period,
-        'start_date': start_date.isoformat(),
-        'end_date': end_date.isoformat(),
+        'start_date': start_date,
+        'end_date': end_date,
         'income': income,
         'expenses': expenses,
         'balance': income - expenses
@@ -604,40 +700,45 @@ def inventory_page():
 @app.route('/billing')
 @login_required
 def billing():
-    # Get all bills
-    active_bills = Bill.query.filter(
+    # Open bills in full, paid history a page at a time
+    active_bills = Bill.query.options(*BILL_ROW_LOADERS).filter(
         Bill.user_id == current_user.id,
         Bill.status.in_(['Pending', 'Partially Paid'])
     ).order_by(Bill.due_date.asc()).all()
     
-    paid_bills = Bill.query.filter_by(
-        user_id=current_user.id,
-        status='Paid'
-    ).order_by(Bill.paid_date.desc()).all()
-    
-    # Calculate summary statistics
-    total_outstanding = sum(bill.balance_due for bill in active_bills)
+    try:
+        paid_bills, next_cursor = paid_bills_page(current_user.id, request.args.get('cursor'))
+    except ValueError:
+        abort(400)
+    paid_count = Bill.query.filter_by(user_id=current_user.id, status='Paid').count()
+    
+    # Calculate summary statistics (amounts in PYG), summed per currency by the database
+    rates = rate_snapshot()
+    total_outstanding = rates.convert_totals(sum_by_currency(
+        db.session, Bill.total_amount - db.func.coalesce(Bill.paid_amount, 0), Bill.currency,
+        Bill.user_id == current_user.id, Bill.status.in_(['Pending', 'Partially Paid'])
+    ))
     overdue_count = sum(1 for bill in active_bills if bill.is_overdue)
     
     # Calculate paid this month
-    start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    paid_this_month = sum(
-        bill.total_amount 
-        for bill in paid_bills 
-        if bill.paid_date and bill.paid_date >= start_of_month
-    )
+    start_of_month = datetime.now().date().replace(day=1)
+    paid_this_month = rates.convert_totals(sum_by_currency(
+        db.session, Bill.total_amount, Bill.currency,
+        Bill.user_id == current_user.id, Bill.status == 'Paid', Bill.paid_date >= start_of_month
+    ))
     
     # Get clients and products for the create bill form
-    clients = Client.query.filter_by(user_id=current_user.id).all()
-    products = Product.query.filter_by(user_id=current_user.id).all()
+    clients = user_rows(CLIENT_ROWS, Client)
+    products = user_rows(PRODUCT_ROWS, Product, PRODUCT_PAGE_FIELDS)
     
     return render_template('billing.html',
                          active_bills=active_bills,
                          paid_bills=paid_bills,
+                         next_cursor=next_cursor,
                          total_outstanding=total_outstanding,
                          overdue_count=overdue_count,
                          paid_this_month=paid_this_month,
-                         total_bills=len(active_bills) + len(paid_bills),
+                         total_bills=len(active_bills) + paid_count,
                          clients=clients,
                          products=products)
 
@@ -711,7 +812,7 @@ def send_payment_reminder(bill_id):
 @app.route('/bill/<int:bill_id>')
 @login_required
 def bill_detail(bill_id):
-    bill = Bill.query.filter_by(id=bill_id, user_id=current_user.id).first_or_404()
+    bill = Bill.query.options(*BILL_DETAIL_LOADERS).filter_by(id=bill_id, user_id=current_user.id).first_or_404()
     return render_template('bill_detail.html', bill=bill)
 
 @app.route('/currency-exchange')
@@ -723,82 +824,14 @@ def currency_exchange():
 @app.route('/api/exchange-rate', methods=['GET'])
 @login_required
 def get_current_rate():
-    """Get current exchange rates from BCP website."""
-    try:
-        url = 'https://www.bcp.gov.py/webapps/web/cotizacion/monedas'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        # If we get a 403, use fallback rates
-        if response.status_code == 403:
-            app.logger.warning("Access to BCP website blocked. Using fallback rates.")
-            return {
-                'rates': {
-                    'USD': 7400.00,  # Updated to reflect sell rate
-                    'EUR': 8000.00,  # Updated to reflect sell rate
-                    'BRL': 1550.00,  # Updated to reflect sell rate
-                    'ARS': 9.00,     # Updated to reflect sell rate
-                },
-                'timestamp': int(datetime.now().timestamp()),
-                'source': 'fallback'
-            }
-            
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the exchange rate table
-        table = soup.find('table', {'class': 'table'})
-        if not table:
-            app.logger.error("Exchange rate table not found on BCP website")
-            raise ValueError("Exchange rate table not found")
-            
-        rates = {}
-        # Process each row in the table
-        for row in table.find_all('tr')[1:]:  # Skip header row
-            columns = row.find_all('td')
-            if len(columns) >= 4:  # Ensure row has enough columns (including sell rate)
-                try:
-                    currency_name = columns[0].text.strip()
-                    currency_code = columns[1].text.strip()
-                    sell_rate_text = columns[3].text.strip().replace('.', '').replace(',', '.')  # Use column 3 for sell rate
-                    
-                    if currency_code and sell_rate_text:
-                        rate = float(sell_rate_text)
-                        rates[currency_code] = rate
-                        app.logger.info(f"Found sell rate for {currency_code}: {rate}")
-                except (ValueError, IndexError) as e:
-                    app.logger.warning(f"Error processing row: {e}")
-                    continue
-        
-        if not rates:
-            raise ValueError("No exchange rates found")
-            
-        app.logger.info(f"Successfully fetched {len(rates)} exchange rates")
-        return {
-            'rates': rates,
-            'timestamp': int(datetime.now().timestamp()),
-            'source': 'bcp'
-        }
-            
-    except requests.RequestException as e:
-        app.logger.error(f"Request error fetching exchange rates: {str(e)}")
-        # Return fallback rates on any request error
-        return {
-            'rates': {
-                'USD': 7400.00,  # Updated to reflect sell rate
-                'EUR': 8000.00,  # Updated to reflect sell rate
-                'BRL': 1550.00,  # Updated to reflect sell rate
-                'ARS': 9.00,     # Updated to reflect sell rate
-            },
-            'timestamp': int(datetime.now().timestamp()),
-            'source': 'fallback'
-        }
-    except Exception as e:
-        app.logger.error(f"Error processing exchange rates: {str(e)}")
-        raise
+    """Get current exchange rates (PYG per unit) from the first source to answer."""
+    return rate_provider.get()
+
+@app.route('/api/exchange-rate/stats', methods=['GET'])
+@login_required
+def exchange_rate_stats():
+    """Expose the rate cache counters and each source's circuit state."""
+    return jsonify(dict(rate_provider.stats(), sources=rate_sources.status()))
 
 @app.route('/api/exchange-rates', methods=['GET'])
 @login_required
@@ -814,15 +847,40 @@ def get_exchange_rates():
 @app.route('/purchase-invoices')
 @login_required
 def purchase_invoices():
-    vendors = Vendor.query.filter_by(user_id=current_user.id).all()
-    products = Product.query.filter_by(user_id=current_user.id).all()
-    
-    # Convert to dictionaries using to_dict methods
-    vendors_dict = [vendor.to_dict() for vendor in vendors]
-    products_dict = [product.to_dict() for product in products]
+    vendors_dict = list(VENDOR_ROWS.dicts(user_rows(VENDOR_ROWS, Vendor)))
+    products_dict = list(PRODUCT_ROWS.dicts(user_rows(PRODUCT_ROWS, Product, PRODUCT_PAGE_FIELDS), PRODUCT_PAGE_FIELDS))
     
     return render_template('purchase_invoices.html', vendors=vendors_dict, products=products_dict)
 
+@app.cli.command('rebuild-cash-flow')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user\'s rollup.')
+def rebuild_cash_flow_command(user_id):
+    """Recompute the daily cash-flow rollup from the transaction table."""
+    rows = rebuild_cash_flow_rollup(user_id)
+    click.echo(f'Rebuilt cash flow rollup: {rows} daily rows')
+
+@app.cli.command('snapshot-stock')
+@click.option('--user-id', type=int, default=None, help='Only snapshot this user\'s products.')
+def snapshot_stock_command(user_id):
+    """Checkpoint current stock levels for point-in-time queries (run periodically)."""
+    written = take_snapshots(user_id=user_id)
+    click.echo(f'Wrote {written} stock snapshots')
+
+@app.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Owner of the imported products.')
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None, help='Defaults to the file extension.')
+@click.option('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, show_default=True)
+def import_products_command(path, user_id, fmt, chunk_size):
+    """Bulk import products from a CSV or NDJSON file."""
+    fmt = detect_format(path, fmt)
+    with open(path, 'rb') as stream:
+        report = ProductImporter(user_id, chunk_size=chunk_size).run(stream, fmt)
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']}" + (f" (SKU {error['sku']})" if error['sku'] else ''), err=True)
+    click.echo(f"Imported {report['imported']} of {report['rows']} rows in {report['chunks']} chunks, "
+               f"{report['elapsed_seconds']} s ({report['rows_per_second']} rows/s), {report['failed']} failed")
+
 if __name__ == '__main__':
     # Create upload directory if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -0,0 +1,80 @@
+"""Per-line cost of bill creation as the number of lines grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bill_creation [--lines 50,500,5000]
+
+Builds an in-memory SQLite database, then times add_bill_items() plus the
+commit for bills of increasing size. With batched product loading and bulk
+inserts the microseconds per line should stay roughly flat.
+"""
+import argparse
+import time
+import warnings
+from datetime import date
+from decimal import Decimal
+
+warnings.filterwarnings('ignore', message='Dialect sqlite\\+pysqlite does \\*not\\* support Decimal')
+
+from app import app
+from models import db, User, Client, Product, Bill
+from services.billing import add_bill_items
+
+
+def seed(products):
+    user = User(username='bench', password='x')
+    db.session.add(user)
+    db.session.flush()
+    client = Client(user_id=user.id, name='Bench client', email='bench@example.com')
+    db.session.add(client)
+    db.session.bulk_insert_mappings(Product, [{
+        'user_id': user.id,
+        'sku': f'BENCH-{i:06d}',
+        'name': f'Product {i}',
+        'category': 'bench',
+        'buying_date': date.today(),
+        'unit': 'piece',
+        'purchase_price': 1.0,
+        'sell_price': 2.0,
+        'stock_qty': 1e9,
+    } for i in range(products)])
+    db.session.commit()
+    return user.id, client.id, [p.id for p in Product.query.with_entities(Product.id)]
+
+
+def time_bill(user_id, client_id, product_ids, lines):
+    bill = Bill(user_id=user_id, client_id=client_id, issue_date=date.today(), due_date=date.today(),
+                currency='PYG', status='Unpaid')
+    items = [{
+        'product_id': product_ids[i % len(product_ids)],
+        'quantity': Decimal('1'),
+        'price': Decimal('2.50'),
+        'tax_rate': Decimal('10')
+    } for i in range(lines)]
+    started = time.perf_counter()
+    db.session.add(bill)
+    add_bill_items(bill, items)
+    db.session.commit()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', default='50,500,2000,5000', help='comma separated line counts')
+    parser.add_argument('--products', type=int, default=5000)
+    args = parser.parse_args()
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        user_id, client_id, product_ids = seed(args.products)
+        time_bill(user_id, client_id, product_ids, 10)  # warm up
+
+        print(f"{'lines':>8} {'total ms':>10} {'us/line':>10}")
+        for lines in (int(n) for n in args.lines.split(',')):
+            elapsed = time_bill(user_id, client_id, product_ids, lines)
+            print(f"{lines:>8} {elapsed * 1000:>10.1f} {elapsed / lines * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic multi-tenant dataset for the benchmarks.
+
+Every user gets the same number of clients, products, bills, purchase
+invoices and transactions, spread over the past year and across the
+statuses and currencies the pages filter on. Rows go in with bulk
+inserts, so the cash-flow rollup is rebuilt at the end.
+"""
+import random
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from models import db, User, Client, Vendor, Product, Bill, BillItem, Payment, PurchaseInvoice, PurchaseInvoiceItem, Transaction, StockMovement
+from services.cash_flow import rebuild_cash_flow_rollup
+
+BILL_STATUSES = ('Unpaid', 'Pending', 'Partially Paid', 'Paid')
+CURRENCIES = ('PYG', 'PYG', 'USD', 'EUR')
+LOW_STOCK_EVERY = 20  # every 20th product is below its minimum stock
+
+
+@dataclass
+class DatasetSize:
+    users: int = 5
+    clients: int = 50
+    products: int = 500
+    bills: int = 500
+    invoices: int = 100
+    transactions: int = 2000
+    seed: int = 42
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def build_dataset(size):
+    """Create size.users tenants and return [(user_id, {'clients': [...], 'products': [...]})].
+
+    The product ids returned are the well-stocked ones, safe to bill against.
+    """
+    rng = random.Random(size.seed)
+    today = date.today()
+    now = datetime.utcnow()
+    tenants = []
+    for n in range(size.users):
+        user = User(username=f'bench-{n}', password='x')
+        db.session.add(user)
+        db.session.flush()
+        vendor = Vendor(user_id=user.id, name=f'Vendor {n}', email=f'vendor{n}@example.com')
+        db.session.add(vendor)
+        db.session.flush()
+
+        db.session.bulk_insert_mappings(Client, [{
+            'user_id': user.id, 'name': f'Client {n}-{i}', 'email': f'client{n}-{i}@example.com'
+        } for i in range(size.clients)])
+        db.session.bulk_insert_mappings(Product, [{
+            'user_id': user.id,
+            'sku': f'BENCH-{n}-{i:06d}',
+            'name': f'Product {i:05d}',
+            'category': f'Category {i % 10}',
+            'buying_date': today - timedelta(days=rng.randrange(365)),
+            'unit': 'unit',
+            'purchase_price': 10.0,
+            'sell_price': 15.0,
+            'stock_qty': 1e9 if i % LOW_STOCK_EVERY else 1.0,
+            'min_stock': 5.0,
+            'max_stock': 1e9,
+            'created_at': now,
+            'updated_at': now
+        } for i in range(size.products)])
+        client_ids = [client_id for client_id, in db.session.query(Client.id).filter(Client.user_id == user.id)]
+        product_ids = [product_id for product_id, in db.session.query(Product.id).filter(Product.user_id == user.id, Product.stock_qty > Product.min_stock)]
+
+        bills = []
+        for i in range(size.bills):
+            status = rng.choice(BILL_STATUSES)
+            issue_date = today - timedelta(days=rng.randrange(365))
+            total = Decimal(rng.randrange(100, 100000))
+            paid = {'Paid': total, 'Partially Paid': (total / 2).quantize(Decimal('0.01'))}.get(status)
+            bills.append({
+                'user_id': user.id,
+                'client_id': rng.choice(client_ids),
+                'bill_number': f'SEED-{n}-{i:06d}',
+                'issue_date': issue_date,
+                'due_date': issue_date + timedelta(days=30),
+                'total_amount': total,
+                'paid_amount': paid,
+                'currency': rng.choice(CURRENCIES),
+                'status': status,
+                'paid_date': issue_date + timedelta(days=rng.randrange(30)) if status == 'Paid' else None,
+                'created_at': now,
+                'updated_at': now
+            })
+        db.session.bulk_insert_mappings(Bill, bills)
+        bill_rows = db.session.query(Bill.id, Bill.status, Bill.paid_amount, Bill.paid_date, Bill.issue_date).filter(Bill.user_id == user.id).all()
+        items, movements, payments = [], [], []
+        for bill_id, status, paid, paid_date, issue_date in bill_rows:
+            for _ in range(rng.randrange(1, 6)):
+                product_id = rng.choice(product_ids)
+                items.append({'bill_id': bill_id, 'product_id': product_id, 'quantity': Decimal(1), 'price': Decimal(100), 'tax_rate': Decimal(10), 'created_at': now})
+                movements.append({'product_id': product_id, 'quantity': -1.0, 'type': 'sale', 'source_type': 'bill', 'source_id': bill_id,
+                                  'timestamp': datetime.combine(issue_date, datetime.min.time())})
+            if paid:
+                payments.append({'bill_id': bill_id, 'amount': paid, 'payment_date': paid_date or issue_date, 'payment_method': 'transfer', 'created_at': now, 'updated_at': now})
+        db.session.bulk_insert_mappings(BillItem, items)
+        db.session.bulk_insert_mappings(StockMovement, movements)
+
+        db.session.bulk_insert_mappings(PurchaseInvoice, [{
+            'user_id': user.id,
+            'vendor_id': vendor.id,
+            'invoice_number': f'PI-{n}-{i:06d}',
+            'date': today - timedelta(days=rng.randrange(365)),
+            'due_date': today + timedelta(days=rng.randrange(-30, 60)),
+            'total': Decimal(rng.randrange(100, 50000)),
+            'status': rng.choice(('unpaid', 'partial', 'paid')),
+            'created_at': now,
+            'updated_at': now
+        } for i in range(size.invoices)])
+        invoice_rows = db.session.query(PurchaseInvoice.id, PurchaseInvoice.total, PurchaseInvoice.status, PurchaseInvoice.date).filter(PurchaseInvoice.user_id == user.id).all()
+        db.session.bulk_insert_mappings(PurchaseInvoiceItem, [{
+            'invoice_id': invoice_id, 'product_id': rng.choice(product_ids), 'description': 'Restock',
+            'quantity': Decimal(1), 'unit_price': total, 'total': total, 'created_at': now
+        } for invoice_id, total, _, _ in invoice_rows])
+        payments.extend({
+            'purchase_invoice_id': invoice_id,
+            'amount': total if status == 'paid' else (total / 2).quantize(Decimal('0.01')),
+            'payment_date': invoice_date, 'payment_method': 'transfer', 'created_at': now, 'updated_at': now
+        } for invoice_id, total, status, invoice_date in invoice_rows if status != 'unpaid')
+        db.session.bulk_insert_mappings(Payment, payments)
+
+        db.session.bulk_insert_mappings(Transaction, [{
+            'user_id': user.id,
+            'type': rng.choice(('INCOME', 'EXPENSE')),
+            'amount': float(rng.randrange(1000, 1000000)),
+            'currency': rng.choice(CURRENCIES),
+            'date': today - timedelta(days=rng.randrange(365)),
+            'status': 'CANCELLED' if rng.random() < 0.05 else 'CONFIRMED',
+            'source_module': 'manual',
+            'created_at': now,
+            'updated_at': now
+        } for _ in range(size.transactions)])
+        db.session.commit()
+        tenants.append((user.id, {'clients': client_ids, 'products': product_ids}))
+
+    rebuild_cash_flow_rollup()
+    return tenants
@@ -0,0 +1,238 @@
+"""Latency and allocation benchmark for the main pages and API endpoints.
+
+Run from the repository root:
+
+    python -m benchmarks.endpoints [--users 5 --products 500 ...] [--db PATH]
+    python -m benchmarks.endpoints --save-baseline   # record benchmarks/baseline.json
+    python -m benchmarks.endpoints --check           # exit 1 if slower than the baseline
+
+Builds a synthetic multi-tenant SQLite dataset (in memory unless --db is
+given), then requests every route through the Flask test client, rotating
+through the tenants. Each route is timed over --iterations requests and
+reported as p50/p95/p99 milliseconds; a second, shorter pass under
+tracemalloc records the peak memory allocated per request.
+
+Results are compared with the baseline JSON. A route regresses when its p50
+or p95 is more than --tolerance (default 25%) above the baseline. Numbers
+are only comparable on the same machine and dataset size, so record the
+baseline where the check runs.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+
+warnings.filterwarnings('ignore', message='Dialect sqlite\\+pysqlite does \\*not\\* support Decimal')
+warnings.filterwarnings('ignore', message='relationship .* will copy column')
+
+from app import app, rate_provider, dashboard_cache, exchange_rate_cache, rate_history
+from models import db
+from services.rate_sources import FirstGoodRates, StaticSource
+from benchmarks.dataset import DatasetSize, build_dataset
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Fixed rates, so nothing is fetched from the network while timing
+BENCH_RATES = {'USD': Decimal('7300'), 'EUR': Decimal('7900'), 'BRL': Decimal('1450')}
+
+
+def bill_payload(tenant, counter):
+    """A five-line bill for one of the tenant's clients."""
+    products = tenant['products']
+    today = date.today()
+    return {
+        'client_id': tenant['clients'][counter % len(tenant['clients'])],
+        'issue_date': today.isoformat(),
+        'due_date': (today + timedelta(days=30)).isoformat(),
+        'currency': 'PYG',
+        'items': [{
+            'product_id': products[(counter * 5 + i) % len(products)],
+            'quantity': 1,
+            'price': '100',
+            'tax_rate': '10'
+        } for i in range(5)]
+    }
+
+
+# name -> callable(client, tenant, counter) returning a response
+ROUTES = {
+    'GET /': lambda client, tenant, n: client.get('/'),
+    'GET /bills': lambda client, tenant, n: client.get('/bills'),
+    'GET /billing': lambda client, tenant, n: client.get('/billing'),
+    'GET /api/products': lambda client, tenant, n: client.get('/api/products'),
+    'GET /api/purchase-invoices': lambda client, tenant, n: client.get('/api/purchase-invoices'),
+    'GET /api/transactions/summary': lambda client, tenant, n: client.get('/api/transactions/summary?period=yearly'),
+    'POST /api/bills': lambda client, tenant, n: client.post('/api/bills', json=bill_payload(tenant, n)),
+}
+
+
+def percentile(samples, pct):
+    """Linear-interpolated percentile of a non-empty list."""
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def login_clients(tenants):
+    clients = []
+    for user_id, tenant in tenants:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        clients.append((client, tenant))
+    return clients
+
+
+def request(route, clients, counter):
+    client, tenant = clients[counter % len(clients)]
+    response = route(client, tenant, counter)
+    response.get_data()
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+
+
+def measure(name, clients, iterations, alloc_iterations, warmup):
+    route = ROUTES[name]
+    for counter in range(warmup):
+        request(route, clients, counter)
+
+    timings = []
+    for counter in range(iterations):
+        started = time.perf_counter()
+        request(route, clients, counter)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for counter in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            request(route, clients, counter)
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'peak_kib': round(statistics.median(peaks), 1) if peaks else None,
+        'iterations': iterations
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against ``baseline``."""
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if previous.get(key) and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f'{name} {key}: {current[key]:.2f} ms vs baseline {previous[key]:.2f} ms '
+                                   f'(+{(current[key] / previous[key] - 1) * 100:.0f}%)')
+    return regressions
+
+
+def print_table(results, baseline):
+    previous_routes = (baseline or {}).get('routes', {})
+    print(f"{'route':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>9} {'vs base p95':>12}")
+    for name, row in results['routes'].items():
+        previous = previous_routes.get(name, {}).get('p95_ms')
+        delta = f'{(row["p95_ms"] / previous - 1) * 100:+.0f}%' if previous else '-'
+        peak = f'{row["peak_kib"]:.1f}' if row['peak_kib'] is not None else '-'
+        print(f"{name:<32} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {peak:>9} {delta:>12}")
+
+
+def main():
+    defaults = DatasetSize()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for field in ('users', 'clients', 'products', 'bills', 'invoices', 'transactions', 'seed'):
+        parser.add_argument(f'--{field}', type=int, default=getattr(defaults, field))
+    parser.add_argument('--db', help='SQLite file to build the dataset in (default: in memory)')
+    parser.add_argument('--routes', help='comma separated subset of route names, e.g. "GET /,GET /bills"')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--alloc-iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--output', help='also write the results JSON here')
+    args = parser.parse_args()
+
+    size = DatasetSize(**{field: getattr(args, field) for field in defaults.as_dict()})
+    names = [name.strip() for name in args.routes.split(',')] if args.routes else list(ROUTES)
+    unknown = [name for name in names if name not in ROUTES]
+    if unknown:
+        parser.error(f'unknown route(s): {", ".join(unknown)}; choose from {", ".join(ROUTES)}')
+
+    if args.db and os.path.exists(args.db):
+        os.remove(args.db)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(args.db)}' if args.db else 'sqlite://'
+    rate_provider.background = False
+    rate_provider.fetch = FirstGoodRates([StaticSource(BENCH_RATES)])
+    for currency, rate in BENCH_RATES.items():
+        exchange_rate_cache.set(f'{currency}_PYG', rate)
+    # Measure the dashboard queries, not the summary cache
+    dashboard_cache.ttl = 0
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        tenants = build_dataset(size)
+        print(f'Built dataset {size.as_dict()} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+        rate_history.load()
+
+    # Requests run outside any app context: an active one would be reused and
+    # share g (and the logged-in user) across tenants
+    clients = login_clients(tenants)
+    results = {
+        'meta': {
+            'dataset': size.as_dict(),
+            'storage': 'file' if args.db else 'memory',
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'recorded_on': date.today().isoformat()
+        },
+        'routes': {}
+    }
+    for name in names:
+        results['routes'][name] = measure(name, clients, args.iterations, args.alloc_iterations, args.warmup)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('dataset') != size.as_dict():
+            print('Warning: baseline was recorded with a different dataset size', file=sys.stderr)
+
+    print_table(results, baseline)
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f'Wrote {path}', file=sys.stderr)
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for line in regressions:
+        print(f'REGRESSION {line}', file=sys.stderr)
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""JSON responses: Flask's stdlib provider versus services.json_encoding.FastJSONProvider.
+
+Run from the repository root:
+
+    python -m benchmarks.json_encoding [--rows 100000]
+
+Encodes a list of --rows transaction-shaped dicts (Decimal amount, date,
+strings) the way a list endpoint returns them and reports the time and the
+peak memory allocated while producing the body:
+
+* stdlib: Flask's default provider, amounts and dates converted by hand
+  first, as the routes used to;
+* provider (stdlib / orjson): FastJSONProvider.dumps() on the raw values;
+* streamed (orjson when installed): array_chunks(), the body of
+  array_response(), consumed chunk by chunk as a server would send it.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from services.json_encoding import FastJSONProvider, orjson
+
+
+def transactions(rows):
+    today = date.today()
+    return [{
+        'id': i, 'type': ('INCOME', 'EXPENSE')[i % 2], 'amount': Decimal(10000 + i).scaleb(-2),
+        'currency': ('PYG', 'USD')[i % 2], 'date': today - timedelta(days=i % 365),
+        'description': f'Transaction {i}', 'status': 'CONFIRMED'
+    } for i in range(rows)]
+
+
+def provider(backend):
+    app = Flask(__name__)
+    app.config['JSON_BACKEND'] = backend
+    return FastJSONProvider(app)
+
+
+def measure(encode, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    encode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = transactions(args.rows)
+    flask_default = DefaultJSONProvider(Flask(__name__))
+    stdlib, fast = provider('stdlib'), provider('auto')
+    compact = {'separators': (',', ':')}
+
+    def by_hand():
+        return flask_default.dumps([
+            dict(item, amount=float(item['amount']), date=item['date'].isoformat()) for item in items
+        ], **compact)
+
+    def streamed():
+        return sum(len(chunk) for chunk in fast.array_chunks(items))
+
+    cases = {
+        'stdlib, converted by hand': by_hand,
+        'provider, stdlib': lambda: stdlib.dumps(items, **compact),
+    }
+    if orjson is not None:
+        cases['provider, orjson'] = lambda: fast.dumps(items, **compact)
+    cases[f"streamed, {'orjson' if fast.use_orjson else 'stdlib'}"] = streamed
+
+    print(f'{args.rows} rows')
+    print(f"{'encoder':<28} {'ms':>8} {'rows/s':>10} {'peak MiB':>9}")
+    for name, encode in cases.items():
+        seconds, peak = measure(encode, args.repeat)
+        print(f'{name:<28} {seconds * 1000:>8.1f} {args.rows / seconds:>10.0f} {peak / 2**20:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
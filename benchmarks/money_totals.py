@@ -0,0 +1,96 @@
+"""Money totals: REAL/Numeric columns summed in Python versus integer minor units summed in SQL.
+
+Run from the repository root:
+
+    python -m benchmarks.money_totals [--rows 100000]
+
+Builds two in-memory SQLite tables with the same amounts, one stored the old
+way (Float, i.e. REAL) and one as MinorUnits (BIGINT hundredths), then
+
+* times the per-currency totals the billing pages need: the old code loaded
+  every row and added Decimals in Python, the new one is a grouped SUM over
+  integers (services.money.sum_by_currency);
+* compares the database's own SUM over each column with the exact total,
+  which is where REAL accumulates rounding drift.
+"""
+import argparse
+import random
+import time
+import warnings
+from decimal import Decimal
+
+warnings.filterwarnings('ignore', message='Dialect sqlite\\+pysqlite does \\*not\\* support Decimal')
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, create_engine, func, select
+from sqlalchemy.orm import Session
+
+from services.currency import group_by_currency
+from services.money import MinorUnits, sum_by_currency
+
+CURRENCIES = ('PYG', 'USD', 'EUR')
+
+metadata = MetaData()
+real_amounts = Table('real_amounts', metadata,
+                     Column('id', Integer, primary_key=True), Column('amount', Float), Column('currency', String(3)))
+minor_amounts = Table('minor_amounts', metadata,
+                      Column('id', Integer, primary_key=True), Column('amount', MinorUnits), Column('currency', String(3)))
+
+
+def amounts(rows, seed):
+    rng = random.Random(seed)
+    # Cent amounts that have no exact binary representation
+    return [(Decimal(rng.randint(1, 999999)).scaleb(-2), rng.choice(CURRENCIES)) for _ in range(rows)]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    data = amounts(args.rows, args.seed)
+    exact = group_by_currency(data)
+    with engine.begin() as conn:
+        conn.execute(real_amounts.insert(), [{'amount': float(a), 'currency': c} for a, c in data])
+        conn.execute(minor_amounts.insert(), [{'amount': a, 'currency': c} for a, c in data])
+
+    with Session(engine) as session:
+        def python_totals():
+            rows = session.execute(select(real_amounts.c.amount, real_amounts.c.currency))
+            return group_by_currency(rows)
+
+        def sql_totals():
+            return sum_by_currency(session, minor_amounts.c.amount, minor_amounts.c.currency)
+
+        old_time, old = best_of(args.repeat, python_totals)
+        new_time, new = best_of(args.repeat, sql_totals)
+        real_sums = dict(session.execute(
+            select(real_amounts.c.currency, func.sum(real_amounts.c.amount)).group_by(real_amounts.c.currency)
+        ).all())
+
+    print(f'{args.rows} amounts in {len(CURRENCIES)} currencies')
+    print(f"{'totals':<34} {'ms':>8}")
+    print(f"{'REAL rows, Decimal sum in Python':<34} {old_time * 1000:>8.1f}")
+    print(f"{'MinorUnits, grouped SUM in SQL':<34} {new_time * 1000:>8.1f}")
+    print()
+    print(f"{'currency':<8} {'exact':>16} {'SUM(REAL)':>24} {'SUM(MinorUnits)':>16}")
+    for currency in CURRENCIES:
+        print(f'{currency:<8} {exact[currency]:>16} {real_sums[currency]!r:>24} {new[currency]:>16}')
+    assert new == exact, 'integer totals must be exact'
+    assert {c: v.quantize(Decimal('0.01')) for c, v in old.items()} == exact
+
+
+if __name__ == '__main__':
+    main()
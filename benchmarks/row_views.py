@@ -0,0 +1,122 @@
+"""List endpoints: full ORM instances versus Core rows (services.rows.RowView).
+
+Run from the repository root:
+
+    python -m benchmarks.row_views [--rows 100000]
+
+Fills an in-memory SQLite database with --rows transactions for one user,
+then reads and serializes them the way /api/transactions did before and
+does now:
+
+* ORM: ``Transaction.query...all()`` and a dict per instance;
+* rows: a Core SELECT of the seven returned columns through
+  TRANSACTION_ROWS, as RowView.dicts() for the app's JSON provider.
+
+For each it reports the fetch time, the memory the fetched result holds
+(scaled to 100k rows) and serialization throughput, i.e. building the
+dicts plus encoding them with the app's JSON provider (JSON_BACKEND).
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+from datetime import date, datetime, timedelta
+
+warnings.filterwarnings('ignore', message='Dialect sqlite\\+pysqlite does \\*not\\* support Decimal')
+warnings.filterwarnings('ignore', message='relationship .* will copy column')
+
+from app import app, TRANSACTION_ROWS
+from models import db, User, Transaction
+
+
+def fill(rows):
+    user = User(username='bench', password='x')
+    db.session.add(user)
+    db.session.commit()
+    today, now = date.today(), datetime.utcnow()
+    db.session.execute(Transaction.__table__.insert(), [{
+        'user_id': user.id, 'type': ('INCOME', 'EXPENSE')[i % 2], 'amount': 10000 + i,
+        'currency': ('PYG', 'USD')[i % 2], 'date': today - timedelta(days=i % 365),
+        'description': f'Transaction {i}', 'status': 'CONFIRMED', 'created_at': now, 'updated_at': now
+    } for i in range(rows)])
+    db.session.commit()
+    return user.id
+
+
+def orm_fetch(user_id):
+    return Transaction.query.filter(Transaction.user_id == user_id).order_by(Transaction.date.desc()).all()
+
+
+def orm_serialize(transactions):
+    return app.json.dumps([{
+        'id': t.id,
+        'type': t.type,
+        'amount': float(t.amount),
+        'currency': t.currency,
+        'date': t.date.isoformat(),
+        'description': t.description,
+        'status': t.status
+    } for t in transactions])
+
+
+def rows_fetch(user_id):
+    return TRANSACTION_ROWS.fetch(
+        TRANSACTION_ROWS.select().where(Transaction.user_id == user_id).order_by(Transaction.date.desc())
+    )
+
+
+def rows_serialize(transactions):
+    return app.json.dumps(list(TRANSACTION_ROWS.dicts(transactions)))
+
+
+def measure(fetch, serialize, user_id, repeat):
+    fetch_times, serialize_times = [], []
+    for _ in range(repeat):
+        db.session.remove()
+        started = time.perf_counter()
+        result = fetch(user_id)
+        fetch_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        body = serialize(result)
+        serialize_times.append(time.perf_counter() - started)
+        del result
+
+    # Memory held by one fetched result, identity map included
+    db.session.remove()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fetch(user_id)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    db.session.remove()
+    return min(fetch_times), min(serialize_times), held, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        user_id = fill(args.rows)
+        results = {
+            'ORM instances': measure(orm_fetch, orm_serialize, user_id, args.repeat),
+            'Core rows (RowView)': measure(rows_fetch, rows_serialize, user_id, args.repeat),
+        }
+
+    bodies = {body for _, _, _, body in results.values()}
+    assert len(bodies) == 1, 'both paths must produce the same JSON'
+    scale = 100000 / args.rows
+    print(f'{args.rows} transactions')
+    print(f"{'path':<22} {'fetch ms':>9} {'MiB/100k rows':>14} {'serialize ms':>13} {'rows/s':>10}")
+    for name, (fetch_time, serialize_time, held, _) in results.items():
+        print(f'{name:<22} {fetch_time * 1000:>9.1f} {held * scale / 2**20:>14.1f} '
+              f'{serialize_time * 1000:>13.1f} {args.rows / serialize_time:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
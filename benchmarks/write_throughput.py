@@ -0,0 +1,192 @@
+"""Write throughput of each database engine profile with 1, 4 and 8 worker processes.
+
+Run from the repository root:
+
+    python -m benchmarks.write_throughput [--workers 1,4,8] [--seconds 5]
+    python -m benchmarks.write_throughput --postgres-url postgresql://erp@localhost/erp_bench
+
+Every profile runs in its own interpreter with DATABASE_URL and
+DB_ENGINE_PROFILE set, imports the app once and forks the workers from it,
+as gunicorn --preload does. Each worker is one tenant posting stock
+adjustments (an UPDATE and two INSERTs per request) through the Flask test
+client for --seconds. Reported per profile and worker count: committed
+writes per second, p50/p95 latency and the number of failed requests
+("database is locked" and the like).
+
+Profiles:
+
+    sqlite-default  SQLite with library defaults (rollback journal, no pool)
+    sqlite          the tuned SQLite profile (WAL, pragmas, pooled)
+    postgresql      only with --postgres-url; its tables are dropped and
+                    recreated, so point it at a scratch database
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date
+
+warnings.filterwarnings('ignore', message='Dialect sqlite\\+pysqlite does \\*not\\* support Decimal')
+warnings.filterwarnings('ignore', message='relationship .* will copy column')
+
+PRODUCTS_PER_TENANT = 20
+
+
+def profile_environment(profile, directory, postgres_url):
+    if profile == 'postgresql':
+        return {'DATABASE_URL': postgres_url, 'DB_ENGINE_PROFILE': 'auto'}
+    path = os.path.join(directory, f'{profile}.db')
+    return {'DATABASE_URL': f'sqlite:///{path}', 'DB_ENGINE_PROFILE': 'none' if profile == 'sqlite-default' else 'auto'}
+
+
+def seed(tenants):
+    """One user with a few stocked products per worker; returns [(user_id, [product_id, ...])]."""
+    from models import db, User, Product
+
+    db.drop_all()
+    db.create_all()
+    seeded = []
+    for tenant in range(tenants):
+        user = User(username=f'writer{tenant}', password='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.bulk_insert_mappings(Product, [{
+            'user_id': user.id,
+            'sku': f'W{tenant}-{i:04d}',
+            'name': f'Product {i}',
+            'category': 'bench',
+            'buying_date': date.today(),
+            'unit': 'piece',
+            'purchase_price': 1.0,
+            'sell_price': 2.0,
+            'stock_qty': 1000,
+        } for i in range(PRODUCTS_PER_TENANT)])
+        db.session.commit()
+        product_ids = [row.id for row in Product.query.with_entities(Product.id).filter_by(user_id=user.id)]
+        seeded.append((user.id, product_ids))
+    return seeded
+
+
+def writer(app, tenant, start, seconds, results):
+    """Post adjustments until the time is up; puts (latencies, failures) on ``results``."""
+    user_id, product_ids = tenant
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    latencies, failures = [], 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    counter = 0
+    while time.perf_counter() < deadline:
+        product_id = product_ids[counter % len(product_ids)]
+        counter += 1
+        started = time.perf_counter()
+        try:
+            response = client.post(f'/api/products/{product_id}/adjust-stock', json={'quantity': 1, 'reason': 'bench'})
+            ok = response.status_code == 201
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures += 1
+    results.put((latencies, failures))
+
+
+def run_profile(workers_counts, seconds):
+    """Child interpreter: time every worker count against the configured database."""
+    import logging
+    logging.disable(logging.INFO)
+    from app import app, rate_provider
+    from models import db
+
+    rate_provider.background = False
+    with app.app_context():
+        tenants = seed(max(workers_counts))
+        pool = db.engine.pool.__class__.__name__
+
+    # Forked after the app (and its engine) exist, like gunicorn --preload
+    context = multiprocessing.get_context('fork')
+    runs = []
+    for workers in workers_counts:
+        start = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=writer, args=(app, tenants[i], start, seconds, results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        latencies, failures = [], 0
+        for _ in processes:
+            worker_latencies, worker_failures = results.get()
+            latencies.extend(worker_latencies)
+            failures += worker_failures
+        for process in processes:
+            process.join()
+        runs.append({
+            'workers': workers,
+            'writes_per_second': round(len(latencies) / seconds, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p95_ms': round(statistics.quantiles(latencies, n=100)[94] * 1000, 2) if len(latencies) > 1 else None,
+            'failures': failures,
+        })
+    return {'pool': pool, 'runs': runs}
+
+
+def print_table(results):
+    print(f"{'profile':<16}{'workers':>8}{'writes/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'failed':>8}")
+    for profile, result in results.items():
+        for run in result['runs']:
+            print(f"{profile:<16}{run['workers']:>8}{run['writes_per_second']:>11.1f}"
+                  f"{run['p50_ms'] or 0:>9.2f}{run['p95_ms'] or 0:>9.2f}{run['failures']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,4,8', help='comma-separated worker process counts')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    parser.add_argument('--profiles', default='sqlite-default,sqlite,postgresql')
+    parser.add_argument('--postgres-url', default=os.environ.get('BENCH_POSTGRES_URL'),
+                        help='scratch PostgreSQL database for the postgresql profile')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    parser.add_argument('--child-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    workers_counts = [int(n) for n in args.workers.split(',')]
+
+    if args.child_output:
+        with open(args.child_output, 'w') as f:
+            json.dump(run_profile(workers_counts, args.seconds), f)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in args.profiles.split(','):
+            if profile == 'postgresql' and not args.postgres_url:
+                print('postgresql: skipped, no --postgres-url given', file=sys.stderr)
+                continue
+            output = os.path.join(directory, f'{profile}.json')
+            env = dict(os.environ, **profile_environment(profile, directory, args.postgres_url))
+            subprocess.run([
+                sys.executable, '-m', 'benchmarks.write_throughput',
+                '--workers', args.workers, '--seconds', str(args.seconds), '--child-output', output
+            ], env=env, check=True)
+            with open(output) as f:
+                results[profile] = json.load(f)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
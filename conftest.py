@@ -0,0 +1,175 @@
+import warnings
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import SAWarning
+
+import app as erp
+from models import db, User, Client, Vendor, Product, Bill, BillItem, Payment, Transaction, StockMovement, PurchaseInvoice, PurchaseInvoiceItem
+from services.rate_sources import FirstGoodRates, StaticSource
+
+# Rates the tests convert with, so no request ever leaves the machine
+TEST_RATES = {'USD': Decimal('7300'), 'EUR': Decimal('7900'), 'BRL': Decimal('1450')}
+OFFLINE_RATES = FirstGoodRates([StaticSource(TEST_RATES)])
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The application on a fresh SQLite file per test.
+
+    No app context stays pushed while a test runs: requests reuse an active
+    context, which would share ``g`` (and the logged-in user) between them.
+    Wrap direct database work in ``with app.app_context()``.
+    """
+    erp.app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}"
+    )
+    # Any query that reaches another tenant's rows fails the test
+    erp.tenant_scope.strict = True
+    erp.rate_provider.background = False
+    erp.rate_provider.fetch = OFFLINE_RATES
+    for currency, rate in TEST_RATES.items():
+        erp.exchange_rate_cache.set(f'{currency}_PYG', rate)
+    with erp.app.app_context():
+        with warnings.catch_warnings():
+            # SQLite stores Numeric as float; the models know
+            warnings.simplefilter('ignore', SAWarning)
+            db.create_all()
+        erp.rate_history.load()
+    erp.dashboard_cache.clear()
+    # Blocks reserved against an earlier test's database
+    erp.bill_numbers.clear()
+    erp.sku_numbers.clear()
+    yield erp.app
+    with erp.app.app_context():
+        db.drop_all()
+        # Close the pooled connections to this test's file
+        db.engine.dispose()
+
+
+def make_user(username='owner'):
+    user = User(username=username, password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def login(app, user_id):
+    """A test client logged in as the given user."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def seed_tenant(user_id, clients=3, products=10, bills=12, transactions=20, invoices=4):
+    """Give a user a little of everything the pages read, in every state they filter on.
+
+    Returns the ids of what was created.
+    """
+    today = date.today()
+    client_rows = [Client(user_id=user_id, name=f'Client {i}', email=f'client{i}@example.com') for i in range(clients)]
+    vendor = Vendor(user_id=user_id, name='Vendor', email='vendor@example.com')
+    product_rows = [Product(
+        user_id=user_id, sku=f'{user_id}-SKU-{i}', name=f'Product {i}', category='General',
+        buying_date=today, unit='unit', purchase_price=10, sell_price=15,
+        stock_qty=5 if i % 3 == 0 else 50, min_stock=10, max_stock=100
+    ) for i in range(products)]
+    db.session.add_all([*client_rows, vendor, *product_rows])
+    db.session.flush()
+
+    statuses = ('Unpaid', 'Pending', 'Partially Paid', 'Paid')
+    bill_ids = []
+    for i in range(bills):
+        status = statuses[i % len(statuses)]
+        paid = {'Paid': Decimal('115'), 'Partially Paid': Decimal('50')}.get(status)
+        bill = Bill(
+            user_id=user_id, client_id=client_rows[i % clients].id, bill_number=f'BILL-{user_id}-{i}',
+            issue_date=today - timedelta(days=i), due_date=today + timedelta(days=15 - 2 * i),
+            total_amount=Decimal('115'), paid_amount=paid,
+            currency=('PYG', 'USD', 'EUR')[i % 3], status=status,
+            paid_date=today - timedelta(days=i) if status == 'Paid' else None
+        )
+        db.session.add(bill)
+        db.session.flush()
+        bill_ids.append(bill.id)
+        product = product_rows[i % products]
+        db.session.add(BillItem(bill_id=bill.id, product_id=product.id, quantity=1, price=Decimal('100'), tax_rate=Decimal('15')))
+        db.session.add(StockMovement(product_id=product.id, quantity=-1, type='sale', source_type='bill', source_id=bill.id, timestamp=datetime.utcnow() - timedelta(days=i)))
+        if paid:
+            db.session.add(Payment(bill_id=bill.id, amount=paid, payment_date=today - timedelta(days=i), payment_method='cash'))
+
+    for i in range(invoices):
+        invoice = PurchaseInvoice(
+            user_id=user_id, vendor_id=vendor.id, invoice_number=f'PI-{user_id}-{i}',
+            date=today - timedelta(days=i), due_date=today + timedelta(days=30), total=Decimal('200'), status='unpaid'
+        )
+        db.session.add(invoice)
+        db.session.flush()
+        db.session.add(PurchaseInvoiceItem(invoice_id=invoice.id, product_id=product_rows[i % products].id, description='Restock', quantity=Decimal('2'), unit_price=Decimal('100'), total=Decimal('200')))
+        db.session.add(Payment(purchase_invoice_id=invoice.id, amount=Decimal('50'), payment_date=today, payment_method='transfer'))
+
+    for i in range(transactions):
+        db.session.add(Transaction(
+            user_id=user_id, type=('INCOME', 'EXPENSE')[i % 2], amount=100 + i,
+            currency=('PYG', 'USD')[i % 2], date=today - timedelta(days=i)
+        ))
+    db.session.commit()
+    return {
+        'clients': [row.id for row in client_rows],
+        'vendor': vendor.id,
+        'products': [row.id for row in product_rows],
+        'bills': bill_ids
+    }
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        return make_user()
+
+
+@pytest.fixture
+def client(app, user):
+    return login(app, user)
+
+
+@pytest.fixture
+def tenant_sizes():
+    """seed_tenant() arguments for the owner and the neighbour; override in a module to change them."""
+    return {}, {}
+
+
+@pytest.fixture
+def tenants(app, tenant_sizes):
+    """Two seeded users, ((owner, rows), (neighbour, rows)), so no user's rows are ever the whole table."""
+    owner_sizes, neighbour_sizes = tenant_sizes
+    with app.app_context():
+        owner, neighbour = make_user('owner'), make_user('neighbour')
+        return (owner, seed_tenant(owner, **owner_sizes)), (neighbour, seed_tenant(neighbour, **neighbour_sizes))
+
+
+@pytest.fixture
+def capture_sql(app):
+    """``with capture_sql() as statements:`` collects the (statement, parameters) run inside."""
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def capture():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return capture
@@ -0,0 +1,19 @@
+import os
+import shutil
+import tempfile
+
+# Workers write their metrics here and /metrics sums them; this has to be
+# set before the app (and prometheus_client) is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'nexus_erp_metrics'))
+
+
+def on_starting(server):
+    """Start from an empty metrics directory so old workers' samples are not counted."""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,40 @@
+"""add exchange rate history
+
+Rates fetched from the live sources are kept per (currency, date) so
+amounts can be converted at the rate of their own date.
+
+Revision ID: 2b9e6d4a1c57
+Revises:
+Create Date: 2026-10-18 09:47:52.160384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9e6d4a1c57'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with create_db.py since the model exists already have it
+    if not sa.inspect(op.get_bind()).has_table('exchange_rates'):
+        op.create_table(
+            'exchange_rates',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('currency', sa.String(length=3), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('rate', sa.Numeric(precision=18, scale=6), nullable=False),
+            sa.Column('source', sa.String(length=20), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('currency', 'date', name='uq_exchange_rates_currency_date')
+        )
+
+
+def downgrade():
+    op.drop_table('exchange_rates')
@@ -0,0 +1,58 @@
+"""add cash flow rollup and stock snapshot tables
+
+Databases created with create_db.py before these models existed lack the
+tables; ones created since already have them and are left alone. After
+upgrading, fill the rollup with `flask rebuild-cash-flow`.
+
+Revision ID: 4c1e8a2f9b03
+Revises: 2b9e6d4a1c57
+Create Date: 2026-10-18 10:12:41.318024
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e8a2f9b03'
+down_revision = '2b9e6d4a1c57'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('cash_flow_daily'):
+        op.create_table(
+            'cash_flow_daily',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('type', sa.String(length=20), nullable=False),
+            sa.Column('currency', sa.String(length=3), nullable=False),
+            sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'date', 'type', 'currency', name='uq_cash_flow_daily_key')
+        )
+    if not _has_table('stock_snapshots'):
+        op.create_table(
+            'stock_snapshots',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Float(), nullable=False),
+            sa.Column('taken_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_stock_snapshots_product_taken_at', 'stock_snapshots', ['product_id', 'taken_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_snapshots_product_taken_at', table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
+    op.drop_table('cash_flow_daily')
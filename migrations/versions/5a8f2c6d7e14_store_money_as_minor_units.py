@@ -0,0 +1,84 @@
+"""store money columns as integer hundredths
+
+Prices, bill and invoice totals, payments, transactions and the cash flow
+rollup move from REAL/NUMERIC to BIGINT minor units (value * 100, rounded
+half away from zero). Columns that are already integers are left alone.
+
+Revision ID: 5a8f2c6d7e14
+Revises: e3b7c1d95a40
+Create Date: 2026-10-18 19:05:41.218306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8f2c6d7e14'
+down_revision = 'e3b7c1d95a40'
+branch_labels = None
+depends_on = None
+
+# (table, column, type before this revision)
+MONEY_COLUMNS = (
+    ('products', 'purchase_price', sa.Float()),
+    ('products', 'sell_price', sa.Float()),
+    ('bills', 'total_amount', sa.Numeric(10, 2)),
+    ('bills', 'paid_amount', sa.Numeric(10, 2)),
+    ('bill_items', 'price', sa.Numeric(10, 2)),
+    ('payments', 'amount', sa.Numeric(10, 2)),
+    ('payments', 'original_amount', sa.Numeric(10, 2)),
+    ('transaction', 'amount', sa.Float()),
+    ('cash_flow_daily', 'amount', sa.Numeric(18, 2)),
+    ('purchase_invoices', 'total', sa.Numeric(12, 2)),
+    ('purchase_invoice_items', 'unit_price', sa.Numeric(10, 2)),
+    ('purchase_invoice_items', 'total', sa.Numeric(12, 2)),
+)
+
+
+def _columns_to_convert(to_integer):
+    """{table: [(column, old type)]} for the columns not yet of the wanted kind."""
+    inspector = sa.inspect(op.get_bind())
+    pending = {}
+    for table, column, old_type in MONEY_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        current = {c['name']: c['type'] for c in inspector.get_columns(table)}
+        if column in current and isinstance(current[column], sa.Integer) != to_integer:
+            pending.setdefault(table, []).append((column, old_type))
+    return pending
+
+
+def _rescale(table, columns, expression):
+    target = sa.table(table, *(sa.column(column) for column, _ in columns))
+    op.execute(target.update().values({
+        column: expression(target.c[column]) for column, _ in columns
+    }))
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, columns in _columns_to_convert(to_integer=True).items():
+        if postgresql:
+            for column, _ in columns:
+                op.alter_column(table, column, type_=sa.BigInteger(),
+                                postgresql_using=f'ROUND({column} * 100)::bigint')
+            continue
+        # SQLite rounds half away from zero too; the table copy then casts to INTEGER
+        _rescale(table, columns, lambda value: sa.func.round(value * 100))
+        with op.batch_alter_table(table) as batch_op:
+            for column, old_type in columns:
+                batch_op.alter_column(column, existing_type=old_type, type_=sa.BigInteger())
+
+
+def downgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, columns in _columns_to_convert(to_integer=False).items():
+        if postgresql:
+            for column, old_type in columns:
+                op.alter_column(table, column, type_=old_type, postgresql_using=f'{column} / 100.0')
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            for column, old_type in columns:
+                batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=old_type)
+        _rescale(table, columns, lambda value: value / 100.0)
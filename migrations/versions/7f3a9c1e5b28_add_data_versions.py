@@ -0,0 +1,38 @@
+"""add per-user data versions for conditional list requests
+
+data_versions holds one write counter per user and list (products,
+transactions, purchase_invoices). Writes bump it in their own transaction
+and the list APIs turn it into a weak ETag, answering 304 when the client
+already has the current version.
+
+Revision ID: 7f3a9c1e5b28
+Revises: b61d4e7a3c92
+Create Date: 2026-10-18 23:41:07.316254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3a9c1e5b28'
+down_revision = 'b61d4e7a3c92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('data_versions'):
+        op.create_table(
+            'data_versions',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('dataset', sa.String(length=40), nullable=False),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('user_id', 'dataset')
+        )
+
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table('data_versions'):
+        op.drop_table('data_versions')
@@ -0,0 +1,52 @@
+"""add composite indexes for the dashboard, billing, inventory and cash flow queries
+
+Every hot query filters by tenant first, so each index leads with user_id
+(or the parent key for child tables) followed by the filter or sort column.
+
+Revision ID: 9d27b5e0c6a1
+Revises: 4c1e8a2f9b03
+Create Date: 2026-10-18 10:31:07.902216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d27b5e0c6a1'
+down_revision = '4c1e8a2f9b03'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_transaction_user_date', 'transaction', ['user_id', 'date']),
+    ('ix_bills_user_status_due', 'bills', ['user_id', 'status', 'due_date']),
+    ('ix_bills_user_paid_date', 'bills', ['user_id', 'paid_date']),
+    ('ix_bill_items_bill_id', 'bill_items', ['bill_id']),
+    ('ix_purchase_invoices_user_date', 'purchase_invoices', ['user_id', 'date']),
+    ('ix_stock_movements_product_timestamp', 'stock_movements', ['product_id', 'timestamp']),
+    ('ix_payments_bill_id', 'payments', ['bill_id']),
+    ('ix_payments_purchase_invoice_id', 'payments', ['purchase_invoice_id']),
+    ('ix_products_user_stock', 'products', ['user_id', 'stock_qty', 'min_stock']),
+    ('ix_products_user_name', 'products', ['user_id', 'name', 'id']),
+    ('ix_client_user_id', 'client', ['user_id']),
+    ('ix_vendors_user_id', 'vendors', ['user_id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        # Databases built by create_all() after the models declared these already have them
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
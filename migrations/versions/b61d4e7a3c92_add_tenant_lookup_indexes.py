@@ -0,0 +1,50 @@
+"""index the remaining tenant-scoped lookups
+
+Clients and vendors are looked up by (user_id, email) when created or
+edited, and the purchases category by (user_id, type, name). The
+single-column user_id indexes on client and vendors are replaced by the
+composite ones, which lead with user_id and so still serve the list pages.
+
+Revision ID: b61d4e7a3c92
+Revises: 5a8f2c6d7e14
+Create Date: 2026-10-18 20:12:44.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61d4e7a3c92'
+down_revision = '5a8f2c6d7e14'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns, index it replaces)
+INDEXES = [
+    ('ix_client_user_email', 'client', ['user_id', 'email'], ('ix_client_user_id', ['user_id'])),
+    ('ix_vendors_user_email', 'vendors', ['user_id', 'email'], ('ix_vendors_user_id', ['user_id'])),
+    ('ix_category_user_type_name', 'category', ['user_id', 'type', 'name'], None),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns, replaces in INDEXES:
+        existing = _existing_indexes(table)
+        if name not in existing:
+            op.create_index(name, table, columns)
+        if replaces and replaces[0] in existing:
+            op.drop_index(replaces[0], table_name=table)
+
+
+def downgrade():
+    for name, table, columns, replaces in reversed(INDEXES):
+        existing = _existing_indexes(table)
+        if replaces and replaces[0] not in existing:
+            op.create_index(replaces[0], table, replaces[1])
+        if name in existing:
+            op.drop_index(name, table_name=table)
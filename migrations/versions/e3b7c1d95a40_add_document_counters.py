@@ -0,0 +1,60 @@
+"""add per-user document counters and make bill numbers unique per user
+
+Bill numbers and generated SKUs now come from document_counters, one row
+per user, series and period. Numbers are counted per user, so the unique
+constraint on bills.bill_number becomes one on (user_id, bill_number).
+
+Revision ID: e3b7c1d95a40
+Revises: 9d27b5e0c6a1
+Create Date: 2026-10-18 11:02:15.640981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b7c1d95a40'
+down_revision = '9d27b5e0c6a1'
+branch_labels = None
+depends_on = None
+
+# Names SQLite's unnamed UNIQUE (bill_number) so batch mode can drop it
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def _unique_constraints(table):
+    return {
+        tuple(constraint['column_names']): constraint['name']
+        for constraint in sa.inspect(op.get_bind()).get_unique_constraints(table)
+    }
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('document_counters'):
+        op.create_table(
+            'document_counters',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('series', sa.String(length=20), nullable=False),
+            sa.Column('period', sa.String(length=10), nullable=False),
+            sa.Column('next_value', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('user_id', 'series', 'period')
+        )
+
+    constraints = _unique_constraints('bills')
+    if ('user_id', 'bill_number') in constraints and ('bill_number',) not in constraints:
+        return
+    with op.batch_alter_table('bills', naming_convention=NAMING_CONVENTION) as batch_op:
+        if ('bill_number',) in constraints:
+            batch_op.drop_constraint(constraints[('bill_number',)] or 'uq_bills_bill_number', type_='unique')
+        if ('user_id', 'bill_number') not in constraints:
+            batch_op.create_unique_constraint('uq_bills_user_bill_number', ['user_id', 'bill_number'])
+
+
+def downgrade():
+    # Fails if two users already share a bill number
+    with op.batch_alter_table('bills') as batch_op:
+        batch_op.drop_constraint('uq_bills_user_bill_number', type_='unique')
+        batch_op.create_unique_constraint('uq_bills_bill_number', ['bill_number'])
+    op.drop_table('document_counters')
@@ -1,9 +1,12 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from services.database import ProfiledSQLAlchemy
+from services.money import MinorUnits, money_expr
 
 # Initialize SQLAlchemy
-db = SQLAlchemy()
+db = ProfiledSQLAlchemy()
 
 # Association Tables
 client_tag = db.Table(
@@ -20,14 +23,22 @@ vendor_tags = db.Table(
     db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), nullable=False)
 )
 
+# Rows owned by one user; services.tenancy filters queries on them by user_id
+class TenantOwned:
+    pass
+
 # Database Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
 
-class Product(db.Model):
+class Product(TenantOwned, db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user_stock', 'user_id', 'stock_qty', 'min_stock'),
+        db.Index('ix_products_user_name', 'user_id', 'name', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     sku = db.Column(db.String(50), unique=True, nullable=False)
@@ -36,8 +47,8 @@ class Product(db.Model):
     category = db.Column(db.String(100), nullable=False)
     buying_date = db.Column(db.Date, nullable=False)
     unit = db.Column(db.String(20), nullable=False, default='piece')
-    purchase_price = db.Column(db.Float, nullable=False)
-    sell_price = db.Column(db.Float, nullable=False)
+    purchase_price = db.Column(MinorUnits, nullable=False)
+    sell_price = db.Column(MinorUnits, nullable=False)
     stock_qty = db.Column(db.Float, nullable=False, default=0)
     min_stock = db.Column(db.Float, nullable=False, default=0)
     max_stock = db.Column(db.Float, nullable=False, default=0)
@@ -48,6 +59,7 @@ class Product(db.Model):
     # Relationships
     stock_movements = db.relationship('StockMovement', backref='product', lazy=True, cascade='all, delete-orphan')
     inventory_adjustments = db.relationship('InventoryAdjustment', backref='product', lazy=True, cascade='all, delete-orphan')
+    stock_snapshots = db.relationship('StockSnapshot', backref='product', lazy=True, cascade='all, delete-orphan')
     bill_items = db.relationship('BillItem', backref='product', lazy=True)
 
     def __repr__(self):
@@ -73,8 +85,9 @@ class Order(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(50), default='Pending')
 
-class Client(db.Model):
+class Client(TenantOwned, db.Model):
     __tablename__ = 'client'
+    __table_args__ = (db.Index('ix_client_user_email', 'user_id', 'email'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     name = db.Column(db.String(100), nullable=False)
@@ -89,8 +102,9 @@ class Client(db.Model):
     tags = db.relationship('Tag', secondary=client_tag, backref='clients', lazy=True)
     contacts = db.relationship('Contact', backref='client', lazy=True)
 
-class Vendor(db.Model):
+class Vendor(TenantOwned, db.Model):
     __tablename__ = 'vendors'
+    __table_args__ = (db.Index('ix_vendors_user_email', 'user_id', 'email'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -126,23 +140,29 @@ class Contact(db.Model):
     type = db.Column(db.String(20), nullable=False)  # "billing", "general", "legal", "technical"
     notes = db.Column(db.Text, nullable=True)
 
-class Tag(db.Model):
+class Tag(TenantOwned, db.Model):
     __tablename__ = 'tags'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(50), nullable=False)
 
-class Bill(db.Model):
+class Bill(TenantOwned, db.Model):
     __tablename__ = 'bills'
+    __table_args__ = (
+        db.Index('ix_bills_user_status_due', 'user_id', 'status', 'due_date'),
+        db.Index('ix_bills_user_paid_date', 'user_id', 'paid_date'),
+        # Numbers are counted per user, so two users may both have BILL-2026-000001
+        db.UniqueConstraint('user_id', 'bill_number', name='uq_bills_user_bill_number'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=True)
-    bill_number = db.Column(db.String(50), unique=True)
+    bill_number = db.Column(db.String(50))
     issue_date = db.Column(db.Date, nullable=False)
     due_date = db.Column(db.Date, nullable=False)
-    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
-    paid_amount = db.Column(db.Numeric(10, 2))
+    total_amount = db.Column(MinorUnits, nullable=False)
+    paid_amount = db.Column(MinorUnits)
     currency = db.Column(db.String(3), default='PYG')
     status = db.Column(db.String(20), default='Pending')  # Pending, Partially Paid, Paid
     notes = db.Column(db.Text)
@@ -166,11 +186,12 @@ class Bill(db.Model):
 
 class BillItem(db.Model):
     __tablename__ = 'bill_items'
+    __table_args__ = (db.Index('ix_bill_items_bill_id', 'bill_id'),)
     id = db.Column(db.Integer, primary_key=True)
     bill_id = db.Column(db.Integer, db.ForeignKey('bills.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Numeric(10, 2), nullable=False)
-    price = db.Column(db.Numeric(10, 2), nullable=False)
+    price = db.Column(MinorUnits, nullable=False)
     tax_rate = db.Column(db.Numeric(5, 2), default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -191,11 +212,15 @@ class BillItem(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_bill_id', 'bill_id'),
+        db.Index('ix_payments_purchase_invoice_id', 'purchase_invoice_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     bill_id = db.Column(db.Integer, db.ForeignKey('bills.id'), nullable=True)
     purchase_invoice_id = db.Column(db.Integer, db.ForeignKey('purchase_invoices.id'), nullable=True)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
-    original_amount = db.Column(db.Numeric(10, 2), nullable=True)
+    amount = db.Column(MinorUnits, nullable=False)
+    original_amount = db.Column(MinorUnits, nullable=True)
     original_currency = db.Column(db.String(3), nullable=True)
     payment_date = db.Column(db.Date, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
@@ -206,22 +231,35 @@ class Payment(db.Model):
     # Relationships
     related_purchase_invoice = db.relationship('PurchaseInvoice', backref='invoice_payments', foreign_keys=[purchase_invoice_id])
 
-class Category(db.Model):
+class ExchangeRate(db.Model):
+    __tablename__ = 'exchange_rates'
+    __table_args__ = (db.UniqueConstraint('currency', 'date', name='uq_exchange_rates_currency_date'),)
+    id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), nullable=False)  # ISO 4217 code
+    date = db.Column(db.Date, nullable=False)
+    rate = db.Column(db.Numeric(18, 6), nullable=False)  # PYG per unit of currency
+    source = db.Column(db.String(20))  # 'bcp', 'er-api', ...
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Category(TenantOwned, db.Model):
     __tablename__ = 'category'
+    __table_args__ = (db.Index('ix_category_user_type_name', 'user_id', 'type', 'name'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(20), nullable=False)  # 'INCOME' or 'EXPENSE'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
-class Transaction(db.Model):
+class Transaction(TenantOwned, db.Model):
     __tablename__ = 'transaction'
+    __table_args__ = (db.Index('ix_transaction_user_date', 'user_id', 'date'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(20), nullable=False)  # 'INCOME', 'EXPENSE', 'TRANSFER'
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
     source_module = db.Column(db.String(50))  # e.g., 'invoice', 'manual', etc.
     source_id = db.Column(db.String(100))  # External ID (e.g., invoice ID)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(MinorUnits, nullable=False)
     currency = db.Column(db.String(3), default='PYG')  # ISO 4217 code
     exchange_rate = db.Column(db.Float, nullable=True)  # Optional
     date = db.Column(db.Date, nullable=False)
@@ -233,8 +271,37 @@ class Transaction(db.Model):
     # Relationships
     category = db.relationship('Category', backref='transactions')
 
+# Per-day transaction totals, kept in step with Transaction by services.cash_flow
+class CashFlowDaily(TenantOwned, db.Model):
+    __tablename__ = 'cash_flow_daily'
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', 'type', 'currency', name='uq_cash_flow_daily_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    type = db.Column(db.String(20), nullable=False)  # 'INCOME', 'EXPENSE', 'TRANSFER'
+    currency = db.Column(db.String(3), nullable=False)
+    amount = db.Column(MinorUnits, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# Next free number per user, document series and period ('' or the year),
+# reserved in blocks by services.numbering
+class DocumentCounter(TenantOwned, db.Model):
+    __tablename__ = 'document_counters'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    series = db.Column(db.String(20), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True, default='')
+    next_value = db.Column(db.Integer, nullable=False)
+
+class DataVersion(TenantOwned, db.Model):
+    # Write counter per user and list, behind the list APIs' ETags (services.data_versions)
+    __tablename__ = 'data_versions'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    dataset = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
 class StockMovement(db.Model):
     __tablename__ = 'stock_movements'
+    __table_args__ = (db.Index('ix_stock_movements_product_timestamp', 'product_id', 'timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
     type = db.Column(db.String(20), nullable=False)  # purchase, sale, adjustment, return
@@ -246,7 +313,16 @@ class StockMovement(db.Model):
     def __repr__(self):
         return f'<StockMovement {self.type} {self.quantity} units>'
 
-class InventoryAdjustment(db.Model):
+# Stock level of a product at a checkpoint; movements after taken_at are replayed on top
+class StockSnapshot(db.Model):
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (db.Index('ix_stock_snapshots_product_taken_at', 'product_id', 'taken_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class InventoryAdjustment(TenantOwned, db.Model):
     __tablename__ = 'inventory_adjustments'
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -255,15 +331,16 @@ class InventoryAdjustment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-class PurchaseInvoice(db.Model):
+class PurchaseInvoice(TenantOwned, db.Model):
     __tablename__ = 'purchase_invoices'
+    __table_args__ = (db.Index('ix_purchase_invoices_user_date', 'user_id', 'date'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     invoice_number = db.Column(db.String(50), nullable=False)
     date = db.Column(db.Date, nullable=False)
     due_date = db.Column(db.Date, nullable=True)
     vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), nullable=False)
-    total = db.Column(db.Numeric(12, 2), nullable=False)
+    total = db.Column(MinorUnits, nullable=False)
     status = db.Column(db.String(20), default='unpaid')  # 'paid', 'unpaid', 'partial'
     notes = db.Column(db.Text)
     attached_file = db.Column(db.String(255))  # URL to the uploaded file
@@ -278,11 +355,18 @@ class PurchaseInvoice(db.Model):
     def is_overdue(self):
         return self.status != 'paid' and self.due_date and self.due_date < datetime.now().date()
 
-    @property
+    @hybrid_property
     def balance_due(self):
         paid_amount = sum(payment.amount for payment in self.invoice_payments)
         return self.total - paid_amount
 
+    @balance_due.expression
+    def balance_due(cls):
+        paid_amount = db.select(db.func.coalesce(db.func.sum(Payment.amount), 0)).where(
+            Payment.purchase_invoice_id == cls.id
+        ).scalar_subquery()
+        return money_expr(cls.total - paid_amount)
+
 class PurchaseInvoiceItem(db.Model):
     __tablename__ = 'purchase_invoice_items'
     id = db.Column(db.Integer, primary_key=True)
@@ -290,9 +374,9 @@ class PurchaseInvoiceItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=True)
     description = db.Column(db.Text, nullable=False)
     quantity = db.Column(db.Numeric(10, 2), nullable=False)
-    unit_price = db.Column(db.Numeric(10, 2), nullable=False)
+    unit_price = db.Column(MinorUnits, nullable=False)
     tax_rate = db.Column(db.Numeric(5, 2), default=0)
-    total = db.Column(db.Numeric(12, 2), nullable=False)
+    total = db.Column(MinorUnits, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
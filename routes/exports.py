@@ -0,0 +1,42 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_login import login_required, current_user
+from datetime import datetime
+from services.exports import EXPORTS, EXPORT_FORMATS, iter_export, gzip_stream
+
+bp = Blueprint('exports', __name__)
+
+@bp.route('/api/exports/<dataset>', methods=['GET'])
+@login_required
+def export_dataset(dataset):
+    """Stream a dataset as CSV or NDJSON.
+
+    Query args: start_date, end_date (YYYY-MM-DD, both optional and
+    inclusive), format (csv|ndjson) and gzip=1 to compress on the fly.
+    """
+    if dataset not in EXPORTS:
+        return jsonify({'error': f'Unknown export: {dataset}. Available: {", ".join(EXPORTS)}'}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format: {fmt}. Use csv or ndjson'}), 400
+
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    query = EXPORTS[dataset](current_user.id, start_date, end_date)
+    body = iter_export(query, fmt)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{dataset}_{start_date or 'start'}_{end_date or 'end'}.{fmt}"
+    if request.args.get('gzip') in ('1', 'true'):
+        body = gzip_stream(body)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
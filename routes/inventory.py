@@ -1,44 +1,104 @@
 from flask import Blueprint, jsonify, request, current_app
 from models import db, Product, StockMovement, InventoryAdjustment, Category
-from datetime import datetime
+from datetime import datetime, time
+from sqlalchemy import case, func, or_
+from services.pagination import encode_cursor, decode_cursor, keyset_after, parse_limit
+from services.rows import RowView
+from services.money import from_minor
 from flask_login import login_required, current_user
-import random
-import string
+from services.data_versions import data_versions
+from services.product_import import ProductImporter, detect_format, free_skus, IMPORT_CHUNK_SIZE
+from services.stock import change_stock
+from services.stock_snapshots import stock_as_of
 
 inventory = Blueprint('inventory', __name__)
 
-def generate_sku():
-    """Generate a unique 25-character SKU."""
-    while True:
-        # Generate a random string of 25 characters (letters and numbers)
-        chars = string.ascii_uppercase + string.digits
-        sku = ''.join(random.choice(chars) for _ in range(25))
-        
-        # Check if SKU already exists
-        if not Product.query.filter_by(sku=sku).first():
-            return sku
+# Columns /api/products can return, in response order; ?fields= selects a subset
+PRODUCT_FIELDS = {
+    'id': Product.id,
+    'sku': Product.sku,
+    'name': Product.name,
+    'description': Product.description,
+    'category': Product.category,
+    'buying_date': Product.buying_date,
+    'unit': Product.unit,
+    'purchase_price': Product.purchase_price,
+    'sell_price': Product.sell_price,
+    'stock_qty': Product.stock_qty,
+    'min_stock': Product.min_stock,
+    'max_stock': Product.max_stock,
+    'tax_rate': Product.tax_rate,
+    'created_at': Product.created_at,
+    'updated_at': Product.updated_at
+}
+
+PRODUCT_ROWS = RowView(PRODUCT_FIELDS)
+
+# Keyset orderings; each ends in id so the cursor is unique
+PRODUCT_SORTS = {
+    'name': ('name', 'id'),
+    'id': ('id',)
+}
+
+PRODUCTS_PAGE_SIZE = 100
+PRODUCTS_MAX_PAGE_SIZE = 1000
+
+def like_pattern(text):
+    """A LIKE pattern matching ``text`` anywhere, with its own % and _ taken literally (escape '\\')."""
+    text = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{text}%'
 
 @inventory.route('/api/products', methods=['GET'])
 @login_required
+@data_versions.conditional('products')
 def get_products():
-    products = Product.query.filter_by(user_id=current_user.id).all()
-    return jsonify([{
-        'id': p.id,
-        'sku': p.sku,
-        'name': p.name,
-        'description': p.description,
-        'category': p.category,
-        'buying_date': p.buying_date.isoformat() if p.buying_date else None,
-        'unit': p.unit,
-        'purchase_price': p.purchase_price,
-        'sell_price': p.sell_price,
-        'stock_qty': p.stock_qty,
-        'min_stock': p.min_stock,
-        'max_stock': p.max_stock,
-        'tax_rate': p.tax_rate,
-        'created_at': p.created_at.isoformat(),
-        'updated_at': p.updated_at.isoformat()
-    } for p in products])
+    """List the user's products one keyset page at a time.
+
+    Query args: limit, cursor (from the X-Next-Cursor header of the previous
+    page), sort (name|id), fields (comma separated), category, q (matches
+    name or SKU).
+    """
+    sort = request.args.get('sort', 'name')
+    if sort not in PRODUCT_SORTS:
+        return jsonify({'error': f'Invalid sort: {sort}'}), 400
+    sort_fields = PRODUCT_SORTS[sort]
+
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(PRODUCT_FIELDS)
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown:
+        return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    # The sort key is always returned so the client can see where the page ends
+    fields = [f for f in PRODUCT_FIELDS if f in fields or f in sort_fields]
+
+    try:
+        limit = parse_limit(request.args.get('limit'), PRODUCTS_PAGE_SIZE, PRODUCTS_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None and len(after) != len(sort_fields):
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sort_columns = [PRODUCT_FIELDS[f] for f in sort_fields]
+    query = PRODUCT_ROWS.select(fields).where(Product.user_id == current_user.id)
+    if request.args.get('category'):
+        query = query.where(Product.category == request.args['category'])
+    if request.args.get('q'):
+        pattern = like_pattern(request.args['q'])
+        query = query.where(or_(Product.name.ilike(pattern, escape='\\'), Product.sku.ilike(pattern, escape='\\')))
+    if after is not None:
+        query = query.where(keyset_after(sort_columns, after))
+
+    rows = PRODUCT_ROWS.fetch(query.order_by(*sort_columns).limit(limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    response = jsonify(list(PRODUCT_ROWS.dicts(rows, fields)))
+    if has_more:
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = encode_cursor([getattr(last, f) for f in sort_fields])
+    return response
 
 @inventory.route('/api/products', methods=['POST'])
 @login_required
@@ -51,8 +111,8 @@ def create_product():
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
-    # Generate unique SKU
-    sku = generate_sku()
+    # Next SKU from the user's counter that no one has typed in by hand
+    sku, = free_skus(current_user.id, 1)
     
     # Parse buying_date from string to date object
     try:
@@ -85,7 +145,7 @@ def create_product():
         'name': product.name,
         'description': product.description,
         'category': product.category,
-        'buying_date': product.buying_date.isoformat(),
+        'buying_date': product.buying_date,
         'unit': product.unit,
         'purchase_price': product.purchase_price,
         'sell_price': product.sell_price,
@@ -93,10 +153,27 @@ def create_product():
         'min_stock': product.min_stock,
         'max_stock': product.max_stock,
         'tax_rate': product.tax_rate,
-        'created_at': product.created_at.isoformat(),
-        'updated_at': product.updated_at.isoformat()
+        'created_at': product.created_at,
+        'updated_at': product.updated_at
     }), 201
 
+@inventory.route('/api/products/import', methods=['POST'])
+@login_required
+def import_products():
+    """Bulk import products from an uploaded CSV or NDJSON file (form field 'file')."""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'Missing file upload'}), 400
+    try:
+        fmt = detect_format(upload.filename, request.form.get('format') or request.args.get('format'))
+        chunk_size = parse_limit(request.args.get('chunk_size'), IMPORT_CHUNK_SIZE, 10000)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The upload is spooled to disk by Werkzeug and parsed line by line
+    report = ProductImporter(current_user.id, chunk_size=chunk_size).run(upload.stream, fmt)
+    return jsonify(report), 200 if not report['failed'] else 207
+
 @inventory.route('/api/products/<int:product_id>', methods=['GET'])
 @login_required
 def get_product(product_id):
@@ -106,15 +183,15 @@ def get_product(product_id):
         'sku': product.sku,
         'name': product.name,
         'description': product.description,
-        'category_id': product.category_id,
+        'category': product.category,
         'unit': product.unit,
         'purchase_price': product.purchase_price,
         'sell_price': product.sell_price,
         'stock_qty': product.stock_qty,
         'min_stock': product.min_stock,
         'tax_rate': product.tax_rate,
-        'created_at': product.created_at.isoformat(),
-        'updated_at': product.updated_at.isoformat()
+        'created_at': product.created_at,
+        'updated_at': product.updated_at
     })
 
 @inventory.route('/api/products/<int:product_id>', methods=['PATCH'])
@@ -156,7 +233,7 @@ def update_product(product_id):
             'name': product.name,
             'description': product.description,
             'category': product.category,
-            'buying_date': product.buying_date.isoformat() if product.buying_date else None,
+            'buying_date': product.buying_date,
             'unit': product.unit,
             'purchase_price': product.purchase_price,
             'sell_price': product.sell_price,
@@ -164,8 +241,8 @@ def update_product(product_id):
             'min_stock': product.min_stock,
             'max_stock': product.max_stock,
             'tax_rate': product.tax_rate,
-            'created_at': product.created_at.isoformat(),
-            'updated_at': product.updated_at.isoformat()
+            'created_at': product.created_at,
+            'updated_at': product.updated_at
         })
     except Exception as e:
         db.session.rollback()
@@ -191,6 +268,14 @@ def adjust_stock(product_id):
     quantity = float(data['quantity'])
     reason = data['reason']
     
+    # Update stock quantity in the database; a removal cannot take it below zero
+    shortfalls = change_stock({product.id: quantity}, user_id=current_user.id)
+    if shortfalls:
+        db.session.rollback()
+        return jsonify({
+            'error': f"Insufficient stock for {product.name}. Available: {shortfalls[0]['available']}"
+        }), 400
+    
     # Create inventory adjustment
     adjustment = InventoryAdjustment(
         product_id=product.id,
@@ -198,9 +283,8 @@ def adjust_stock(product_id):
         reason=reason,
         user_id=current_user.id
     )
-    
-    # Update stock quantity
-    product.stock_qty += quantity
+    db.session.add(adjustment)
+    db.session.flush()  # Get adjustment ID
     
     # Record stock movement
     movement = StockMovement(
@@ -210,8 +294,6 @@ def adjust_stock(product_id):
         source_id=adjustment.id,
         source_type='adjustment'
     )
-    
-    db.session.add(adjustment)
     db.session.add(movement)
     db.session.commit()
     
@@ -220,23 +302,95 @@ def adjust_stock(product_id):
         'product_id': adjustment.product_id,
         'quantity': adjustment.quantity,
         'reason': adjustment.reason,
-        'created_at': adjustment.created_at.isoformat()
+        'created_at': adjustment.created_at
     }), 201
 
+STOCK_MOVEMENTS_PAGE_SIZE = 100
+STOCK_MOVEMENTS_MAX_PAGE_SIZE = 1000
+
+STOCK_MOVEMENT_ROWS = RowView({
+    'id': StockMovement.id,
+    'type': StockMovement.type,
+    'quantity': StockMovement.quantity,
+    'source_id': StockMovement.source_id,
+    'source_type': StockMovement.source_type,
+    'timestamp': StockMovement.timestamp
+})
+
 @inventory.route('/api/products/<int:product_id>/stock-movements', methods=['GET'])
 @login_required
 def get_stock_movements(product_id):
+    """Newest-first movements of a product, one page at a time (limit, cursor)."""
     product = Product.query.filter_by(id=product_id, user_id=current_user.id).first_or_404()
-    movements = StockMovement.query.filter_by(product_id=product.id).order_by(StockMovement.timestamp.desc()).all()
+
+    try:
+        limit = parse_limit(request.args.get('limit'), STOCK_MOVEMENTS_PAGE_SIZE, STOCK_MOVEMENTS_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None:
+            after = [datetime.fromisoformat(after[0]), int(after[1])]
+    except (ValueError, IndexError, TypeError):
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    query = STOCK_MOVEMENT_ROWS.select().where(StockMovement.product_id == product.id)
+    if after is not None:
+        query = query.where(keyset_after([StockMovement.timestamp, StockMovement.id], after, descending=True))
+    movements = STOCK_MOVEMENT_ROWS.fetch(
+        query.order_by(StockMovement.timestamp.desc(), StockMovement.id.desc()).limit(limit + 1)
+    )
+    has_more = len(movements) > limit
+    movements = movements[:limit]
     
+    response = jsonify(list(STOCK_MOVEMENT_ROWS.dicts(movements)))
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_cursor([movements[-1].timestamp.isoformat(), movements[-1].id])
+    return response
+
+@inventory.route('/api/products/stock-as-of', methods=['GET'])
+@login_required
+def get_stock_as_of():
+    """Stock of the given products (ids=1,2,3) at a point in time (at=ISO date or datetime, UTC)."""
+    at = request.args.get('at')
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+        at_time = datetime.fromisoformat(at) if at else datetime.utcnow()
+        if at and len(at) == 10:
+            # A bare date means the end of that day
+            at_time = datetime.combine(at_time.date(), time.max)
+    except ValueError:
+        return jsonify({'error': 'ids must be comma separated integers and at an ISO date or datetime'}), 400
+    if not ids:
+        return jsonify({'error': 'Missing required parameter: ids'}), 400
+
+    owned = [pid for pid, in db.session.query(Product.id).filter(Product.user_id == current_user.id, Product.id.in_(ids))]
+    stock = stock_as_of(owned, at_time)
     return jsonify([{
-        'id': m.id,
-        'type': m.type,
-        'quantity': m.quantity,
-        'source_id': m.source_id,
-        'source_type': m.source_type,
-        'timestamp': m.timestamp.isoformat()
-    } for m in movements])
+        'product_id': product_id,
+        'as_of': at_time,
+        'stock_qty': stock[product_id]['quantity'],
+        'snapshot_at': stock[product_id]['snapshot_at'],
+        'movements_replayed': stock[product_id]['replayed']
+    } for product_id in owned])
+
+@inventory.route('/api/products/stats', methods=['GET'])
+@login_required
+@data_versions.conditional('products')
+def get_product_stats():
+    """Catalog totals for the inventory page, which only loads a page of products at a time."""
+    products, low_stock, stock_value, categories = db.session.query(
+        func.count(Product.id),
+        func.sum(case((Product.stock_qty <= Product.min_stock, 1), else_=0)),
+        # Hundredths, as purchase_price is stored
+        func.sum(Product.stock_qty * Product.purchase_price),
+        func.count(func.distinct(Product.category))
+    ).filter(Product.user_id == current_user.id).one()
+
+    return jsonify({
+        'products': products,
+        'low_stock': low_stock or 0,
+        'stock_value': from_minor(round(stock_value or 0)),
+        'categories': categories
+    })
 
 @inventory.route('/api/products/low-stock', methods=['GET'])
 @login_required
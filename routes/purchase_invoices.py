@@ -2,9 +2,15 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
-from models import db, PurchaseInvoice, PurchaseInvoiceItem, Product, StockMovement, Transaction, Category
+from models import db, PurchaseInvoice, PurchaseInvoiceItem, StockMovement, Transaction, Category, Payment, Vendor
 from flask_login import login_required, current_user
 from decimal import Decimal
+from sqlalchemy import func
+from services.pagination import encode_cursor, decode_cursor, keyset_after, parse_limit
+from services.rows import RowView
+from services.money import round_cents
+from services.stock import change_stock
+from services.data_versions import data_versions
 
 bp = Blueprint('purchase_invoices', __name__)
 
@@ -37,31 +43,23 @@ def create_purchase_invoice():
             notes=data.get('notes')
         )
 
-        # Calculate total from items
-        total = 0
+        # Calculate total from items; lines are rounded to the cent so they add up to the total
+        total = Decimal('0')
+        received = []  # (product_id, quantity) per item
         for item_data in data['items']:
+            quantity = Decimal(str(item_data['quantity']))
+            unit_price = Decimal(str(item_data['unit_price']))
+            tax_rate = Decimal(str(item_data.get('tax_rate', '0')))
             item = PurchaseInvoiceItem(
                 description=item_data['description'],
-                quantity=item_data['quantity'],
-                unit_price=item_data['unit_price'],
-                tax_rate=item_data.get('tax_rate', 0),
-                total=item_data['quantity'] * item_data['unit_price'] * (1 + item_data.get('tax_rate', 0) / 100)
+                quantity=quantity,
+                unit_price=unit_price,
+                tax_rate=tax_rate,
+                total=round_cents(quantity * unit_price * (1 + tax_rate / 100))
             )
             if 'product_id' in item_data:
                 item.product_id = item_data['product_id']
-                # Update product stock
-                product = Product.query.get(item_data['product_id'])
-                if product:
-                    product.stock_qty += item_data['quantity']
-                    # Create stock movement
-                    movement = StockMovement(
-                        product_id=product.id,
-                        type='purchase',
-                        quantity=item_data['quantity'],
-                        source_id=invoice.id,
-                        source_type='purchase_invoice'
-                    )
-                    db.session.add(movement)
+                received.append((item.product_id, item_data['quantity']))
             total += item.total
             invoice.items.append(item)
 
@@ -79,6 +77,22 @@ def create_purchase_invoice():
                 invoice.attached_file = file_path
 
         db.session.add(invoice)
+        db.session.flush()  # Get invoice ID
+
+        # Update product stock; products that are not the user's are skipped
+        stock_changes = {}
+        for product_id, quantity in received:
+            stock_changes[product_id] = stock_changes.get(product_id, 0) + float(quantity)
+        skipped = {line['product_id'] for line in change_stock(stock_changes, user_id=current_user.id)}
+        for product_id, quantity in received:
+            if product_id not in skipped:
+                db.session.add(StockMovement(
+                    product_id=product_id,
+                    type='purchase',
+                    quantity=quantity,
+                    source_id=invoice.id,
+                    source_type='purchase_invoice'
+                ))
         db.session.commit()
 
         # Create transaction if invoice is paid
@@ -135,12 +149,12 @@ def get_purchase_invoice(invoice_id):
     return jsonify({
         'id': invoice.id,
         'invoice_number': invoice.invoice_number,
-        'date': invoice.date.isoformat(),
-        'due_date': invoice.due_date.isoformat() if invoice.due_date else None,
+        'date': invoice.date,
+        'due_date': invoice.due_date,
         'vendor_id': invoice.vendor_id,
         'vendor_name': invoice.vendor.name,
-        'total': float(invoice.total),
-        'paid_amount': float(paid_amount),
+        'total': invoice.total,
+        'paid_amount': paid_amount,
         'status': invoice.status,
         'notes': invoice.notes,
         'attached_file': invoice.attached_file,
@@ -148,10 +162,10 @@ def get_purchase_invoice(invoice_id):
             'id': item.id,
             'product_id': item.product_id,
             'description': item.description,
-            'quantity': float(item.quantity),
-            'unit_price': float(item.unit_price),
-            'tax_rate': float(item.tax_rate),
-            'total': float(item.total)
+            'quantity': item.quantity,
+            'unit_price': item.unit_price,
+            'tax_rate': item.tax_rate,
+            'total': item.total
         } for item in invoice.items]
     })
 
@@ -180,13 +194,12 @@ def update_purchase_invoice(invoice_id):
 
         # Update items if provided
         if 'items' in data:
-            # Remove existing items and revert stock changes
+            # Remove existing items and revert their stock, netted with the new items below
+            stock_changes = {}
+            received = []
             for item in invoice.items:
                 if item.product_id:
-                    product = Product.query.get(item.product_id)
-                    if product:
-                        # Convert Decimal to float for stock update
-                        product.stock_qty = float(product.stock_qty) - float(item.quantity)
+                    stock_changes[item.product_id] = stock_changes.get(item.product_id, 0) - float(item.quantity)
                 db.session.delete(item)
 
             # Add new items
@@ -201,31 +214,31 @@ def update_purchase_invoice(invoice_id):
                     quantity=quantity,
                     unit_price=unit_price,
                     tax_rate=tax_rate,
-                    total=quantity * unit_price * (1 + tax_rate / 100)
+                    total=round_cents(quantity * unit_price * (1 + tax_rate / 100))
                 )
                 
                 if 'product_id' in item_data and item_data['product_id']:
                     item.product_id = item_data['product_id']
-                    # Update product stock
-                    product = Product.query.get(item_data['product_id'])
-                    if product:
-                        # Convert Decimal to float for stock update
-                        product.stock_qty = float(product.stock_qty) + float(quantity)
-                        # Create stock movement
-                        movement = StockMovement(
-                            product_id=product.id,
-                            type='purchase',
-                            quantity=float(quantity),
-                            source_id=invoice.id,
-                            source_type='purchase_invoice'
-                        )
-                        db.session.add(movement)
+                    stock_changes[item.product_id] = stock_changes.get(item.product_id, 0) + float(quantity)
+                    received.append((item.product_id, float(quantity)))
                 
                 total += item.total
                 invoice.items.append(item)
 
             invoice.total = total
 
+            # Goods already sold may take the stock below zero when a purchase is reduced
+            skipped = {line['product_id'] for line in change_stock(stock_changes, user_id=current_user.id, allow_negative=True)}
+            for product_id, quantity in received:
+                if product_id not in skipped:
+                    db.session.add(StockMovement(
+                        product_id=product_id,
+                        type='purchase',
+                        quantity=quantity,
+                        source_id=invoice.id,
+                        source_type='purchase_invoice'
+                    ))
+
         db.session.commit()
 
         return jsonify({
@@ -237,8 +250,11 @@ def update_purchase_invoice(invoice_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+PURCHASE_INVOICES_MAX_PAGE_SIZE = 1000
+
 @bp.route('/purchase-invoices', methods=['GET'])
 @login_required
+@data_versions.conditional('purchase_invoices')
 def list_purchase_invoices():
     try:
         # Get filter parameters
@@ -247,36 +263,74 @@ def list_purchase_invoices():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        # Start with base query
-        query = PurchaseInvoice.query.filter_by(user_id=current_user.id)
+        # Pagination is opt-in: without a limit every matching invoice is returned
+        try:
+            limit = parse_limit(request.args.get('limit'), None, PURCHASE_INVOICES_MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+            if after is not None:
+                after = [datetime.strptime(after[0], '%Y-%m-%d').date(), int(after[1])]
+        except (ValueError, IndexError, TypeError):
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+        # Payment totals per invoice of this user, computed in one grouped pass
+        payments = db.session.query(
+            Payment.purchase_invoice_id.label('invoice_id'),
+            func.sum(Payment.amount).label('paid_amount'),
+            func.max(Payment.payment_date).label('last_payment')
+        ).join(
+            PurchaseInvoice, PurchaseInvoice.id == Payment.purchase_invoice_id
+        ).filter(
+            PurchaseInvoice.user_id == current_user.id
+        ).group_by(Payment.purchase_invoice_id).subquery()
+
+        # Invoice, vendor name and payment totals in one row; the subquery is
+        # per user, so the view is too
+        rows = RowView({
+            'id': PurchaseInvoice.id,
+            'invoice_number': PurchaseInvoice.invoice_number,
+            'date': PurchaseInvoice.date,
+            'due_date': PurchaseInvoice.due_date,
+            'vendor_id': PurchaseInvoice.vendor_id,
+            'vendor_name': Vendor.name,
+            'total': PurchaseInvoice.total,
+            'status': PurchaseInvoice.status,
+            'notes': PurchaseInvoice.notes,
+            'last_payment': payments.c.last_payment,
+            'paid_amount': func.coalesce(payments.c.paid_amount, 0)
+        })
+        query = rows.select().select_from(PurchaseInvoice).join(
+            PurchaseInvoice.vendor
+        ).outerjoin(
+            payments, payments.c.invoice_id == PurchaseInvoice.id
+        ).where(PurchaseInvoice.user_id == current_user.id)
 
         # Apply filters
         if vendor_id:
-            query = query.filter_by(vendor_id=vendor_id)
+            query = query.where(PurchaseInvoice.vendor_id == vendor_id)
         if status:
-            query = query.filter_by(status=status)
+            query = query.where(PurchaseInvoice.status == status)
         if start_date:
-            query = query.filter(PurchaseInvoice.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.where(PurchaseInvoice.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
-            query = query.filter(PurchaseInvoice.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.where(PurchaseInvoice.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+        if after is not None:
+            query = query.where(keyset_after([PurchaseInvoice.date, PurchaseInvoice.id], after, descending=True))
 
         # Execute query
-        invoices = query.order_by(PurchaseInvoice.date.desc()).all()
-
-        # Format response
-        return jsonify([{
-            'id': invoice.id,
-            'invoice_number': invoice.invoice_number,
-            'date': invoice.date.isoformat(),
-            'due_date': invoice.due_date.isoformat() if invoice.due_date else None,
-            'vendor_id': invoice.vendor_id,
-            'vendor_name': invoice.vendor.name,
-            'total': float(invoice.total),
-            'status': invoice.status,
-            'notes': invoice.notes,
-            'last_payment': max([p.payment_date.isoformat() for p in invoice.invoice_payments]) if invoice.invoice_payments else None,
-            'paid_amount': float(sum(payment.amount for payment in invoice.invoice_payments))
-        } for invoice in invoices])
+        query = query.order_by(PurchaseInvoice.date.desc(), PurchaseInvoice.id.desc())
+        if limit:
+            query = query.limit(limit + 1)
+        invoices = rows.fetch(query)
+        has_more = limit is not None and len(invoices) > limit
+        invoices = invoices[:limit]
+
+        # Streamed: without a limit this is every invoice the user has
+        response = current_app.json.array_response(rows.dicts(invoices))
+        if has_more:
+            last = invoices[-1]
+            response.headers['X-Next-Cursor'] = encode_cursor([last.date.isoformat(), last.id])
+        return response
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -298,32 +352,28 @@ def delete_purchase_invoice(invoice_id):
                 'error': 'Cannot delete invoice with existing payments. Please remove payments first.'
             }), 400
 
-        # Revert stock changes
-        for item in invoice.items:
-            if item.product_id:
-                product = Product.query.get(item.product_id)
-                if product:
-                    try:
-                        # Convert quantities to float for calculation
-                        current_stock = float(product.stock_qty)
-                        item_quantity = float(item.quantity)
-                        # Subtract the quantity since we're deleting a purchase
-                        product.stock_qty = current_stock - item_quantity
-                        
-                        # Create stock movement record
-                        movement = StockMovement(
-                            product_id=product.id,
-                            type='adjustment',
-                            quantity=-item_quantity,  # Negative for deduction
-                            source_type='purchase_invoice_deletion',
-                            source_id=invoice.id
-                        )
-                        db.session.add(movement)
-                    except Exception as e:
-                        db.session.rollback()
-                        return jsonify({
-                            'error': f'Error updating stock for product {product.name}: {str(e)}'
-                        }), 500
+        # Revert stock changes; goods already sold may take the stock below zero
+        returned = [(item.product_id, float(item.quantity)) for item in invoice.items if item.product_id]
+        stock_changes = {}
+        for product_id, quantity in returned:
+            stock_changes[product_id] = stock_changes.get(product_id, 0) - quantity
+        try:
+            skipped = {line['product_id'] for line in change_stock(stock_changes, user_id=current_user.id, allow_negative=True)}
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({
+                'error': f'Error updating stock: {str(e)}'
+            }), 500
+        for product_id, quantity in returned:
+            if product_id not in skipped:
+                # Create stock movement record
+                db.session.add(StockMovement(
+                    product_id=product_id,
+                    type='adjustment',
+                    quantity=-quantity,  # Negative for deduction
+                    source_type='purchase_invoice_deletion',
+                    source_id=invoice.id
+                ))
 
         try:
             # Delete the invoice (cascade will handle items)
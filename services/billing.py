@@ -0,0 +1,135 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
+from models import db, Bill, Product, BillItem, StockMovement
+from services.chunking import chunked
+from services.money import round_cents
+from services.pagination import encode_cursor, decode_cursor, keyset_after
+from services.stock import change_stock
+from services.stock_snapshots import snapshot_policy
+
+# Paid bills shown per page of the billing history
+PAID_BILLS_PAGE_SIZE = 50
+
+# What each bill page walks, loaded up front so rendering issues no queries.
+# Clients and products are tenant rows: selectinload gives them their own
+# scoped query, where a joined eager load would skip the user_id criteria.
+# Joining the items would also push first_or_404's LIMIT into a subquery.
+BILL_ROW_LOADERS = (selectinload(Bill.client),)
+BILL_ROW_WITH_PAYMENTS_LOADERS = (selectinload(Bill.client), selectinload(Bill.bill_payments))
+BILL_DETAIL_LOADERS = (
+    selectinload(Bill.client),
+    selectinload(Bill.items).selectinload('product'),  # a backref, not yet an attribute at import
+    selectinload(Bill.bill_payments),
+)
+
+
+class BillError(ValueError):
+    """A bill that cannot be created as requested.
+
+    ``status`` is the HTTP status to report and ``lines`` the per-product
+    stock shortfalls, if that was the problem.
+    """
+
+    def __init__(self, message, status=400, lines=None):
+        super().__init__(message)
+        self.status = status
+        self.lines = lines or []
+
+
+def paid_bills_page(user_id, cursor=None, limit=PAID_BILLS_PAGE_SIZE):
+    """One page of the user's paid bills, latest paid first, and the cursor of the next page.
+
+    Keyset pagination on (paid_date, id), so older pages cost the same as
+    the first. Bills marked Paid without a paid_date sort by their issue
+    date. Raises ValueError on a malformed cursor.
+    """
+    paid_on = func.coalesce(Bill.paid_date, Bill.issue_date)
+    query = Bill.query.options(*BILL_ROW_LOADERS).filter(Bill.user_id == user_id, Bill.status == 'Paid')
+    if cursor:
+        try:
+            paid_date, bill_id = decode_cursor(cursor)
+            after = [datetime.strptime(paid_date, '%Y-%m-%d').date(), int(bill_id)]
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+        query = query.filter(keyset_after([paid_on, Bill.id], after, descending=True))
+    bills = query.order_by(paid_on.desc(), Bill.id.desc()).limit(limit + 1).all()
+    if len(bills) <= limit:
+        return bills, None
+    last = bills[limit - 1]
+    return bills[:limit], encode_cursor([(last.paid_date or last.issue_date).isoformat(), last.id])
+
+
+def load_products(user_id, product_ids):
+    """Fetch the user's products by id with one IN query per chunk, as an {id: Product} dict."""
+    products = {}
+    for chunk in chunked(product_ids):
+        for product in Product.query.filter(Product.user_id == user_id, Product.id.in_(chunk)):
+            products[product.id] = product
+    return products
+
+
+def add_bill_items(bill, lines):
+    """Take the stock for bill lines, set the bill total and bulk insert the lines.
+
+    ``bill`` must already be in the session. Each line is a dict with
+    product_id, quantity, price and tax_rate (Decimals). All products are
+    loaded up front, stock is taken with one conditional UPDATE per product
+    (so repeated lines add up and concurrent sales cannot oversell), and the
+    BillItem and StockMovement rows go out as two executemany INSERTs.
+    Returns (subtotal, total_tax); raises BillError if a line cannot be
+    fulfilled, after which the caller must roll back.
+    """
+    requested = {}
+    subtotals = {}  # line subtotals per tax rate
+    for line in lines:
+        if line['quantity'] <= 0:
+            raise BillError('Quantity must be greater than 0')
+        requested[line['product_id']] = requested.get(line['product_id'], Decimal('0')) + line['quantity']
+        subtotals[line['tax_rate']] = subtotals.get(line['tax_rate'], Decimal('0')) + line['quantity'] * line['price']
+    subtotal = sum(subtotals.values(), Decimal('0'))
+    # Tax once per rate rather than once per line
+    total_tax = sum((amount * rate / 100 for rate, amount in subtotals.items()), Decimal('0'))
+
+    with db.session.no_autoflush:
+        products = load_products(bill.user_id, requested)
+    for product_id in requested:
+        if product_id not in products:
+            raise BillError(f'Product with ID {product_id} not found', 404)
+
+    bill.total_amount = round_cents(subtotal + total_tax)
+    db.session.flush()  # Get bill ID
+
+    shortfalls = change_stock({product_id: -quantity for product_id, quantity in requested.items()}, user_id=bill.user_id)
+    if shortfalls:
+        for line in shortfalls:
+            line['name'] = products[line['product_id']].name
+        raise BillError('; '.join(
+            f"Insufficient stock for {line['name']}. Available: {line['available']}" for line in shortfalls
+        ), lines=shortfalls)
+
+    now = datetime.utcnow()
+    items = [{
+        'bill_id': bill.id,
+        'product_id': line['product_id'],
+        'quantity': line['quantity'],
+        'price': line['price'],
+        'tax_rate': line['tax_rate'],
+        'created_at': now
+    } for line in lines]
+    movements = [{
+        'product_id': line['product_id'],
+        'quantity': -float(line['quantity']),  # Negative for deduction
+        'type': 'sale',
+        'source_type': 'bill',
+        'source_id': bill.id,
+        'timestamp': now
+    } for line in lines]
+
+    db.session.bulk_insert_mappings(BillItem, items)
+    db.session.bulk_insert_mappings(StockMovement, movements)
+    snapshot_policy.track(requested, len(movements))
+    return subtotal, total_tax
@@ -0,0 +1,166 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, CashFlowDaily, Transaction
+
+# Transactions in these statuses do not count towards cash flow
+EXCLUDED_STATUSES = ('CANCELLED',)
+
+ROLLUP_FIELDS = ('user_id', 'date', 'type', 'currency', 'amount', 'status')
+
+
+def _rollup_key(values):
+    """Return (key, amount) for a transaction's values, or None if it does not count."""
+    if (values['status'] or 'CONFIRMED') in EXCLUDED_STATUSES or values['amount'] is None:
+        return None
+    day = values['date']
+    if isinstance(day, datetime):
+        day = day.date()
+    key = (values['user_id'], day, values['type'], values['currency'] or 'PYG')
+    return key, Decimal(str(values['amount']))
+
+
+def _current_values(obj):
+    return {field: getattr(obj, field) for field in ROLLUP_FIELDS}
+
+
+def _previous_values(obj):
+    state = inspect(obj)
+    values = {}
+    for field in ROLLUP_FIELDS:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = getattr(obj, field)
+    return values
+
+
+def _add(deltas, entry, sign):
+    if entry is None:
+        return
+    key, amount = entry
+    total, count = deltas.get(key, (Decimal('0'), 0))
+    deltas[key] = (total + sign * amount, count + sign)
+
+
+def collect_deltas(session):
+    """Net rollup changes implied by the Transactions in a flush."""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            _add(deltas, _rollup_key(_current_values(obj)), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj, include_collections=False):
+            _add(deltas, _rollup_key(_previous_values(obj)), -1)
+            _add(deltas, _rollup_key(_current_values(obj)), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            _add(deltas, _rollup_key(_previous_values(obj)), -1)
+    return {key: delta for key, delta in deltas.items() if delta != (0, 0)}
+
+
+def apply_deltas(connection, deltas):
+    """Add the deltas to cash_flow_daily with atomic increments."""
+    table = CashFlowDaily.__table__
+    dialect = connection.dialect.name
+    for (user_id, day, type_, currency), (amount, count) in deltas.items():
+        values = dict(user_id=user_id, date=day, type=type_, currency=currency, amount=amount, count=count)
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(table).values(**values)
+            connection.execute(insert.on_conflict_do_update(
+                index_elements=['user_id', 'date', 'type', 'currency'],
+                set_={'amount': table.c.amount + insert.excluded.amount,
+                      'count': table.c.count + insert.excluded.count}
+            ))
+        else:
+            updated = connection.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.date == day,
+                       table.c.type == type_, table.c.currency == currency)
+                .values(amount=table.c.amount + amount, count=table.c.count + count)
+            )
+            if not updated.rowcount:
+                connection.execute(table.insert().values(**values))
+        if count < 0:
+            # Drop days whose last transaction went away
+            connection.execute(table.delete().where(
+                table.c.user_id == user_id, table.c.date == day, table.c.type == type_,
+                table.c.currency == currency, table.c.count <= 0
+            ))
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Make the ORM load the old value on assignment, even on an expired instance,
+# so the flush can subtract what the transaction contributed before
+for _field in ROLLUP_FIELDS:
+    event.listen(getattr(Transaction, _field), 'set', _load_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_cash_flow_rollup(session, flush_context):
+    # Runs inside the flush, so the rollup commits or rolls back with the transactions
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def rebuild_cash_flow_rollup(user_id=None):
+    """Recompute cash_flow_daily from the transaction table, for one user or everyone."""
+    table = CashFlowDaily.__table__
+    grouped = select(
+        Transaction.user_id,
+        Transaction.date,
+        Transaction.type,
+        func.coalesce(Transaction.currency, 'PYG'),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).where(
+        func.coalesce(Transaction.status, 'CONFIRMED').notin_(EXCLUDED_STATUSES)
+    ).group_by(
+        Transaction.user_id, Transaction.date, Transaction.type, func.coalesce(Transaction.currency, 'PYG')
+    )
+    delete = table.delete()
+    if user_id is not None:
+        grouped = grouped.where(Transaction.user_id == user_id)
+        delete = delete.where(table.c.user_id == user_id)
+
+    with db.engine.begin() as conn:
+        conn.execute(delete)
+        result = conn.execute(table.insert().from_select(
+            ['user_id', 'date', 'type', 'currency', 'amount', 'count'], grouped
+        ))
+    return result.rowcount
+
+
+def cash_flow_totals(user_id, start_date, end_date, by_day=False):
+    """Return {type: {currency: amount}} for a date range from the daily rollup.
+
+    With ``by_day`` the rollup rows are returned as they are instead, as
+    {type: [(amount, currency, date), ...]}, for converting each day at its
+    own rate.
+    """
+    columns = [CashFlowDaily.type, CashFlowDaily.currency]
+    if by_day:
+        columns.append(CashFlowDaily.date)
+    rows = db.session.query(*columns, func.sum(CashFlowDaily.amount)).filter(
+        CashFlowDaily.user_id == user_id,
+        CashFlowDaily.date >= start_date,
+        CashFlowDaily.date <= end_date
+    ).group_by(*columns).all()
+
+    totals = {}
+    if by_day:
+        for type_, currency, day, amount in rows:
+            totals.setdefault(type_, []).append((amount or 0, currency, day))
+        return totals
+    for type_, currency, amount in rows:
+        totals.setdefault(type_, {})[currency] = amount or 0
+    return totals
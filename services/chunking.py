@@ -0,0 +1,9 @@
+# Keep IN lists well under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+
+def chunked(ids, size=None):
+    """Split ``ids`` into lists of at most ``size`` (default IN_CHUNK_SIZE), one per IN query."""
+    ids = list(ids)
+    size = size or IN_CHUNK_SIZE
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
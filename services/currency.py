@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from services.money import Money
+
+
+def _decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def group_by_currency(pairs):
+    """Sum (amount, currency) pairs into a {currency: Decimal} dict."""
+    totals = {}
+    for amount, currency in pairs:
+        currency = currency or 'PYG'
+        totals[currency] = totals.get(currency, Decimal('0')) + _decimal(amount)
+    return totals
+
+
+class RateSnapshot:
+    """Exchange rates resolved once and reused for the rest of a request.
+
+    ``resolve(currency)`` is called at most once per currency, so totalling
+    thousands of amounts costs one rate lookup per distinct currency. Sums
+    are grouped by currency first and each currency total is converted once,
+    rounded half up to the cent, and added up in integer hundredths.
+    """
+
+    def __init__(self, resolve, base='PYG'):
+        self.resolve = resolve
+        self.base = base
+        self.rates = {base: Decimal('1')}
+
+    def rate(self, currency):
+        currency = currency or self.base
+        if currency not in self.rates:
+            self.rates[currency] = _decimal(self.resolve(currency))
+        return self.rates[currency]
+
+    def convert_totals(self, totals):
+        """Convert a {currency: amount} dict to one base-currency total."""
+        total = sum(
+            (Money.of(amount, currency).convert(self.rate(currency), self.base) for currency, amount in totals.items()),
+            Money(0, self.base)
+        )
+        return total.amount
+
+    def total(self, pairs):
+        """Convert and sum (amount, currency) pairs in the base currency."""
+        return self.convert_totals(group_by_currency(pairs))
@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import event, func, select, case
+from sqlalchemy.orm import Session
+
+from models import db, Client, Vendor, Product, Bill
+from services.metrics import count_cache
+from services.money import money_expr
+
+ACTIVE_BILL_STATUSES = ('Unpaid', 'Pending', 'Partially Paid')
+
+# Models whose rows feed the dashboard; writing any of them invalidates the owner's summary
+SUMMARY_MODELS = (Client, Vendor, Product, Bill)
+
+
+def build_dashboard_summary(user_id, rates):
+    """Compute the dashboard figures for one user with two aggregate queries.
+
+    ``rates`` is a RateSnapshot used to express the outstanding balance in PYG.
+    """
+    clients, vendors, products = db.session.query(
+        select(func.count(Client.id)).where(Client.user_id == user_id).scalar_subquery(),
+        select(func.count(Vendor.id)).where(Vendor.user_id == user_id).scalar_subquery(),
+        select(func.count(Product.id)).where(Product.user_id == user_id).scalar_subquery(),
+    ).one()
+
+    today = date.today()
+    bill_rows = db.session.query(
+        Bill.currency,
+        func.count(Bill.id),
+        func.sum(money_expr(Bill.total_amount - func.coalesce(Bill.paid_amount, 0))),
+        func.sum(case((Bill.due_date < today, 1), else_=0)),
+    ).filter(
+        Bill.user_id == user_id,
+        Bill.status.in_(ACTIVE_BILL_STATUSES)
+    ).group_by(Bill.currency).all()
+
+    return {
+        'clients': clients,
+        'vendors': vendors,
+        'products': products,
+        'active_bills': sum(count for _, count, _, _ in bill_rows),
+        'overdue_bills': sum(overdue or 0 for _, _, _, overdue in bill_rows),
+        'outstanding_total': rates.convert_totals({currency: balance for currency, _, balance, _ in bill_rows}),
+    }
+
+
+class SummaryCache:
+    """Per-user values kept for a short TTL and dropped when the user writes.
+
+    Entries are per process, so another worker's write is only seen once the
+    TTL runs out; keep it short. A value whose build overlapped an
+    invalidation is returned but not stored, since it may predate the write.
+    """
+
+    def __init__(self, ttl=30, name='summary'):
+        self.ttl = ttl
+        self.name = name  # label for the cache hit/miss metrics
+        self._entries = {}
+        self._generations = {}  # user_id -> invalidation count
+        self._epoch = 0  # clear() count
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id):
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def get_or_build(self, user_id, build):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            generation = self._generation(user_id)
+        if entry and now - entry[1] < self.ttl:
+            count_cache(self.name, 'hit')
+            return entry[0]
+        count_cache(self.name, 'miss')
+        value = build()
+        with self._lock:
+            if self._generation(user_id) == generation:
+                self._entries[user_id] = (value, now)
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def track_writes(self, models):
+        """Invalidate a user's entry whenever a flushed row of ``models`` is committed."""
+        models = tuple(models)
+
+        @event.listens_for(Session, 'after_flush')
+        def collect_owners(session, flush_context):
+            owners = session.info.setdefault('summary_cache_owners', set())
+            for obj in (*session.new, *session.dirty, *session.deleted):
+                if isinstance(obj, models) and obj.user_id is not None:
+                    owners.add(obj.user_id)
+
+        @event.listens_for(Session, 'after_commit')
+        def invalidate_owners(session):
+            for user_id in session.info.pop('summary_cache_owners', ()):
+                self.invalidate(user_id)
+
+        @event.listens_for(Session, 'after_rollback')
+        def forget_owners(session):
+            session.info.pop('summary_cache_owners', None)
+
+
+# Dashboard figures per user; app.py sets the TTL and hooks up write tracking
+dashboard_cache = SummaryCache(name='dashboard')
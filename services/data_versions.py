@@ -0,0 +1,108 @@
+from datetime import date
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, DataVersion, Product, PurchaseInvoice, Transaction, Vendor
+
+# Lists the API serves with ETags, and the models whose writes change each one.
+# Vendors count for purchase_invoices because the list shows the vendor name.
+LIST_DATASETS = {
+    'products': (Product,),
+    'transactions': (Transaction,),
+    'purchase_invoices': (PurchaseInvoice, Vendor),
+}
+
+
+def bump_versions(connection, keys):
+    """Add one to each (user_id, dataset) counter in ``keys``, starting missing ones at 1."""
+    table = DataVersion.__table__
+    dialect = connection.dialect.name
+    for user_id, dataset in keys:
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(table).values(
+                user_id=user_id, dataset=dataset, version=1
+            )
+            connection.execute(insert.on_conflict_do_update(
+                index_elements=['user_id', 'dataset'], set_={'version': table.c.version + 1}
+            ))
+        else:
+            updated = connection.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.dataset == dataset)
+                .values(version=table.c.version + 1)
+            )
+            if not updated.rowcount:
+                connection.execute(table.insert().values(user_id=user_id, dataset=dataset, version=1))
+
+
+class DataVersions:
+    """Per-user write counters for the list APIs, so polling an unchanged list costs one lookup.
+
+    A flush that writes rows of a dataset's models bumps the owners'
+    counters in data_versions inside the same transaction, so every worker
+    sees the new version the moment the write commits. Writes that skip
+    the unit of work (bulk inserts, Core UPDATEs) call bump() themselves.
+
+    conditional() wraps a list view: it reads the counter first and, when
+    the request's If-None-Match holds the same weak ETag, answers 304
+    without running the view. The counter is read before the view's query,
+    so a write racing with the request only costs the client a refetch.
+    """
+
+    def __init__(self):
+        self.datasets = {}
+
+    def track_writes(self, datasets):
+        """Bump the owners' versions of ``datasets`` ({name: models}) on every flush that writes them."""
+        self.datasets = {name: tuple(models) for name, models in datasets.items()}
+
+        @event.listens_for(Session, 'after_flush')
+        def bump_written(session, flush_context):
+            keys = set()
+            dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+            for obj in (*session.new, *dirty, *session.deleted):
+                for dataset, models in self.datasets.items():
+                    if isinstance(obj, models) and obj.user_id is not None:
+                        keys.add((obj.user_id, dataset))
+            if keys:
+                bump_versions(session.connection(), sorted(keys))
+
+    def bump(self, user_id, dataset):
+        """Record a write to ``dataset`` made outside the ORM, in the session's transaction."""
+        bump_versions(db.session.connection(), [(user_id, dataset)])
+
+    def current(self, user_id, dataset):
+        return db.session.execute(
+            select(DataVersion.version).where(DataVersion.user_id == user_id, DataVersion.dataset == dataset)
+        ).scalar() or 0
+
+    def etag(self, user_id, dataset):
+        # The day is part of it: lists such as this month's transactions move with the calendar
+        return f'{dataset}-{user_id}-{self.current(user_id, dataset)}-{date.today():%Y%m%d}'
+
+    def conditional(self, dataset):
+        """Decorate a login_required list view of ``dataset`` with ETags and 304 responses."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = self.etag(current_user.id, dataset)
+                if request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag, weak=True)
+                # Per user, and always revalidated
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            return wrapper
+        return decorator
+
+
+data_versions = DataVersions()
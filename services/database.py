@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import weakref
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Engine profiles, picked per database URL unless DB_ENGINE_PROFILE says
+# otherwise ('auto', or 'none' for plain Flask-SQLAlchemy defaults):
+#
+#   sqlite      WAL journal and the pragmas below on every new connection,
+#               pooled so the page cache outlives a request
+#   postgresql  a bounded pool with pre-ping and recycling; keep
+#               workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the
+#               server's max_connections
+
+SQLITE_PRAGMAS = (
+    ('busy_timeout', 5000),  # ms to wait for a lock before "database is locked"
+    ('journal_mode', 'WAL'),  # readers no longer block the writer, nor it them
+    ('synchronous', 'NORMAL'),  # fsync at checkpoints only; safe with WAL
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),  # negative: KiB, so 64 MiB per connection
+)
+
+
+def database_url(default='sqlite:///database.db'):
+    """DATABASE_URL from the environment, accepting the older postgres:// scheme."""
+    url = os.environ.get('DATABASE_URL', default)
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def engine_profile(sa_url, config):
+    """The profile name and engine options for a database URL."""
+    if config.get('DB_ENGINE_PROFILE', 'auto') == 'none':
+        return 'none', {}
+    backend = sa_url.get_backend_name()
+    pool = {
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+    }
+    if backend == 'sqlite':
+        if sa_url.database in (None, '', ':memory:'):
+            # One shared in-memory connection; nothing to pool
+            return 'sqlite', {}
+        # Pooled connections move between threads, one at a time
+        return 'sqlite', dict(pool, poolclass=QueuePool, connect_args={'check_same_thread': False})
+    if backend == 'postgresql':
+        # Drop connections the server or a proxy closed while idle
+        return 'postgresql', dict(pool, pool_pre_ping=True, pool_recycle=config.get('DB_POOL_RECYCLE', 1800))
+    return backend, {}
+
+
+class ProfiledSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with the engine profile applied to every engine it creates.
+
+    Engines are disposed in forked children (gunicorn --preload), so a
+    worker never shares the pooled connections it inherited from the master.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._engines = weakref.WeakSet()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.dispose_inherited_engines)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # Before Flask-SQLAlchemy's own, which only fills in what is missing
+        # (and SQLALCHEMY_ENGINE_OPTIONS still overrides both)
+        _, profile_options = engine_profile(sa_url, app.config)
+        options.update(profile_options)
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name == 'sqlite' and engine_profile(sa_url, self.get_app().config)[0] == 'sqlite':
+            event.listen(engine, 'connect', set_sqlite_pragmas)
+        self._engines.add(engine)
+        return engine
+
+    def dispose_inherited_engines(self):
+        for engine in list(self._engines):
+            # close=False: the connections still belong to the parent process
+            engine.dispose(close=False)
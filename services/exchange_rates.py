@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from services.metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+# PYG rates served when no source has answered yet (you should update these periodically)
+FALLBACK_RATES = {
+    'USD': 7400.00,
+    'EUR': 8000.00,
+    'BRL': 1550.00,
+    'ARS': 9.00,
+    'GBP': 9200.00,
+}
+
+
+class RateProvider:
+    """Stale-while-revalidate cache around a rate table fetcher.
+
+    Readers always get the last good table straight from memory. A daemon
+    thread refreshes it every ``refresh_interval`` seconds, and a read that
+    finds the table stale kicks off a refresh without waiting for it.
+    Concurrent refreshes collapse into a single upstream fetch, and each
+    good table is handed to ``on_refresh`` (e.g. to persist it).
+
+    ``fetch`` returns a {currency: rate} dict, or a (source, rates) pair
+    when it picks between several sources (see services.rate_sources).
+    """
+
+    def __init__(self, fetch, refresh_interval=900, retry_interval=60, fallback=None, source='bcp', background=True, on_refresh=None):
+        self.fetch = fetch
+        self.on_refresh = on_refresh
+        self.refresh_interval = refresh_interval
+        self.background = background
+        self.retry_interval = retry_interval
+        self.fallback = fallback or {}
+        self.source = source
+        self._table = None
+        self._fetched_at = None
+        self._failed_at = None
+        self._reset_locks()
+        self._pid = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'last_refresh_ms': None,
+            'total_refresh_ms': 0.0,
+        }
+        if hasattr(os, 'register_at_fork'):
+            # Worker processes forked by gunicorn inherit neither the
+            # refresher thread nor a usable lock state.
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    def get(self):
+        """Return the current rate table, fetching only if none was ever loaded."""
+        self._ensure_refresher()
+        with self._lock:
+            table = self._table
+            if table is None:
+                self._stats['misses'] += 1
+                recently_failed = self._failed_at is not None and time.time() - self._failed_at < self.retry_interval
+            else:
+                self._stats['hits'] += 1
+                stale = self._age() > self.refresh_interval
+                if stale:
+                    self._stats['stale_hits'] += 1
+
+        count_cache(f'{self.source}_rates', 'miss' if table is None else 'stale' if stale else 'hit')
+        if table is not None:
+            if stale:
+                self.refresh(wait=False)
+            return table
+
+        if not recently_failed:
+            table = self.refresh()
+        if table is None:
+            logger.warning("No %s rates available yet. Using fallback rates.", self.source)
+            return {
+                'rates': dict(self.fallback),
+                'timestamp': int(datetime.now().timestamp()),
+                'source': 'fallback'
+            }
+        return table
+
+    def refresh(self, wait=True):
+        """Fetch a fresh table unless another thread is already doing so.
+
+        With ``wait`` the caller blocks until the in-flight fetch finishes,
+        otherwise the fetch runs in a background thread.
+        """
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+        if leader:
+            if wait:
+                self._refresh(event)
+            else:
+                threading.Thread(target=self._refresh, args=(event,), daemon=True).start()
+        elif wait:
+            event.wait()
+        return self._table
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            age = self._age() if self._fetched_at is not None else None
+            refreshing = self._inflight is not None
+        total_ms = stats.pop('total_refresh_ms')
+        stats['avg_refresh_ms'] = round(total_ms / stats['refreshes'], 1) if stats['refreshes'] else None
+        stats['age_seconds'] = round(age, 1) if age is not None else None
+        stats['stale'] = age is None or age > self.refresh_interval
+        stats['refreshing'] = refreshing
+        stats['refresh_interval'] = self.refresh_interval
+        stats['source'] = self.source
+        return stats
+
+    def _age(self):
+        return time.time() - self._fetched_at
+
+    def _refresh(self, event):
+        started = time.perf_counter()
+        try:
+            result = self.fetch()
+        except Exception as e:
+            logger.error(f"Error refreshing {self.source} exchange rates: {e}")
+            with self._lock:
+                self._stats['refresh_failures'] += 1
+                self._failed_at = time.time()
+        else:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            source, rates = result if isinstance(result, tuple) else (self.source, result)
+            now = time.time()
+            table = {
+                'rates': rates,
+                'timestamp': int(now),
+                'source': source
+            }
+            with self._lock:
+                self._table = table
+                self._fetched_at = now
+                self._failed_at = None
+                self._stats['refreshes'] += 1
+                self._stats['last_refresh_ms'] = round(elapsed_ms, 1)
+                self._stats['total_refresh_ms'] += elapsed_ms
+            logger.info(f"Refreshed {len(rates)} {source} exchange rates in {elapsed_ms:.0f} ms")
+            if self.on_refresh:
+                try:
+                    self.on_refresh(table)
+                except Exception as e:
+                    logger.error(f"Error handling refreshed {self.source} exchange rates: {e}")
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def _ensure_refresher(self):
+        """Start the periodic refresher once per process."""
+        if not self.background or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name=f'{self.source}-rate-refresher', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
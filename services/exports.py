@@ -0,0 +1,184 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+
+from models import db, Bill, BillItem, Category, Client, Product, PurchaseInvoice, StockMovement, Transaction, Vendor
+from services.json_encoding import json_default
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_BATCH_SIZE = 1000  # rows fetched per server-side cursor round trip
+FLUSH_BYTES = 64 * 1024  # emit output in chunks of roughly this size
+
+
+def _date_range(column, start_date, end_date, inclusive_datetime=False):
+    clauses = []
+    if start_date:
+        clauses.append(column >= start_date)
+    if end_date:
+        if inclusive_datetime:
+            # Timestamps on the end date still belong to the range
+            clauses.append(column < end_date + timedelta(days=1))
+        else:
+            clauses.append(column <= end_date)
+    return clauses
+
+
+def transactions_query(user_id, start_date, end_date):
+    return db.session.query(
+        Transaction.id,
+        Transaction.date,
+        Transaction.type,
+        Transaction.status,
+        Transaction.amount,
+        Transaction.currency,
+        Transaction.exchange_rate,
+        Category.name.label('category'),
+        Transaction.description,
+        Transaction.source_module,
+        Transaction.source_id
+    ).outerjoin(
+        Transaction.category
+    ).filter(
+        Transaction.user_id == user_id,
+        *_date_range(Transaction.date, start_date, end_date)
+    ).order_by(Transaction.date, Transaction.id)
+
+
+def stock_movements_query(user_id, start_date, end_date):
+    return db.session.query(
+        StockMovement.id,
+        StockMovement.timestamp,
+        StockMovement.product_id,
+        Product.sku,
+        Product.name.label('product_name'),
+        StockMovement.type,
+        StockMovement.quantity,
+        StockMovement.source_type,
+        StockMovement.source_id
+    ).join(
+        Product, Product.id == StockMovement.product_id
+    ).filter(
+        Product.user_id == user_id,
+        *_date_range(StockMovement.timestamp, start_date, end_date, inclusive_datetime=True)
+    ).order_by(StockMovement.timestamp, StockMovement.id)
+
+
+def bills_query(user_id, start_date, end_date):
+    return db.session.query(
+        Bill.id,
+        Bill.bill_number,
+        Bill.issue_date,
+        Bill.due_date,
+        Bill.client_id,
+        Client.name.label('client_name'),
+        Bill.currency,
+        Bill.total_amount,
+        Bill.paid_amount,
+        Bill.status,
+        Bill.paid_date
+    ).outerjoin(
+        Bill.client
+    ).filter(
+        Bill.user_id == user_id,
+        *_date_range(Bill.issue_date, start_date, end_date)
+    ).order_by(Bill.issue_date, Bill.id)
+
+
+def bill_items_query(user_id, start_date, end_date):
+    return db.session.query(
+        BillItem.id,
+        BillItem.bill_id,
+        Bill.bill_number,
+        Bill.issue_date,
+        Bill.currency,
+        BillItem.product_id,
+        Product.sku,
+        Product.name.label('product_name'),
+        BillItem.quantity,
+        BillItem.price,
+        BillItem.tax_rate
+    ).join(
+        Bill, Bill.id == BillItem.bill_id
+    ).outerjoin(
+        BillItem.product
+    ).filter(
+        Bill.user_id == user_id,
+        *_date_range(Bill.issue_date, start_date, end_date)
+    ).order_by(Bill.issue_date, BillItem.bill_id, BillItem.id)
+
+
+def purchase_invoices_query(user_id, start_date, end_date):
+    return db.session.query(
+        PurchaseInvoice.id,
+        PurchaseInvoice.invoice_number,
+        PurchaseInvoice.date,
+        PurchaseInvoice.due_date,
+        PurchaseInvoice.vendor_id,
+        Vendor.name.label('vendor_name'),
+        PurchaseInvoice.total,
+        PurchaseInvoice.balance_due.label('balance_due'),
+        PurchaseInvoice.status,
+        PurchaseInvoice.notes
+    ).outerjoin(
+        PurchaseInvoice.vendor
+    ).filter(
+        PurchaseInvoice.user_id == user_id,
+        *_date_range(PurchaseInvoice.date, start_date, end_date)
+    ).order_by(PurchaseInvoice.date, PurchaseInvoice.id)
+
+
+EXPORTS = {
+    'transactions': transactions_query,
+    'stock-movements': stock_movements_query,
+    'bills': bills_query,
+    'bill-items': bill_items_query,
+    'purchase-invoices': purchase_invoices_query,
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_export(query, fmt):
+    """Yield the rows of ``query`` encoded as CSV or NDJSON text, in ~64 KB pieces.
+
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time, so
+    memory stays flat however many rows the range holds.
+    """
+    columns = [column['name'] for column in query.column_descriptions]
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        def write(row):
+            writer.writerow([_csv_value(value) for value in row])
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), default=json_default) + '\n')
+
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        write(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """Gzip an iterable of text chunks as it is consumed."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,111 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+
+from flask import stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used without it
+    orjson = None
+
+JSON_BACKENDS = ('auto', 'orjson', 'stdlib')
+STREAM_CHUNK_BYTES = 64 * 1024  # streamed arrays are sent in pieces of roughly this size
+
+# json.dumps arguments the orjson path reproduces; anything else goes to the standard library
+_COMPACT = (',', ':')
+
+
+def json_default(value):
+    """Encode what the models hand back beyond plain JSON: dates as ISO 8601, Decimals (money) as numbers."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    # UUIDs, dataclasses, Markup as Flask does
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding dates and Decimals natively and through orjson when installed.
+
+    Routes can return model values as they are instead of converting each
+    one by hand. JSON_BACKEND picks the encoder: 'auto' (orjson if it can
+    be imported), 'orjson' or 'stdlib'. Both produce the same documents:
+    sorted keys, ISO dates, Decimals as numbers. orjson writes non-ASCII
+    text as UTF-8 rather than \\u escapes.
+
+    array_response() streams a list as a JSON array, encoded item by item
+    in STREAM_CHUNK_BYTES pieces, so a large list never becomes one big
+    string.
+    """
+
+    default = staticmethod(json_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = app.config.get('JSON_BACKEND', 'auto')
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"JSON_BACKEND must be one of {', '.join(JSON_BACKENDS)}, not {backend!r}")
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError('JSON_BACKEND is orjson but orjson is not installed')
+        self.use_orjson = orjson is not None and backend != 'stdlib'
+
+    def _orjson_option(self, kwargs):
+        """orjson options equivalent to ``kwargs`` for json.dumps, or None if there are none."""
+        option = orjson.OPT_NON_STR_KEYS
+        for key, value in kwargs.items():
+            if key == 'sort_keys':
+                continue
+            if key == 'indent' and value == 2:
+                option |= orjson.OPT_INDENT_2
+            elif not (key == 'separators' and tuple(value) == _COMPACT or key == 'default' and value is json_default):
+                return None
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson:
+            option = self._orjson_option(kwargs)
+            if option is not None:
+                return orjson.dumps(obj, default=json_default, option=option).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def item_encoder(self):
+        """A function encoding one value to compact UTF-8 bytes, as response() would."""
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+            return partial(orjson.dumps, default=json_default, option=option)
+        encode = json.JSONEncoder(
+            default=json_default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys, separators=_COMPACT
+        ).encode
+        return lambda value: encode(value).encode('utf-8')
+
+    def array_chunks(self, items, chunk_bytes=STREAM_CHUNK_BYTES):
+        """Yield the JSON array of ``items`` as bytes, encoding them one at a time."""
+        encode = self.item_encoder()
+        buffer = bytearray(b'[')
+        separator = b''
+        for item in items:
+            buffer += separator
+            buffer += encode(item)
+            separator = b','
+            if len(buffer) >= chunk_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']\n'
+        yield bytes(buffer)
+
+    def array_response(self, items, status=200, headers=None):
+        """A streamed response holding ``items`` (any iterable) as a JSON array."""
+        return self._app.response_class(
+            stream_with_context(self.array_chunks(items)), status=status, headers=headers, mimetype=self.mimetype
+        )
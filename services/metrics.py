@@ -0,0 +1,118 @@
+import os
+import time
+from urllib.parse import urlsplit
+
+import requests
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# With PROMETHEUS_MULTIPROC_DIR set before this module is imported (see
+# gunicorn.conf.py), every worker writes its samples to files in that
+# directory and /metrics adds them up across workers.
+
+DB_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests',
+    ['blueprint', 'endpoint', 'method']
+)
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP responses by status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database statements per HTTP request',
+    ['blueprint', 'endpoint'], buckets=DB_BUCKETS
+)
+DB_STATEMENTS = Counter(
+    'db_statements_total', 'Database statements executed while handling HTTP requests',
+    ['blueprint', 'endpoint']
+)
+OUTBOUND_LATENCY = Histogram(
+    'outbound_http_duration_seconds', 'Time spent on outbound HTTP calls',
+    ['host', 'outcome']
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Cache lookups by result (hit, miss, stale)',
+    ['cache', 'result']
+)
+
+
+def count_cache(cache, result):
+    CACHE_LOOKUPS.labels(cache=cache, result=result).inc()
+
+
+def timed_get(url, session=None, **kwargs):
+    """requests.get (or session.get) that records its latency per host.
+
+    The outcome label is the status class ('2xx', '5xx', ...) or 'error'
+    when no response came back.
+    """
+    host = urlsplit(url).hostname or 'unknown'
+    outcome = 'error'
+    started = time.perf_counter()
+    try:
+        response = (session or requests).get(url, **kwargs)
+        outcome = f'{response.status_code // 100}xx'
+        return response
+    finally:
+        OUTBOUND_LATENCY.labels(host=host, outcome=outcome).observe(time.perf_counter() - started)
+
+
+def render_metrics():
+    """The metrics in Prometheus text format, summed over workers in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class RequestMetrics:
+    """Record latency, status and database time for every request and serve /metrics."""
+
+    skip_endpoints = ('metrics', 'static')
+
+    def init_app(self, app):
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_db' in g:
+            conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_db' in g:
+            g.metrics_db[0] += time.perf_counter() - conn.info['metrics_started'].pop()
+            g.metrics_db[1] += 1
+
+    def _start_request(self):
+        if request.endpoint not in self.skip_endpoints:
+            g.metrics_started = time.perf_counter()
+            g.metrics_db = [0.0, 0]  # seconds, statements
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        db_seconds, statements = g.pop('metrics_db')
+        # Unmatched URLs share one label so paths cannot blow up cardinality
+        endpoint = request.endpoint or 'unmatched'
+        blueprint = request.blueprint or 'app'
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        REQUEST_DB_TIME.labels(blueprint, endpoint).observe(db_seconds)
+        DB_STATEMENTS.labels(blueprint, endpoint).inc(statements)
+        return response
+
+    def metrics_view(self):
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,130 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import BigInteger, func, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Every currency is stored in hundredths (PYG included), so amounts in
+# different currencies share one scale and one column type
+MINOR_PER_UNIT = 100
+CENTS = Decimal('0.01')
+
+
+def to_minor(value):
+    """An amount (Decimal, int, float or numeric string) as integer hundredths, rounded half up."""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value * MINOR_PER_UNIT
+    if not isinstance(value, Decimal):
+        # str() first: a float's repr is the decimal the user meant, its binary value is not
+        value = Decimal(str(value))
+    return int(value.scaleb(2).quantize(1, ROUND_HALF_UP))
+
+
+def round_cents(value):
+    """An amount rounded half up to the cent, exactly as a MinorUnits column stores it."""
+    return from_minor(to_minor(value))
+
+
+def from_minor(minor):
+    """Integer hundredths back to a Decimal with two places."""
+    if minor is None:
+        return None
+    return Decimal(minor).scaleb(-2)
+
+
+class MinorUnits(TypeDecorator):
+    """Money column stored as a BIGINT of hundredths and read back as a two-place Decimal.
+
+    Integers add up exactly in every database, so SUM() and the cash flow
+    rollup no longer drift the way REAL/float columns did. The column's
+    currency lives in the row's own currency column. SQL arithmetic on these
+    columns yields a plain integer type; wrap it in money_expr() to read
+    Decimals back.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return from_minor(value)
+
+
+def money_expr(expression):
+    """Type an SQL expression over MinorUnits columns (a difference, a SUM of one) as money."""
+    return type_coerce(expression, MinorUnits())
+
+
+class Money:
+    """An amount in integer hundredths plus its currency code.
+
+    Only same-currency amounts add up; convert() goes to another currency
+    at a rate, rounding once.
+    """
+
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency='PYG'):
+        self.minor = minor
+        self.currency = currency or 'PYG'
+
+    @classmethod
+    def of(cls, amount, currency='PYG'):
+        return cls(to_minor(amount or 0), currency)
+
+    @property
+    def amount(self):
+        return from_minor(self.minor)
+
+    def _same_currency(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        if other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} and {other.currency}; convert first')
+        return other
+
+    def __add__(self, other):
+        other = self._same_currency(other)
+        return other if other is NotImplemented else Money(self.minor + other.minor, self.currency)
+
+    def __radd__(self, other):
+        # sum() starts from 0
+        return self if other == 0 else self.__add__(other)
+
+    def __sub__(self, other):
+        other = self._same_currency(other)
+        return other if other is NotImplemented else Money(self.minor - other.minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and (self.minor, self.currency) == (other.minor, other.currency)
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __repr__(self):
+        return f'Money({self.amount} {self.currency})'
+
+    def convert(self, rate, currency='PYG'):
+        """This amount in ``currency`` at ``rate`` (units of currency per unit of ours)."""
+        return Money(int((self.minor * _decimal(rate)).quantize(1, ROUND_HALF_UP)), currency)
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+
+def sum_by_currency(session, amount, currency, *criteria):
+    """{currency: Decimal} totals of a money column or expression, summed by the database.
+
+    The SUM runs over integers in one grouped query, so it is exact and the
+    rows never come back to Python.
+    """
+    code = func.coalesce(currency, 'PYG')
+    rows = session.query(code, func.sum(money_expr(amount))).filter(*criteria).group_by(code)
+    return {currency: total or Decimal('0') for currency, total in rows}
@@ -0,0 +1,116 @@
+import os
+import threading
+from datetime import date
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, DocumentCounter
+
+RESETS = ('never', 'yearly')
+
+
+def _counter_statements():
+    table = DocumentCounter.__table__
+    # Bound names differ from the columns, which insert() and update() reserve
+    key = (
+        (table.c.user_id == bindparam('owner_id'))
+        & (table.c.series == bindparam('series_name'))
+        & (table.c.period == bindparam('period_key'))
+    )
+    return (
+        table.update().where(key).values(next_value=table.c.next_value + bindparam('size')),
+        select(table.c.next_value).where(key),
+        table.insert().values(
+            user_id=bindparam('owner_id'), series=bindparam('series_name'),
+            period=bindparam('period_key'), next_value=bindparam('first_free')
+        ),
+    )
+
+
+ADVANCE, CURRENT, CREATE = _counter_statements()
+
+
+def reserve_block(user_id, series, period, size):
+    """Claim ``size`` consecutive numbers of a counter and return them as range(first, end).
+
+    Runs in its own short transaction, so the claim holds whatever the
+    caller's transaction does next: numbers from a rolled back document are
+    skipped, never handed out twice. Call it before the request writes
+    anything, as SQLite allows one writer at a time.
+    """
+    params = {'owner_id': user_id, 'series_name': series, 'period_key': period, 'size': size}
+    while True:
+        with db.engine.begin() as conn:
+            # The UPDATE locks the counter row until commit, so reading it back is safe
+            if conn.execute(ADVANCE, params).rowcount:
+                end = conn.execute(CURRENT, params).scalar()
+                return range(end - size, end)
+            try:
+                with conn.begin_nested():
+                    conn.execute(CREATE, dict(params, first_free=1 + size))
+                return range(1, 1 + size)
+            except IntegrityError:
+                pass  # another worker created the counter first; advance it instead
+
+
+class NumberSeries:
+    """Document numbers for one series (bills, SKUs, ...), counted per user.
+
+    ``format`` may use {seq}, {year} and {user}. With ``reset='yearly'``
+    the count restarts every year, so the format must include {year} to
+    keep numbers unique. Each process reserves ``block_size`` numbers at a
+    time with one UPDATE and hands them out from memory, so numbers are
+    unique but only roughly in creation order across workers, and a
+    restart leaves a gap.
+    """
+
+    def __init__(self, name, format, reset='never', block_size=20):
+        self.name = name
+        self.configure(format, reset, block_size)
+        self.clear()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker must not hand out the numbers its parent reserved
+            os.register_at_fork(after_in_child=self.clear)
+
+    def configure(self, format=None, reset=None, block_size=None):
+        format = format or self.format
+        reset = reset or self.reset
+        if reset not in RESETS:
+            raise ValueError(f'{self.name}: reset must be one of {", ".join(RESETS)}')
+        if reset == 'yearly' and '{year' not in format:
+            raise ValueError(f'{self.name}: a yearly reset needs {{year}} in the format, or numbers repeat')
+        self.format = format
+        self.reset = reset
+        self.block_size = block_size or self.block_size
+
+    def clear(self):
+        """Forget the numbers reserved but not yet handed out (they become a gap)."""
+        self._lock = threading.Lock()
+        self._blocks = {}  # (user_id, period) -> iterator over reserved numbers
+
+    def _period(self, on):
+        return str(on.year) if self.reset == 'yearly' else ''
+
+    def take(self, user_id, count, on=None):
+        """The next ``count`` numbers for a user, formatted; ``on`` picks the year (default today)."""
+        on = on or date.today()
+        period = self._period(on)
+        numbers = []
+        with self._lock:
+            block = self._blocks.get((user_id, period), iter(()))
+            numbers.extend(n for _, n in zip(range(count), block))
+            if len(numbers) < count:
+                block = iter(reserve_block(user_id, self.name, period, max(self.block_size, count - len(numbers))))
+                numbers.extend(n for _, n in zip(range(count - len(numbers)), block))
+            self._blocks[(user_id, period)] = block
+        return [self.format.format(seq=n, year=on.year, user=user_id) for n in numbers]
+
+    def next(self, user_id, on=None):
+        return self.take(user_id, 1, on)[0]
+
+
+# Configured from app.config in app.py
+bill_numbers = NumberSeries('bill', 'BILL-{year}-{seq:06d}', reset='yearly')
+# SKUs are unique across users, hence {user}
+sku_numbers = NumberSeries('sku', 'SKU-{user}-{seq:06d}')
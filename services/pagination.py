@@ -0,0 +1,44 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    """Turn the sort key of the last row of a page into an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def keyset_after(columns, values, descending=False):
+    """Filter for rows strictly after ``values`` in (columns...) order.
+
+    Expands to ``a > :a OR (a = :a AND b > :b) ...`` so it can use a
+    composite index on any backend.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        clauses.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], step))
+    return or_(*clauses)
+
+
+def parse_limit(value, default, maximum):
+    """Parse a ``limit`` query argument, clamped to [1, maximum]."""
+    if value in (None, ''):
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
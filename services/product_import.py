@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Product
+from services.dashboard import dashboard_cache
+from services.data_versions import data_versions
+from services.numbering import sku_numbers
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_CHUNK_SIZE = 1000
+
+REQUIRED_FIELDS = ('name', 'category', 'buying_date', 'unit', 'purchase_price', 'sell_price', 'max_stock')
+NUMERIC_FIELDS = ('purchase_price', 'sell_price', 'stock_qty', 'min_stock', 'max_stock', 'tax_rate')
+
+
+def detect_format(filename, requested=None):
+    """Pick the import format from an explicit value or the file extension."""
+    fmt = requested
+    if not fmt and filename and '.' in filename:
+        fmt = filename.rsplit('.', 1)[1]
+    fmt = (fmt or '').lower()
+    if fmt in ('jsonl', 'json'):
+        fmt = 'ndjson'
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f'Unsupported import format: {fmt or "unknown"}. Use csv or ndjson')
+    return fmt
+
+
+def iter_records(stream, fmt):
+    """Yield (row_number, dict) from a binary CSV or NDJSON stream, one line at a time."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        # Row 1 is the header
+        for row_number, record in enumerate(csv.DictReader(text), start=2):
+            yield row_number, record
+    else:
+        for row_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, ValueError(f'Invalid JSON: {e}')
+                continue
+            yield row_number, record if isinstance(record, dict) else ValueError('Expected a JSON object')
+
+
+def validate_record(record, user_id, now):
+    """Turn one input record into a Product mapping; raises ValueError with the reason."""
+    if isinstance(record, Exception):
+        raise record
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'Missing required field: {", ".join(missing)}')
+
+    mapping = {
+        'user_id': user_id,
+        'sku': str(record.get('sku') or '').strip() or None,
+        'name': str(record['name']).strip(),
+        'description': record.get('description') or None,
+        'category': str(record['category']).strip(),
+        'unit': str(record['unit']).strip(),
+        'created_at': now,
+        'updated_at': now
+    }
+    try:
+        mapping['buying_date'] = datetime.strptime(str(record['buying_date']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid buying_date format. Use YYYY-MM-DD')
+    for field in NUMERIC_FIELDS:
+        value = record.get(field)
+        try:
+            mapping[field] = float(value) if value not in (None, '') else 0.0
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid number for {field}: {value}')
+    if mapping['sku'] and len(mapping['sku']) > 50:
+        raise ValueError('SKU is longer than 50 characters')
+    return mapping
+
+
+def existing_skus(skus):
+    """Return which of ``skus`` are already taken, in one IN query."""
+    if not skus:
+        return set()
+    # SKUs are unique across all users, so this looks past the tenant filter
+    return {sku for sku, in db.session.query(Product.sku).filter(Product.sku.in_(list(skus))).execution_options(all_tenants=True)}
+
+
+def free_skus(user_id, count, reserved=()):
+    """The user's next ``count`` generated SKUs, passing over any already in use.
+
+    Users may type SKUs that look generated, so each block is checked with
+    existing_skus() (and against ``reserved``, e.g. the SKUs of a file being
+    imported) and numbers that are taken are skipped.
+    """
+    skus = []
+    while len(skus) < count:
+        candidates = sku_numbers.take(user_id, count - len(skus))
+        taken = existing_skus(candidates)
+        skus.extend(sku for sku in candidates if sku not in taken and sku not in reserved)
+    return skus
+
+
+class ProductImporter:
+    """Stream-import products for one user, committing one chunk at a time.
+
+    Rows are parsed lazily, validated a chunk at a time, SKU clashes are
+    checked with one query per chunk and each chunk is written with a single
+    executemany INSERT and commit. Rows that fail are reported with their
+    line number instead of aborting the import.
+    """
+
+    def __init__(self, user_id, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.errors = []
+        self.imported = 0
+        self.rows = 0
+        self.chunks = 0
+        self._seen_skus = set()
+
+    def run(self, stream, fmt):
+        started = time.perf_counter()
+        chunk = []
+        for row_number, record in iter_records(stream, fmt):
+            chunk.append((row_number, record))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        if self.imported:
+            dashboard_cache.invalidate(self.user_id)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': len(self.errors),
+            'chunks': self.chunks,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else None,
+            'errors': self.errors
+        }
+
+    def _fail(self, row_number, error, sku=None):
+        self.errors.append({'row': row_number, 'sku': sku, 'error': str(error)})
+
+    def _import_chunk(self, chunk):
+        self.rows += len(chunk)
+        self.chunks += 1
+        now = datetime.utcnow()
+
+        valid = []
+        for row_number, record in chunk:
+            try:
+                mapping = validate_record(record, self.user_id, now)
+            except ValueError as e:
+                self._fail(row_number, e, record.get('sku') or None if isinstance(record, dict) else None)
+                continue
+            if mapping['sku'] and mapping['sku'] in self._seen_skus:
+                self._fail(row_number, 'Duplicate SKU in import file', mapping['sku'])
+                continue
+            if mapping['sku']:
+                self._seen_skus.add(mapping['sku'])
+            valid.append((row_number, mapping))
+
+        # One lookup for every SKU supplied in this chunk
+        taken = existing_skus({mapping['sku'] for _, mapping in valid if mapping['sku']})
+        rows = []
+        for row_number, mapping in valid:
+            if mapping['sku'] in taken:
+                self._fail(row_number, 'SKU already exists', mapping['sku'])
+            else:
+                rows.append(mapping)
+
+        # Rows without a SKU get the user's next free ones, reserved in one go
+        pending = [mapping for mapping in rows if not mapping['sku']]
+        for mapping, sku in zip(pending, free_skus(self.user_id, len(pending), self._seen_skus)):
+            mapping['sku'] = sku
+        self._seen_skus.update(mapping['sku'] for mapping in rows)
+
+        if not rows:
+            return
+        try:
+            db.session.bulk_insert_mappings(Product, rows)
+            data_versions.bump(self.user_id, 'products')
+            db.session.commit()
+            self.imported += len(rows)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            row_numbers = {id(mapping): row_number for row_number, mapping in valid}
+            for mapping in rows:
+                self._fail(row_numbers[id(mapping)], f'Chunk could not be saved: {e.__class__.__name__}', mapping['sku'])
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ExchangeRate
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value or date.today()
+
+
+class RateHistory:
+    """Date-indexed exchange rates (PYG per unit) backed by the exchange_rates table.
+
+    The table is mirrored in memory as one sorted list of dates per currency,
+    so "rate on date D" is a bisect rather than a query. The mirror is
+    reloaded every ``reload_interval`` seconds to pick up rates recorded by
+    other worker processes.
+    """
+
+    def __init__(self, reload_interval=600):
+        self.reload_interval = reload_interval
+        self._index = {}  # currency -> ([dates], [rates]), both sorted by date
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """(Re)build the in-memory index from the database."""
+        stmt = select(ExchangeRate.currency, ExchangeRate.date, ExchangeRate.rate).order_by(
+            ExchangeRate.currency, ExchangeRate.date
+        )
+        index = {}
+        with db.engine.connect() as conn:
+            for currency, rate_date, rate in conn.execute(stmt):
+                dates, rates = index.setdefault(currency, ([], []))
+                dates.append(rate_date)
+                rates.append(Decimal(str(rate)))
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval:
+            self.load()
+
+    def _lookup(self, currency, on_date):
+        entry = self._index.get(currency)
+        if not entry:
+            return None
+        dates, rates = entry
+        # Latest rate on or before the date; older dates use the earliest rate known
+        i = bisect_right(dates, on_date)
+        return rates[max(i - 1, 0)]
+
+    def rate_on(self, currency, on_date=None):
+        """Return the rate in effect for ``currency`` on ``on_date``, or None if unknown."""
+        if currency == 'PYG':
+            return Decimal('1')
+        self._ensure_loaded()
+        return self._lookup(currency, _as_date(on_date))
+
+    def record(self, currency, rate, on_date=None, source=None):
+        """Persist the rate for (currency, date) and add it to the index."""
+        self.record_many({currency: rate}, on_date=on_date, source=source)
+
+    def record_many(self, rates, on_date=None, source=None):
+        """Persist a {currency: rate} table for one date in a single transaction."""
+        on_date = _as_date(on_date)
+        rates = {currency: Decimal(str(rate)) for currency, rate in rates.items() if currency != 'PYG'}
+        if not rates:
+            return
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                for currency, rate in rates.items():
+                    self._write(conn, currency, rate, on_date, source, now)
+        except IntegrityError:
+            # Another worker inserted one of the day's rows between our UPDATE and
+            # INSERT, rolling back the whole table. Write each rate on its own:
+            # the row is there now, so the UPDATE finds it.
+            written = {}
+            for currency, rate in rates.items():
+                try:
+                    with db.engine.begin() as conn:
+                        self._write(conn, currency, rate, on_date, source, now)
+                except IntegrityError:
+                    logger.warning(f"Could not record the {currency} rate for {on_date}")
+                else:
+                    written[currency] = rate
+            rates = written
+
+        # Only what was committed, so the index never holds a rate the table lacks
+        with self._lock:
+            for currency, rate in rates.items():
+                dates, values = self._index.get(currency, ([], []))
+                dates, values = list(dates), list(values)
+                i = bisect_right(dates, on_date)
+                if i and dates[i - 1] == on_date:
+                    values[i - 1] = rate
+                else:
+                    dates.insert(i, on_date)
+                    values.insert(i, rate)
+                self._index[currency] = (dates, values)
+
+    def _write(self, conn, currency, rate, on_date, source, now):
+        """Update the (currency, date) row, inserting it if there is none yet."""
+        updated = conn.execute(
+            update(ExchangeRate)
+            .where(ExchangeRate.currency == currency, ExchangeRate.date == on_date)
+            .values(rate=rate, source=source, updated_at=now)
+        )
+        if not updated.rowcount:
+            conn.execute(ExchangeRate.__table__.insert().values(
+                currency=currency, date=on_date, rate=rate, source=source,
+                created_at=now, updated_at=now
+            ))
+
+    def convert_batch(self, items, fallback=None):
+        """Convert (amount, currency, date) tuples to PYG in one pass.
+
+        Every rate comes from the in-memory index. ``fallback(currency)`` is
+        consulted at most once per currency that has no history at all.
+        Returns a list of Decimal amounts in the input order.
+        """
+        self._ensure_loaded()
+        missing = {}
+        converted = []
+        for amount, currency, on_date in items:
+            amount = amount if isinstance(amount, Decimal) else Decimal(str(amount or 0))
+            if currency == 'PYG':
+                converted.append(amount)
+                continue
+            rate = self._lookup(currency, _as_date(on_date))
+            if rate is None:
+                if currency not in missing:
+                    missing[currency] = fallback(currency) if fallback else Decimal('1')
+                rate = missing[currency]
+            converted.append(amount * rate)
+        return converted
@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.metrics import timed_get
+
+logger = logging.getLogger(__name__)
+
+ER_API_URL = 'https://open.er-api.com/v6/latest/PYG'
+BCP_URL = 'https://www.bcp.gov.py/webapps/web/cotizacion/monedas'
+BCP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# (connect, read) seconds; a source that is down fails fast on connect
+DEFAULT_TIMEOUT = (3.05, 5)
+
+
+class RatesUnavailable(RuntimeError):
+    """No source produced a rate table."""
+
+
+def pooled_session(pool_size=4, retries=1):
+    """A keep-alive Session that retries a failed connect or a 502/503/504 once."""
+    retry = Retry(
+        total=retries, read=0, backoff_factor=0.1,
+        status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class CircuitBreaker:
+    """Stop calling a source after ``failures`` errors in a row.
+
+    While open, calls are skipped for ``reset_after`` seconds; then one
+    trial call is let through (half-open) and its outcome closes or
+    reopens the breaker.
+    """
+
+    def __init__(self, failures=3, reset_after=60, clock=time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._errors = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if self._trial or self._cooled_down() else 'open'
+
+    def _cooled_down(self):
+        return self.clock() - self._opened_at >= self.reset_after
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or not self._cooled_down():
+                return False
+            self._trial = True
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._errors = 0
+                self._opened_at = None
+                return
+            self._errors += 1
+            if self._opened_at is not None or self._errors >= self.failures:
+                self._opened_at = self.clock()
+
+
+class RateSource(ABC):
+    """An upstream of PYG rates: ``fetch()`` returns {currency: PYG per unit}.
+
+    HTTP sources share one pooled session per source, so refreshes reuse
+    the TCP/TLS connection instead of opening a new one each time.
+    """
+
+    name = None
+    url = None
+    headers = None
+
+    def __init__(self, url=None, timeout=DEFAULT_TIMEOUT, breaker=None):
+        self.url = url or self.url
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        if hasattr(os, 'register_at_fork'):
+            # Pooled sockets must not be shared with a forked worker
+            os.register_at_fork(after_in_child=self._drop_session)
+
+    def _drop_session(self):
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = pooled_session()
+        return self._session
+
+    def get(self):
+        response = timed_get(self.url, session=self.session, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    @abstractmethod
+    def fetch(self):
+        """Return {currency: Decimal PYG per unit}; raise on any failure."""
+
+
+class ErApiSource(RateSource):
+    """open.er-api.com, which quotes every currency per unit of the base (PYG)."""
+
+    name = 'er-api'
+    url = ER_API_URL
+
+    def fetch(self):
+        data = self.get().json()
+        if data.get('result') != 'success':
+            raise ValueError(f"er-api answered {data.get('result')!r}: {data.get('error-type')}")
+        quoted = data.get('rates') or {}
+        # X per PYG, inverted to PYG per X: the app converts to PYG
+        pyg = Decimal(str(quoted.get('PYG', 0)))
+        if not pyg:
+            raise ValueError('er-api table has no PYG rate')
+        rates = {
+            code: float(round(pyg / Decimal(str(rate)), 4))
+            for code, rate in quoted.items() if code != 'PYG' and rate
+        }
+        if not rates:
+            raise ValueError('No exchange rates found')
+        return rates
+
+
+class BcpSource(RateSource):
+    """Sell rates scraped from the Banco Central del Paraguay quotes page."""
+
+    name = 'bcp'
+    url = BCP_URL
+    headers = BCP_HEADERS
+
+    def fetch(self):
+        soup = BeautifulSoup(self.get().text, 'html.parser')
+
+        # Find the exchange rate table
+        table = soup.find('table', {'class': 'table'})
+        if not table:
+            raise ValueError("Exchange rate table not found")
+
+        rates = {}
+        for row in table.find_all('tr')[1:]:  # Skip header row
+            columns = row.find_all('td')
+            if len(columns) >= 4:  # Ensure row has enough columns (including sell rate)
+                try:
+                    currency_code = columns[1].text.strip()
+                    sell_rate_text = columns[3].text.strip().replace('.', '').replace(',', '.')  # Use column 3 for sell rate
+                    if currency_code and sell_rate_text:
+                        rates[currency_code] = float(sell_rate_text)
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"Error processing row: {e}")
+                    continue
+
+        if not rates:
+            raise ValueError("No exchange rates found")
+        return rates
+
+
+class StaticSource(RateSource):
+    """A fixed table, for installs without network access (it always answers first)."""
+
+    name = 'static'
+
+    def __init__(self, rates, **kwargs):
+        super().__init__(**kwargs)
+        self.rates = dict(rates)
+
+    def fetch(self):
+        return dict(self.rates)
+
+
+SOURCE_TYPES = {source.name: source for source in (ErApiSource, BcpSource)}
+
+
+class FirstGoodRates:
+    """Ask every source at once on a small thread pool; the first good table wins.
+
+    Sources whose circuit breaker is open are skipped. Slower sources keep
+    running after a winner is found, so their breakers still learn whether
+    they work. Returns (source name, rates); raises RatesUnavailable when
+    every source failed or was skipped. Use it as RateProvider's ``fetch``.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self._reset_pool()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_pool)
+
+    def _reset_pool(self):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(len(self.sources), 1), thread_name_prefix='rate-source')
+            return self._pool
+
+    def _attempt(self, source):
+        try:
+            rates = source.fetch()
+        except Exception:
+            source.breaker.record(False)
+            raise
+        source.breaker.record(True)
+        return rates
+
+    def __call__(self):
+        allowed = [source for source in self.sources if source.breaker.allow()]
+        if not allowed:
+            raise RatesUnavailable('every rate source is failing (circuit open)')
+        pool = self._executor()
+        futures = {pool.submit(self._attempt, source): source for source in allowed}
+        errors = []
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                return source.name, future.result()
+            except Exception as e:
+                errors.append(f'{source.name}: {e}')
+        raise RatesUnavailable('; '.join(errors))
+
+    def status(self):
+        return [{'source': source.name, 'circuit': source.breaker.state} for source in self.sources]
@@ -0,0 +1,33 @@
+from sqlalchemy import select
+
+from models import db
+
+
+class RowView:
+    """The columns a read-only list shows, fetched as plain rows instead of ORM instances.
+
+    ``columns`` maps each output name to a column expression, in output
+    order. select() is a Core SELECT of just those columns and fetch()
+    runs one through the session (so tenant scoping still applies); the
+    rows that come back are tuples with attribute access, which templates
+    can read like model instances but without the identity map and
+    attribute instrumentation. dicts() names their values for JSON, which
+    the app's JSON provider encodes as they are, Decimals and dates
+    included.
+    """
+
+    def __init__(self, columns):
+        self.columns = dict(columns)
+        self.names = tuple(self.columns)
+
+    def select(self, names=None):
+        """SELECT the given columns (all by default), each labelled with its output name."""
+        return select(*[self.columns[name].label(name) for name in names or self.names])
+
+    def fetch(self, statement):
+        return db.session.execute(statement).all()
+
+    def dicts(self, rows, names=None):
+        """Lazily, a dict per row of ``rows`` selected with select(names)."""
+        names = tuple(names or self.names)
+        return (dict(zip(names, row)) for row in rows)
@@ -0,0 +1,187 @@
+import json
+import logging
+import re
+import threading
+import time
+
+from flask import abort, g, has_request_context, jsonify, render_template, request
+from flask_login import login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """Reduce SQL to its shape: literals become ?, IN lists of any length become (?...)."""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _LITERAL.sub('?', shape)
+    return _IN_LIST.sub('(?...)', shape)
+
+
+class RequestProfile:
+    """Queries issued while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_seconds = 0.0
+        self.statements = []  # (seconds, statement)
+        self.shapes = {}  # shape -> executions
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.db_seconds += seconds
+        self.statements.append((seconds, statement))
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda item: item[0], reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        """Shapes run at least ``threshold`` times: usually a lazy load inside a loop."""
+        return sorted(
+            ((count, shape) for shape, count in self.shapes.items() if count >= threshold),
+            reverse=True
+        )
+
+
+class EndpointStats:
+    """Running totals for one endpoint across profiled requests."""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.request_seconds = 0.0
+        self.repeated = {}  # shape -> number of requests it was repeated in
+        self.slowest = []  # (seconds, statement), the slowest few ever seen
+
+    def add(self, profile, request_seconds, repeated, slow_limit):
+        self.requests += 1
+        self.queries += profile.count
+        self.max_queries = max(self.max_queries, profile.count)
+        self.db_seconds += profile.db_seconds
+        self.request_seconds += request_seconds
+        for _, shape in repeated:
+            self.repeated[shape] = self.repeated.get(shape, 0) + 1
+        self.slowest = sorted(self.slowest + profile.slowest(slow_limit), key=lambda item: item[0], reverse=True)[:slow_limit]
+
+    def as_dict(self, endpoint):
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'avg_queries': round(self.queries / self.requests, 1),
+            'max_queries': self.max_queries,
+            'avg_db_ms': round(self.db_seconds / self.requests * 1000, 2),
+            'avg_request_ms': round(self.request_seconds / self.requests * 1000, 2),
+            'repeated_shapes': [
+                {'sql': shape, 'requests': count}
+                for shape, count in sorted(self.repeated.items(), key=lambda item: item[1], reverse=True)
+            ],
+            'slowest': [{'ms': round(seconds * 1000, 2), 'sql': statement} for seconds, statement in self.slowest]
+        }
+
+
+class SQLProfiler:
+    """Opt-in per-request SQL profiling.
+
+    Times every statement through the engine cursor events and, per request,
+    adds a Server-Timing header, logs one JSON line and folds the numbers
+    into per-endpoint totals served at /debug/sql. Statement shapes repeated
+    ``repeat_threshold`` or more times in one request are flagged as likely
+    N+1 queries. Totals are per process.
+    """
+
+    def __init__(self, slow_limit=5, repeat_threshold=5):
+        self.slow_limit = slow_limit
+        self.repeat_threshold = repeat_threshold
+        self.enabled = False
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Hooks are always installed and do nothing while disabled, so the
+        # profiler can be switched on without re-registering anything
+        self.enabled = app.config.get('SQL_PROFILER', False)
+        self.slow_limit = app.config.get('SQL_PROFILER_SLOWEST', self.slow_limit)
+        self.repeat_threshold = app.config.get('SQL_PROFILER_REPEAT_THRESHOLD', self.repeat_threshold)
+
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/debug/sql', 'debug_sql', login_required(self.report_view))
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_profile' in g:
+            conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_profile' in g:
+            started = conn.info['sql_profiler_started'].pop()
+            g.sql_profile.record(statement, time.perf_counter() - started)
+
+    def _start_request(self):
+        if self.enabled and request.endpoint not in ('debug_sql', 'static'):
+            g.sql_profile = RequestProfile()
+
+    def _finish_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        request_seconds = time.perf_counter() - profile.started
+        repeated = profile.repeated(self.repeat_threshold)
+
+        response.headers.add('Server-Timing', f'db;dur={profile.db_seconds * 1000:.2f};desc="{profile.count} queries"')
+        response.headers.add('Server-Timing', f'app;dur={request_seconds * 1000:.2f}')
+        if repeated:
+            response.headers.add('Server-Timing', f'nplus1;desc="{len(repeated)} repeated statements"')
+
+        endpoint = request.endpoint or request.path
+        logger.info(json.dumps({
+            'event': 'sql_profile',
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.count,
+            'db_ms': round(profile.db_seconds * 1000, 2),
+            'request_ms': round(request_seconds * 1000, 2),
+            'slowest': [{'ms': round(seconds * 1000, 2), 'sql': statement_shape(statement)}
+                        for seconds, statement in profile.slowest(self.slow_limit)],
+            'repeated': [{'count': count, 'sql': shape} for count, shape in repeated]
+        }))
+
+        with self._lock:
+            self._endpoints.setdefault(endpoint, EndpointStats()).add(profile, request_seconds, repeated, self.slow_limit)
+        return response
+
+    def report(self):
+        """Per-endpoint totals, endpoints with the most queries per request first."""
+        with self._lock:
+            rows = [stats.as_dict(endpoint) for endpoint, stats in self._endpoints.items()]
+        return sorted(rows, key=lambda row: row['avg_queries'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def report_view(self):
+        if not self.enabled:
+            abort(404)
+        if request.args.get('reset'):
+            self.reset()
+        if request.args.get('format') == 'json':
+            return jsonify(self.report())
+        return render_template('debug_sql.html', endpoints=self.report(), repeat_threshold=self.repeat_threshold)
+
+
+# Installed by app.py; profiles only when SQL_PROFILER is set
+sql_profiler = SQLProfiler()
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm.util import identity_key
+
+from models import db, Product
+from services.data_versions import bump_versions
+
+
+def _update_statement(scoped, guarded):
+    """UPDATE products SET stock_qty = stock_qty + :delta WHERE id = :product_id [...]."""
+    table = Product.__table__
+    stmt = table.update().where(table.c.id == bindparam('product_id')).values(
+        stock_qty=table.c.stock_qty + bindparam('delta'),
+        updated_at=bindparam('touched_at')
+    )
+    if scoped:
+        stmt = stmt.where(table.c.user_id == bindparam('owner_id'))
+    if guarded:
+        stmt = stmt.where(table.c.stock_qty >= bindparam('needed'))
+    return stmt
+
+
+# Built once so every call reuses the compiled statement
+UPDATE_STATEMENTS = {
+    (scoped, guarded): _update_statement(scoped, guarded)
+    for scoped in (False, True) for guarded in (False, True)
+}
+
+
+def change_stock(changes, user_id=None, allow_negative=False):
+    """Add each {product_id: delta} to the product's stock in the database.
+
+    Every product gets one UPDATE ... SET stock_qty = stock_qty + :delta,
+    and decrements carry AND stock_qty >= :quantity unless
+    ``allow_negative``. The database applies each change against the
+    current value, so concurrent writers neither lose updates nor oversell.
+
+    Returns the changes that could not be applied, as dicts with
+    product_id, requested and available (None when the product does not
+    exist or is not ``user_id``'s). Applied changes stay in the session's
+    transaction; roll back if a failure should undo them.
+    """
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    failed = {}
+    applied = False
+    for product_id, delta in changes.items():
+        delta = float(delta)
+        if not delta:
+            continue
+        guarded = delta < 0 and not allow_negative
+        result = connection.execute(UPDATE_STATEMENTS[user_id is not None, guarded], {
+            'product_id': product_id,
+            'delta': delta,
+            'touched_at': now,
+            'owner_id': user_id,
+            'needed': -delta
+        })
+        if result.rowcount != 1:
+            failed[product_id] = abs(delta)
+        else:
+            applied = True
+
+        # Loaded copies now hold an old stock level; reload it on next access
+        product = db.session.identity_map.get(identity_key(Product, product_id))
+        if product is not None:
+            db.session.expire(product, ['stock_qty', 'updated_at'])
+
+    if applied and user_id is not None:
+        # Core UPDATEs skip the flush that would bump the product list's version
+        bump_versions(connection, [(user_id, 'products')])
+
+    if not failed:
+        return []
+    query = db.session.query(Product.id, Product.stock_qty).filter(Product.id.in_(list(failed)))
+    if user_id is not None:
+        query = query.filter(Product.user_id == user_id)
+    available = dict(query)
+    return [{
+        'product_id': product_id,
+        'requested': requested,
+        'available': available.get(product_id)
+    } for product_id, requested in failed.items()]
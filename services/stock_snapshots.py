@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import event, exists, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from models import db, Product, StockMovement, StockSnapshot
+from services.chunking import chunked
+
+
+def take_snapshots(user_id=None, product_ids=None):
+    """Checkpoint the current stock of products (all, one user's, or the given ids).
+
+    Runs as INSERT ... SELECT in its own transaction and returns the number
+    of snapshots written. Each snapshot is stamped with the product's latest
+    movement (or its creation) as read by the same statement, not with the
+    clock: writers stamp a movement after the stock UPDATE that locks the
+    product, so a movement committed after this read is always later than
+    the stamp and gets replayed. Products whose stamp is already anchored
+    are skipped.
+    """
+    table = StockSnapshot.__table__
+    now = datetime.utcnow()
+    last_moved = select(func.max(StockMovement.timestamp)).where(
+        StockMovement.product_id == Product.id
+    ).scalar_subquery()
+    taken_at = func.coalesce(last_moved, Product.created_at, literal(now, StockSnapshot.taken_at.type))
+    anchored = exists().where(StockSnapshot.product_id == Product.id, StockSnapshot.taken_at == taken_at)
+    chunks = [None] if product_ids is None else chunked(product_ids)
+    written = 0
+    with db.engine.begin() as conn:
+        for chunk in chunks:
+            current = select(Product.id, Product.stock_qty, taken_at).where(~anchored)
+            if user_id is not None:
+                current = current.where(Product.user_id == user_id)
+            if chunk is not None:
+                current = current.where(Product.id.in_(chunk))
+            result = conn.execute(table.insert().from_select(['product_id', 'quantity', 'taken_at'], current))
+            written += result.rowcount
+    return written
+
+
+class SnapshotPolicy:
+    """Snapshot recently moved products once every ``every`` stock movements.
+
+    Movements added through the ORM are counted automatically; bulk writers
+    report theirs with track(). Counting is per process, which only changes
+    how often checkpoints happen, not their correctness.
+    """
+
+    def __init__(self, every=5000):
+        self.every = every
+        self._pending = 0
+        self._touched = set()
+        self._lock = threading.Lock()
+
+    def track(self, product_ids, movements=None):
+        product_ids = set(product_ids)
+        with self._lock:
+            self._touched.update(product_ids)
+            self._pending += movements if movements is not None else len(product_ids)
+
+    def due(self):
+        """Return the product ids to snapshot if the threshold was reached, resetting the count."""
+        with self._lock:
+            if not self.every or self._pending < self.every:
+                return None
+            touched, self._touched, self._pending = self._touched, set(), 0
+        return touched
+
+    def install(self):
+        @event.listens_for(Session, 'after_flush')
+        def count_movements(session, flush_context):
+            moved = [obj.product_id for obj in session.new if isinstance(obj, StockMovement)]
+            if moved:
+                self.track(moved, len(moved))
+
+        @event.listens_for(Session, 'after_commit')
+        def snapshot_if_due(session):
+            touched = self.due()
+            if touched:
+                take_snapshots(product_ids=touched)
+
+
+snapshot_policy = SnapshotPolicy()
+
+
+def _anchor_query(product_ids, at, before):
+    """Nearest snapshot per product at or before ``at`` (or after it), as (product_id, taken_at, quantity)."""
+    nearest = func.max if before else func.min
+    bound = StockSnapshot.taken_at <= at if before else StockSnapshot.taken_at > at
+    anchors = db.session.query(
+        StockSnapshot.product_id,
+        nearest(StockSnapshot.taken_at).label('taken_at')
+    ).filter(
+        StockSnapshot.product_id.in_(product_ids), bound
+    ).group_by(StockSnapshot.product_id).subquery()
+    return anchors, db.session.query(
+        StockSnapshot.product_id, StockSnapshot.taken_at, StockSnapshot.quantity
+    ).join(
+        anchors, (anchors.c.product_id == StockSnapshot.product_id) & (anchors.c.taken_at == StockSnapshot.taken_at)
+    )
+
+
+def stock_as_of(product_ids, at):
+    """Return {product_id: {...}} with each product's stock at datetime ``at``.
+
+    Starts from the latest snapshot at or before ``at`` and adds the
+    movements after it. Products with no earlier snapshot start from the
+    next snapshot (or the live stock level) and subtract the movements
+    between ``at`` and that point instead.
+    """
+    product_ids = list(product_ids)
+    result = {}
+
+    anchors, snapshots = _anchor_query(product_ids, at, before=True)
+    for product_id, taken_at, quantity in snapshots:
+        result[product_id] = {'snapshot_at': taken_at, 'quantity': quantity, 'replayed': 0}
+    if result:
+        tail = db.session.query(
+            StockMovement.product_id, func.sum(StockMovement.quantity), func.count(StockMovement.id)
+        ).join(
+            anchors, anchors.c.product_id == StockMovement.product_id
+        ).filter(
+            StockMovement.timestamp > anchors.c.taken_at,
+            StockMovement.timestamp <= at
+        ).group_by(StockMovement.product_id)
+        for product_id, quantity, count in tail:
+            result[product_id]['quantity'] += quantity or 0
+            result[product_id]['replayed'] = count
+
+    missing = [product_id for product_id in product_ids if product_id not in result]
+    if missing:
+        later_anchors, later = _anchor_query(missing, at, before=False)
+        start = {product_id: (taken_at, quantity) for product_id, taken_at, quantity in later}
+        live = [product_id for product_id in missing if product_id not in start]
+        if live:
+            start.update((product_id, (None, stock_qty)) for product_id, stock_qty in
+                         db.session.query(Product.id, Product.stock_qty).filter(Product.id.in_(live)))
+        # Movements between ``at`` and each product's starting point, in one grouped query
+        since = dict.fromkeys(start, (0, 0))
+        movements = db.session.query(
+            StockMovement.product_id, func.sum(StockMovement.quantity), func.count(StockMovement.id)
+        ).outerjoin(
+            later_anchors, later_anchors.c.product_id == StockMovement.product_id
+        ).filter(
+            StockMovement.product_id.in_(missing),
+            StockMovement.timestamp > at,
+            or_(later_anchors.c.taken_at.is_(None), StockMovement.timestamp <= later_anchors.c.taken_at)
+        ).group_by(StockMovement.product_id)
+        for product_id, quantity, count in movements:
+            since[product_id] = (quantity or 0, count)
+        for product_id, (taken_at, quantity) in start.items():
+            quantity_since, count = since[product_id]
+            result[product_id] = {'snapshot_at': taken_at, 'quantity': quantity - quantity_since, 'replayed': count}
+    return result
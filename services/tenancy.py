@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+
+from flask import g, has_request_context
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models import TenantOwned
+
+# Matches the tables a statement reads or changes, with their alias if any
+_TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?(?:\s+AS\s+"?(\w+)"?)?', re.IGNORECASE)
+
+
+class UnscopedQuery(RuntimeError):
+    """A statement touched a tenant table without filtering on its user_id."""
+
+
+def current_tenant():
+    """The id of the user the current request runs for, or None outside a logged-in request."""
+    return g.get('tenant_id') if has_request_context() else None
+
+
+@lru_cache(maxsize=4096)
+def tenant_criteria(model, tenant_id):
+    """The loader option limiting ``model`` to one tenant, built once and reused.
+
+    A plain expression rather than a lambda: lambda criteria are re-run on
+    every execution to pull their bound values out.
+    """
+    return with_loader_criteria(model, model.user_id == tenant_id, include_aliases=True)
+
+
+def unscoped_tables(statement, tables):
+    """The ``tables`` a SELECT, UPDATE or DELETE names without a <table>.user_id = / IN condition."""
+    if statement.lstrip()[:6].upper() == 'INSERT':
+        return []
+    return [
+        table for table, alias in _TABLE_REFERENCE.findall(statement)
+        if table in tables
+        and not re.search(rf'"?\b{alias or table}"?\.user_id\s*(?:=|IN\b)', statement, re.IGNORECASE)
+    ]
+
+
+class TenantScope:
+    """Limit every ORM query in a logged-in request to the user's own rows.
+
+    Models that mix in TenantOwned get ``user_id = <current user>`` added
+    to each SELECT, UPDATE and DELETE through the ORM, including
+    relationship loads, so a forgotten filter cannot read another
+    tenant's rows. Work outside a request (CLI, background threads) is not
+    scoped. Pass ``execution_options(all_tenants=True)`` for a query that
+    has to look across tenants.
+
+    In strict mode (the tests) SQL that reaches a tenant table without a
+    user_id condition, such as hand-written Core statements, raises
+    UnscopedQuery instead of running. The unit of work's own UPDATEs and
+    DELETEs by primary key pass: they write rows the session already
+    loaded through scoped queries.
+    """
+
+    def __init__(self):
+        self.strict = False
+        self._tables = None
+
+    def init_app(self, app):
+        # Hooks are always installed; strict only adds the statement check
+        self.strict = app.config.get('TENANT_SCOPE_STRICT', False)
+        event.listen(Session, 'do_orm_execute', self._scope_orm_execute)
+        event.listen(Engine, 'before_cursor_execute', self._check_statement)
+        event.listen(Session, 'before_flush', self._start_flush)
+        # First, so Core statements other after_flush hooks run are still checked
+        event.listen(Session, 'after_flush', self._end_flush, insert=True)
+        app.before_request(self._start_request)
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = {model.__table__.name for model in TenantOwned.__subclasses__()}
+        return self._tables
+
+    def _start_request(self):
+        # Resolved before the view runs; loading the user is not itself scoped
+        g.tenant_id = current_user.id if current_user.is_authenticated else None
+
+    def _start_flush(self, session, flush_context, instances):
+        session.connection().info['tenant_flush'] = True
+
+    def _end_flush(self, session, flush_context):
+        session.connection().info.pop('tenant_flush', None)
+
+    def _scope_orm_execute(self, execute_state):
+        tenant_id = current_tenant()
+        if tenant_id is None or execute_state.execution_options.get('all_tenants', False):
+            return
+        if execute_state.is_column_load:
+            # Refreshing expired attributes of a row this session already holds; the
+            # ORM leaves loader criteria out of these, so let the strict check pass them
+            execute_state.update_execution_options(all_tenants=True)
+            return
+        # Lazy loads too: objects created in this session never went through
+        # a scoped query whose criteria would carry over
+        if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+            return
+        # Only the tenant models the statement selects from: each option costs
+        # compile and cache-key time, so adding all of them slowed every query
+        # down. Tables reached only through a subquery keep their explicit
+        # filter, which strict mode checks.
+        options = [
+            tenant_criteria(mapper.class_, tenant_id)
+            for mapper in execute_state.all_mappers if issubclass(mapper.class_, TenantOwned)
+        ]
+        if options:
+            execute_state.statement = execute_state.statement.options(*options)
+
+    def _check_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.strict or current_tenant() is None:
+            return
+        if context is not None and context.execution_options.get('all_tenants', False):
+            return
+        if conn.info.get('tenant_flush'):
+            return
+        missing = unscoped_tables(statement, self.tables)
+        if missing:
+            raise UnscopedQuery(f"Query on {', '.join(sorted(set(missing)))} is not filtered by user_id: {statement}")
+
+
+tenant_scope = TenantScope()
@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import services.chunking as chunking
+from conftest import login
+from models import db, Bill, BillItem, Product, StockMovement
+
+
+@pytest.fixture
+def tenant_sizes():
+    return {'products': 10, 'bills': 0}, {}
+
+
+def bill_request(rows, lines):
+    return {
+        'client_id': rows['clients'][0], 'issue_date': date.today().isoformat(),
+        'due_date': date.today().isoformat(), 'currency': 'PYG', 'items': lines
+    }
+
+
+def stock(product_ids):
+    return dict(db.session.query(Product.id, Product.stock_qty).filter(Product.id.in_(product_ids)))
+
+
+def test_lines_go_in_with_chunked_lookups_and_one_total(app, tenants, capture_sql, monkeypatch):
+    (owner, rows), _ = tenants
+    monkeypatch.setattr(chunking, 'IN_CHUNK_SIZE', 3)
+    products = rows['products'][1:3] + rows['products'][4:6] + rows['products'][7:9]  # 50 in stock each
+    lines = [{'product_id': product, 'quantity': 2, 'price': 10.05, 'tax_rate': 10} for product in products]
+    # A repeated product and a second tax rate
+    lines.append({'product_id': products[0], 'quantity': 1, 'price': 0.33, 'tax_rate': 5})
+    with app.app_context():
+        before = stock(products)
+
+    with capture_sql() as statements:
+        response = login(app, owner).post('/api/bills', json=bill_request(rows, lines))
+    assert response.status_code == 201, response.get_json()
+    product_lookups = [s for s, _ in statements if s.lstrip().startswith('SELECT') and 'FROM products' in s and 'IN (' in s]
+    assert len(product_lookups) == 2  # six products, three per IN
+
+    with app.app_context():
+        bill = db.session.get(Bill, response.get_json()['id'])
+        # 6 x 20.10 at 10% plus 0.33 at 5%: 120.60 + 12.06 + 0.33 + 0.0165
+        assert bill.total_amount == Decimal('133.01')
+        assert BillItem.query.filter_by(bill_id=bill.id).count() == 7
+        assert StockMovement.query.filter_by(source_type='bill', source_id=bill.id).count() == 7
+        after = stock(products)
+    assert after == {product: before[product] - (3 if product == products[0] else 2) for product in products}
+
+
+def test_a_shortfall_or_a_foreign_product_writes_nothing(app, tenants):
+    (owner, rows), (_, theirs) = tenants
+    client = login(app, owner)
+    scarce, plenty = rows['products'][0], rows['products'][1]  # 5 and 50 in stock
+    with app.app_context():
+        before = stock([scarce, plenty])
+
+    response = client.post('/api/bills', json=bill_request(rows, [
+        {'product_id': plenty, 'quantity': 1, 'price': 1},
+        {'product_id': scarce, 'quantity': 4, 'price': 1},
+        {'product_id': scarce, 'quantity': 2, 'price': 1},
+    ]))
+    assert response.status_code == 400
+    assert response.get_json()['lines'] == [{'product_id': scarce, 'requested': 6.0, 'available': 5.0, 'name': 'Product 0'}]
+
+    response = client.post('/api/bills', json=bill_request(rows, [
+        {'product_id': plenty, 'quantity': 1, 'price': 1}, {'product_id': theirs['products'][0], 'quantity': 1, 'price': 1}
+    ]))
+    assert response.status_code == 404
+
+    with app.app_context():
+        assert stock([scarce, plenty]) == before
+        assert Bill.query.filter_by(user_id=owner).count() == 0
+
+
+def test_a_payment_in_another_currency_is_rounded_to_the_cent(app, tenants):
+    (owner, rows), _ = tenants
+    with app.app_context():
+        bill = Bill(user_id=owner, client_id=rows['clients'][0], bill_number='BILL-EUR', issue_date=date.today(),
+                    due_date=date.today(), total_amount=Decimal('10'), currency='EUR', status='Unpaid')
+        db.session.add(bill)
+        db.session.commit()
+        bill_id = bill.id
+
+    # 10.822 USD at 7300 is 10.00008 EUR at 7900: the balance once rounded
+    response = login(app, owner).post(f'/mark_paid/{bill_id}', data={
+        'payment_amount': '10.822', 'payment_currency': 'USD', 'payment_method': 'cash', 'notes': ''
+    })
+    assert response.status_code == 302
+    with app.app_context():
+        bill = db.session.get(Bill, bill_id)
+        assert (bill.status, bill.paid_amount) == ('Paid', Decimal('10.00'))
+        assert [payment.amount for payment in bill.bill_payments] == [Decimal('10.00')]
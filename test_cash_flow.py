@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from models import db, CashFlowDaily, Transaction
+from services.cash_flow import EXCLUDED_STATUSES, rebuild_cash_flow_rollup
+
+
+def rollup(user_id):
+    """cash_flow_daily for a user as {(date, type, currency): (amount, count)}."""
+    rows = db.session.query(
+        CashFlowDaily.date, CashFlowDaily.type, CashFlowDaily.currency, CashFlowDaily.amount, CashFlowDaily.count
+    ).filter(CashFlowDaily.user_id == user_id)
+    return {(day, type_, currency): (amount, count) for day, type_, currency, amount, count in rows}
+
+
+def grouped(user_id):
+    """The same figures grouped straight from the transaction table."""
+    currency = func.coalesce(Transaction.currency, 'PYG')
+    rows = db.session.query(
+        Transaction.date, Transaction.type, currency, func.sum(Transaction.amount), func.count(Transaction.id)
+    ).filter(
+        Transaction.user_id == user_id,
+        func.coalesce(Transaction.status, 'CONFIRMED').notin_(EXCLUDED_STATUSES)
+    ).group_by(Transaction.date, Transaction.type, currency)
+    return {(day, type_, currency): (amount, count) for day, type_, currency, amount, count in rows}
+
+
+def test_rollup_follows_inserts_edits_and_removals(app, tenants):
+    (owner, _), (neighbour, _) = tenants
+    today = date.today()
+    with app.app_context():
+        assert rollup(owner) == grouped(owner) != {}
+        neighbours = rollup(neighbour)
+
+        def check():
+            db.session.commit()
+            assert rollup(owner) == grouped(owner)
+
+        added = Transaction(user_id=owner, type='INCOME', amount=Decimal('12.34'), currency='USD', date=today)
+        db.session.add(added)
+        check()
+        added.amount = Decimal('99.99')
+        check()
+        added.date = today - timedelta(days=3)
+        check()
+        added.currency = 'EUR'
+        check()
+
+        rows = Transaction.query.filter_by(user_id=owner).order_by(Transaction.id).all()
+        rows[0].status = 'CANCELLED'
+        check()
+        rows[0].status = 'CONFIRMED'
+        rows[1].type, rows[1].amount = 'EXPENSE', Decimal('0.01')
+        check()
+        db.session.delete(rows[2])
+        check()
+
+        # Rolled back with the flush that caused it
+        rows[3].amount = Decimal('1000000')
+        db.session.flush()
+        db.session.rollback()
+        assert rollup(owner) == grouped(owner)
+        assert rollup(neighbour) == neighbours
+
+
+def test_a_day_whose_last_transaction_goes_away_is_dropped(app, tenants):
+    (owner, _), _ = tenants
+    lonely_day = date(2020, 2, 29)
+    key = (lonely_day, 'EXPENSE', 'PYG')
+    with app.app_context():
+        first, second = (Transaction(user_id=owner, type='EXPENSE', amount=5, currency='PYG', date=lonely_day)
+                         for _ in range(2))
+        db.session.add_all([first, second])
+        db.session.commit()
+        assert rollup(owner)[key] == (Decimal('10.00'), 2)
+
+        db.session.delete(first)
+        db.session.commit()
+        assert rollup(owner)[key] == (Decimal('5.00'), 1)
+
+        # Moving or cancelling the last one empties the day as deleting would
+        second.date = lonely_day + timedelta(days=1)
+        db.session.commit()
+        assert key not in rollup(owner)
+        second.date = lonely_day
+        db.session.commit()
+        second.status = 'CANCELLED'
+        db.session.commit()
+        assert key not in rollup(owner)
+        assert rollup(owner) == grouped(owner)
+
+
+def test_rebuilding_one_user_leaves_the_others_alone(app, tenants):
+    (owner, _), (neighbour, _) = tenants
+    with app.app_context():
+        # Drift both users' rollups behind the hooks' back
+        db.session.execute(CashFlowDaily.__table__.update().values(count=99))
+        db.session.commit()
+
+        assert rebuild_cash_flow_rollup(owner) == len(grouped(owner))
+        assert rollup(owner) == grouped(owner)
+        assert {count for _, count in rollup(neighbour).values()} == {99}
+
+        rebuild_cash_flow_rollup()
+        assert rollup(neighbour) == grouped(neighbour)
@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import app as erp
+from conftest import TEST_RATES, login
+from models import Transaction
+from services.currency import RateSnapshot, group_by_currency
+
+
+def counting(rates):
+    calls = []
+
+    def resolve(currency):
+        calls.append(currency)
+        return rates[currency]
+    return resolve, calls
+
+
+def test_each_currency_is_resolved_once_per_snapshot():
+    resolve, calls = counting({'USD': Decimal('7300'), 'EUR': 7900})
+    snapshot = RateSnapshot(resolve)
+    assert snapshot.convert_totals({'USD': Decimal('2'), 'EUR': Decimal('1'), 'PYG': Decimal('500')}) == Decimal('23000.00')
+    assert snapshot.total([(1, 'USD'), (Decimal('0.5'), 'EUR'), (100, None)]) == Decimal('11350.00')
+    # The base currency and a missing code need no lookup
+    assert sorted(calls) == ['EUR', 'USD']
+    assert snapshot.convert_totals({}) == Decimal('0')
+
+
+def test_currency_totals_are_rounded_once_each():
+    snapshot = RateSnapshot(lambda currency: Decimal('7312.5'))
+    # 0.01 USD is 73.125 PYG: three rows converted apart would round three times
+    assert group_by_currency([(Decimal('0.01'), 'USD')] * 3) == {'USD': Decimal('0.03')}
+    assert snapshot.total([(Decimal('0.01'), 'USD')] * 3) == Decimal('219.38')
+    assert snapshot.convert_totals({'USD': Decimal('0.01')}) == Decimal('73.13')
+
+
+def test_summary_converts_with_one_lookup_per_currency(app, tenants, monkeypatch):
+    owner, _ = tenants[0]
+    resolve, calls = counting(TEST_RATES)
+    monkeypatch.setattr(erp, 'get_exchange_rate', resolve)
+
+    summary = login(app, owner).get('/api/transactions/summary?period=yearly').get_json()
+
+    with app.app_context():
+        rows = Transaction.query.filter(
+            Transaction.user_id == owner,
+            Transaction.date >= date.fromisoformat(summary['start_date']),
+            Transaction.date <= date.fromisoformat(summary['end_date'])
+        ).all()
+        expected = {
+            kind: RateSnapshot(TEST_RATES.get).total((row.amount, row.currency) for row in rows if row.type == kind)
+            for kind in ('INCOME', 'EXPENSE')
+        }
+    assert calls == ['USD']
+    assert Decimal(str(summary['income'])) == expected['INCOME']
+    assert Decimal(str(summary['expenses'])) == expected['EXPENSE']
+
+
+def test_summary_converts_each_day_at_that_days_rate(app, tenants, monkeypatch):
+    owner, _ = tenants[0]
+    resolve, calls = counting(TEST_RATES)
+    monkeypatch.setattr(erp, 'get_exchange_rate', resolve)
+    change = date.today() - timedelta(days=5)
+    with app.app_context():
+        erp.rate_history.record_many({'USD': 7000}, on_date=change - timedelta(days=30))
+        erp.rate_history.record_many({'USD': 7500}, on_date=change)
+
+    end = date.today()
+    summary = login(app, owner).get(f'/api/transactions/summary?start_date={end - timedelta(days=19)}&end_date={end}').get_json()
+
+    with app.app_context():
+        rows = Transaction.query.filter(Transaction.user_id == owner, Transaction.date >= end - timedelta(days=19)).all()
+    rate = {'PYG': lambda day: 1, 'USD': lambda day: 7500 if day >= change else 7000}
+    expected = {
+        kind: sum(row.amount * rate[row.currency](row.date) for row in rows if row.type == kind)
+        for kind in ('INCOME', 'EXPENSE')
+    }
+    assert calls == []
+    assert Decimal(str(summary['income'])) == expected['INCOME']
+    assert Decimal(str(summary['expenses'])) == expected['EXPENSE']
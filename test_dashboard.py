@@ -0,0 +1,76 @@
+from datetime import date
+from decimal import Decimal
+
+import app as erp
+from conftest import TEST_RATES, login
+from models import Bill
+from services.currency import RateSnapshot
+from services.dashboard import ACTIVE_BILL_STATUSES, SummaryCache, build_dashboard_summary
+
+
+def test_summary_matches_the_users_rows(app, tenants):
+    (owner, rows), _ = tenants
+    rates = RateSnapshot(TEST_RATES.get)
+    with app.app_context():
+        summary = build_dashboard_summary(owner, rates)
+        active = Bill.query.filter(Bill.user_id == owner, Bill.status.in_(ACTIVE_BILL_STATUSES)).all()
+        outstanding = rates.total((bill.total_amount - (bill.paid_amount or 0), bill.currency) for bill in active)
+    assert summary == {
+        'clients': len(rows['clients']),
+        'vendors': 1,
+        'products': len(rows['products']),
+        'active_bills': len(active),
+        'overdue_bills': sum(bill.due_date < date.today() for bill in active),
+        'outstanding_total': outstanding,
+    }
+    assert summary['outstanding_total'] > Decimal('0')
+
+
+def test_entries_last_until_the_ttl_or_an_invalidation():
+    cache = SummaryCache(ttl=60)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return len(builds)
+
+    assert cache.get_or_build(1, build) == 1
+    assert cache.get_or_build(1, build) == 1
+    assert cache.get_or_build(2, build) == 2
+    cache.invalidate(1)
+    assert cache.get_or_build(1, build) == 3
+    assert cache.get_or_build(2, build) == 2
+
+    cache.ttl = 0
+    assert cache.get_or_build(2, build) == 4
+
+
+def test_a_build_overlapping_an_invalidation_is_not_stored():
+    cache = SummaryCache(ttl=60)
+
+    def build_during_a_write():
+        # A write commits while the old figures are being read
+        cache.invalidate(1)
+        return 'stale'
+
+    assert cache.get_or_build(1, build_during_a_write) == 'stale'
+    assert cache.get_or_build(1, lambda: 'fresh') == 'fresh'
+    assert cache.get_or_build(1, lambda: 'later') == 'fresh'
+
+    def build_during_a_clear():
+        cache.clear()
+        return 'stale'
+
+    assert cache.get_or_build(2, build_during_a_clear) == 'stale'
+    assert cache.get_or_build(2, lambda: 'fresh') == 'fresh'
+
+
+def test_a_committed_write_drops_only_its_owners_figures(app, tenants):
+    (owner, _), (neighbour, _) = tenants
+    login(app, owner).get('/')
+    login(app, neighbour).get('/')
+    assert set(erp.dashboard_cache._entries) == {owner, neighbour}
+
+    login(app, owner).post('/create_client', data={'name': 'New', 'email': 'new@example.com'})
+    assert set(erp.dashboard_cache._entries) == {neighbour}
+    assert b'<h3 class="mb-0">4</h3>' in login(app, owner).get('/').data
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+
+from conftest import login
+
+LISTS = ['/api/products', '/api/transactions', '/api/purchase-invoices']
+
+
+@pytest.mark.parametrize('url', LISTS)
+def test_unchanged_list_answers_304_without_running_the_view(app, tenants, capture_sql, url):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+    first = client.get(url)
+    assert first.status_code == 200
+    # Read the body: a streamed list keeps its request context until then
+    first.get_data()
+    etag, weak = first.get_etag()
+    assert weak and etag
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    with capture_sql() as statements:
+        response = client.get(url, headers={'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.get_etag() == (etag, True)
+    # The logged-in user and the version; the list itself is never read
+    assert len(statements) == 2
+    assert 'data_versions' in statements[-1][0]
+
+
+def test_writes_change_only_their_lists_etag(app, tenants):
+    (owner, rows), (other, _) = tenants
+    client, other_client = login(app, owner), login(app, other)
+
+    def etags(client):
+        tags = {}
+        for url in LISTS:
+            response = client.get(url)
+            response.get_data()
+            tags[url] = response.get_etag()[0]
+        return tags
+
+    before, others = etags(client), etags(other_client)
+    assert before.keys() == others.keys() and not set(before.values()) & set(others.values())
+
+    # Created through the unit of work
+    assert client.post('/api/products', json={
+        'name': 'New', 'category': 'General', 'buying_date': date.today().isoformat(), 'unit': 'unit',
+        'purchase_price': 1, 'sell_price': 2, 'max_stock': 10
+    }).status_code == 201
+    after = etags(client)
+    assert after['/api/products'] != before['/api/products']
+    assert {url: after[url] for url in LISTS[1:]} == {url: before[url] for url in LISTS[1:]}
+
+    # A Core UPDATE of the stock, outside the flush
+    before = after
+    assert client.post(f"/api/products/{rows['products'][0]}/adjust-stock",
+                       json={'quantity': 3, 'reason': 'Count'}).status_code in (200, 201)
+    after = etags(client)
+    assert after['/api/products'] != before['/api/products']
+
+    before = after
+    assert client.post('/api/transactions', json={
+        'type': 'INCOME', 'amount': 5, 'description': 'Sale', 'date': date.today().isoformat()
+    }).status_code == 201
+    after = etags(client)
+    assert after['/api/transactions'] != before['/api/transactions']
+    assert after['/api/products'] == before['/api/products']
+
+    # The purchase invoice list shows vendor names
+    before = after
+    client.post(f"/edit_vendor/{rows['vendor']}", data={'name': 'Renamed', 'email': 'vendor@example.com'})
+    after = etags(client)
+    assert after['/api/purchase-invoices'] != before['/api/purchase-invoices']
+    assert [invoice['vendor_name'] for invoice in client.get('/api/purchase-invoices').get_json()][:1] == ['Renamed']
+
+    # None of it touched the other user's versions
+    assert etags(other_client) == others
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from models import db
+from services.database import database_url, engine_profile
+
+
+def pragma(name):
+    return db.session.execute(f'PRAGMA {name}').scalar()
+
+
+def test_sqlite_connections_get_the_wal_profile(app):
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('busy_timeout') == 5000
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('cache_size') == -64 * 1024
+        assert pragma('mmap_size') == 256 * 1024 * 1024
+
+
+def test_postgresql_profile_pools_with_pre_ping():
+    name, options = engine_profile(make_url('postgresql://erp@db/erp'), {'DB_POOL_SIZE': 4, 'DB_POOL_RECYCLE': 600})
+    assert name == 'postgresql'
+    assert options['pool_size'] == 4
+    assert options['pool_pre_ping'] is True
+    assert options['pool_recycle'] == 600
+    assert engine_profile(make_url('postgresql://erp@db/erp'), {'DB_ENGINE_PROFILE': 'none'}) == ('none', {})
+
+
+def test_database_url_comes_from_the_environment(monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    assert database_url() == 'sqlite:///database.db'
+    monkeypatch.setenv('DATABASE_URL', 'postgres://erp@db/erp')
+    assert database_url() == 'postgresql://erp@db/erp'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_children_do_not_reuse_pooled_connections(app):
+    with app.app_context():
+        db.session.execute('SELECT 1')
+        db.session.remove()
+        assert db.engine.pool.checkedin() == 1
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if db.engine.pool.checkedin() == 0 else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        # The parent's connection survived the child
+        assert db.session.execute('SELECT 1').scalar() == 1
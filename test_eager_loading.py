@@ -0,0 +1,82 @@
+import pytest
+
+from conftest import login
+from models import db, Bill, BillItem
+from services.billing import PAID_BILLS_PAGE_SIZE, paid_bills_page
+
+PAGES = ['/bills', '/billing', '/bill/{bill_id}']
+
+
+@pytest.fixture
+def tenant_sizes():
+    # Enough paid bills in the neighbour's history for it to need a second page
+    return {'bills': 8}, {'clients': 10, 'products': 30, 'bills': 4 * PAID_BILLS_PAGE_SIZE + 12}
+
+
+@pytest.fixture
+def tenants(app, tenants):
+    # And a bill with a line per product for the detail page
+    _, (large, large_rows) = tenants
+    with app.app_context():
+        db.session.add_all(BillItem(bill_id=large_rows['bills'][2], product_id=product, quantity=1, price=1, tax_rate=0)
+                           for product in large_rows['products'])
+        db.session.commit()
+    return tenants
+
+
+def count_queries(capture_sql, client, url):
+    with capture_sql() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.data[:500]
+    return len(statements)
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_page_query_count_does_not_grow_with_bills(app, tenants, capture_sql, page):
+    counts = []
+    for user_id, rows in tenants:
+        # A partially paid bill, so the detail page has a payment to load
+        url = page.format(bill_id=rows['bills'][2])
+        counts.append(count_queries(capture_sql, login(app, user_id), url))
+    assert counts[0] == counts[1], f'{page}: {counts[0]} queries for 8 bills, {counts[1]} for {4 * PAID_BILLS_PAGE_SIZE + 12}'
+
+
+def test_paid_history_pages_through_every_paid_bill(app, tenants):
+    user_id, rows = tenants[1]
+    client = login(app, user_id)
+    with app.app_context():
+        paid = Bill.query.filter_by(user_id=user_id, status='Paid').count()
+        seen, cursor = [], None
+        while True:
+            page, cursor = paid_bills_page(user_id, cursor)
+            seen.extend(bill.id for bill in page)
+            if cursor is None:
+                break
+        first_page, next_cursor = paid_bills_page(user_id)
+    assert paid > PAID_BILLS_PAGE_SIZE
+    assert len(seen) == len(set(seen)) == paid
+    assert len(first_page) == PAID_BILLS_PAGE_SIZE
+    assert f'cursor={next_cursor}' in client.get('/billing').get_data(as_text=True)
+    assert client.get('/billing?cursor=not-a-cursor').status_code == 400
+
+
+def test_paid_bills_without_a_paid_date_are_paged_by_issue_date(app, tenants):
+    user_id, _ = tenants[1]
+    client = login(app, user_id)
+    with app.app_context():
+        paid = Bill.query.filter_by(user_id=user_id, status='Paid').order_by(Bill.id).all()
+        # One on the first page, one on the last and one in between
+        for bill in (paid[0], paid[len(paid) // 2], paid[-1]):
+            bill.paid_date = None
+        db.session.commit()
+        paid_ids = [bill.id for bill in paid]
+        seen, cursor = [], None
+        while True:
+            page, cursor = paid_bills_page(user_id, cursor)
+            seen.extend((bill.paid_date or bill.issue_date, bill.id) for bill in page)
+            if cursor is None:
+                break
+        _, cursor = paid_bills_page(user_id)
+    assert sorted(bill_id for _, bill_id in seen) == paid_ids
+    assert seen == sorted(seen, reverse=True)
+    assert client.get(f'/billing?cursor={cursor}').status_code == 200
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from services.exchange_rates import RateProvider
+
+READERS = 16
+
+
+class StubFetch:
+    """A rate fetcher that counts its calls and, while ``gate`` is clear, blocks in them."""
+
+    def __init__(self, rates=None, error=None):
+        self.rates = rates or {'USD': 7300.0}
+        self.error = error
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set()
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        return dict(self.rates)
+
+
+def read_concurrently(provider):
+    """Call provider.get() on READERS threads at once and return what each got."""
+    start = threading.Barrier(READERS)
+    tables = []
+
+    def reader():
+        start.wait()
+        tables.append(provider.get())
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    return threads, tables
+
+
+def test_concurrent_first_reads_share_one_fetch():
+    fetch = StubFetch()
+    fetch.gate.clear()
+    provider = RateProvider(fetch, background=False)
+
+    threads, tables = read_concurrently(provider)
+    assert fetch.entered.wait(5)
+    time.sleep(0.05)  # let every reader reach the in-flight fetch
+    fetch.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert len(tables) == READERS
+    assert all(table is tables[0] for table in tables)
+    assert tables[0]['rates'] == {'USD': 7300.0}
+    assert provider.stats()['refreshes'] == 1
+
+
+def test_stale_reads_return_the_old_table_and_refresh_once_in_the_background():
+    fetch = StubFetch()
+    refreshed = []
+    provider = RateProvider(fetch, refresh_interval=60, background=False, on_refresh=refreshed.append)
+    old = provider.get()
+    provider._fetched_at -= 120
+
+    fetch.rates = {'USD': 7350.0}
+    fetch.gate.clear()
+    fetch.entered.clear()
+    threads, tables = read_concurrently(provider)
+    for thread in threads:
+        thread.join(5)
+    # Nobody waited for the slow fetch
+    assert all(table is old for table in tables)
+    assert fetch.entered.wait(5)
+
+    fetch.gate.set()
+    deadline = time.time() + 5
+    while provider.stats()['refreshing'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert fetch.calls == 2
+    assert provider.get()['rates'] == {'USD': 7350.0}
+    assert [table['rates'] for table in refreshed] == [{'USD': 7300.0}, {'USD': 7350.0}]
+    assert provider.stats()['stale_hits'] == READERS
+
+
+def test_fallback_is_served_until_a_fetch_succeeds():
+    fetch = StubFetch(error=RuntimeError('upstream down'))
+    provider = RateProvider(fetch, retry_interval=60, fallback={'USD': 7400.0}, background=False)
+
+    table = provider.get()
+    assert table['source'] == 'fallback'
+    assert table['rates'] == {'USD': 7400.0}
+    # A recent failure is not retried on every read
+    assert provider.get()['source'] == 'fallback'
+    assert fetch.calls == 1
+    assert provider.stats()['refresh_failures'] == 1
+
+    provider.retry_interval = 0
+    fetch.error = None
+    assert provider.get()['rates'] == {'USD': 7300.0}
+    assert fetch.calls == 2
+
+
+def test_a_source_picking_fetch_names_the_table():
+    provider = RateProvider(lambda: ('er-api', {'USD': 7300.0}), background=False)
+    assert provider.get()['source'] == 'er-api'
@@ -0,0 +1,71 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta
+
+import services.exports as exports
+from conftest import login
+from models import Transaction
+from services.exports import iter_export, transactions_query
+
+
+def read(response):
+    assert response.status_code == 200, response.data[:300]
+    return response.get_data()
+
+
+def test_csv_and_ndjson_hold_the_same_rows(app, tenants):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+    rows = list(csv.DictReader(io.StringIO(read(client.get('/api/exports/transactions')).decode())))
+    records = [json.loads(line) for line in read(client.get('/api/exports/transactions?format=ndjson')).splitlines()]
+
+    with app.app_context():
+        mine = Transaction.query.filter_by(user_id=owner).order_by(Transaction.date, Transaction.id).all()
+    assert [int(row['id']) for row in rows] == [record['id'] for record in records] == [t.id for t in mine]
+    assert rows[0].keys() == records[0].keys()
+    assert [record['amount'] for record in records] == [float(t.amount) for t in mine]
+    assert [row['date'] for row in rows] == [t.date.isoformat() for t in mine]
+    assert rows[0]['category'] == '' and records[0]['category'] is None
+
+
+def test_date_range_is_inclusive(app, tenants):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+    start, end = date.today() - timedelta(days=5), date.today() - timedelta(days=2)
+    body = read(client.get(f'/api/exports/transactions?format=ndjson&start_date={start}&end_date={end}'))
+    assert sorted({json.loads(line)['date'] for line in body.splitlines()}) == [
+        (start + timedelta(days=i)).isoformat() for i in range(4)
+    ]
+    # Movements stamped during the end date are part of it
+    today = datetime.utcnow().date()
+    body = read(client.get(f'/api/exports/stock-movements?format=ndjson&start_date={today}&end_date={today}'))
+    assert body and all(json.loads(line)['timestamp'].startswith(today.isoformat()) for line in body.splitlines())
+
+
+def test_gzip_round_trips(app, tenants):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+    plain = read(client.get('/api/exports/bill-items'))
+    response = client.get('/api/exports/bill-items?gzip=1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="bill-items_start_end.csv.gz"'
+    assert gzip.decompress(read(response)) == plain
+
+
+def test_output_is_flushed_in_pieces(app, tenants, monkeypatch):
+    (owner, _), _ = tenants
+    monkeypatch.setattr(exports, 'FLUSH_BYTES', 256)
+    with app.app_context():
+        query = transactions_query(owner, None, None)
+        chunks = list(iter_export(query, 'csv'))
+        assert len(chunks) > 1
+        monkeypatch.setattr(exports, 'FLUSH_BYTES', 1 << 20)
+        assert ''.join(chunks) == ''.join(iter_export(query, 'csv'))
+
+
+def test_bad_requests_are_refused(client):
+    assert client.get('/api/exports/payroll').status_code == 404
+    assert client.get('/api/exports/bills?format=xml').status_code == 400
+    assert client.get('/api/exports/bills?start_date=01-03-2026').status_code == 400
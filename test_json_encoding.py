@@ -0,0 +1,66 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+import services.json_encoding as json_encoding
+from services.json_encoding import FastJSONProvider
+
+DOCUMENT = {'amount': Decimal('19.99'), 'date': date(2026, 3, 1), 'at': datetime(2026, 3, 1, 9, 30), 'name': 'Café', 'n': 3}
+
+
+def provider(backend):
+    app = Flask(__name__)
+    app.config['JSON_BACKEND'] = backend
+    return FastJSONProvider(app)
+
+
+@pytest.mark.parametrize('backend', ['stdlib', 'auto'])
+def test_decimals_and_dates_encode_natively(backend):
+    encoded = provider(backend).dumps(DOCUMENT)
+    assert json.loads(encoded) == {'amount': 19.99, 'date': '2026-03-01', 'at': '2026-03-01T09:30:00', 'name': 'Café', 'n': 3}
+    # Sorted keys either way, as Flask's own provider does
+    assert list(json.loads(encoded)) == sorted(DOCUMENT)
+
+
+def test_stdlib_is_used_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_encoding, 'orjson', None)
+    assert provider('auto').use_orjson is False
+    with pytest.raises(RuntimeError):
+        provider('orjson')
+    with pytest.raises(ValueError):
+        provider('ujson')
+
+
+@pytest.mark.parametrize('backend', ['stdlib', 'auto'])
+def test_arrays_stream_in_chunks(backend):
+    items = [dict(DOCUMENT, n=i) for i in range(200)]
+    chunks = list(provider(backend).array_chunks(items, chunk_bytes=1024))
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks)) == json.loads(provider(backend).dumps(items))
+    assert json.loads(b''.join(provider(backend).array_chunks([]))) == []
+
+
+def test_list_endpoints_stream(client):
+    assert client.post('/api/transactions', json={
+        'type': 'INCOME', 'amount': 5, 'description': 'Sale', 'date': date.today().isoformat()
+    }).status_code == 201
+    response = client.get('/api/transactions')
+    assert response.is_streamed
+    assert response.mimetype == 'application/json'
+    assert [t['amount'] for t in response.get_json()] == [5.0]
+    assert client.get('/api/purchase-invoices').get_json() == []
+
+
+def test_single_rows_encode_like_the_lists(client):
+    created = client.post('/api/products', json={
+        'name': 'Lamp', 'category': 'General', 'buying_date': '2026-03-01', 'unit': 'unit',
+        'purchase_price': '10.10', 'sell_price': 15, 'max_stock': 10
+    }).get_json()
+    detail = client.get(f"/api/products/{created['id']}").get_json()
+    listed, = client.get('/api/products').get_json()
+    for key in listed.keys() & detail.keys():
+        assert created.get(key, detail[key]) == detail[key] == listed[key], key
+    assert (detail['purchase_price'], created['buying_date']) == (10.1, '2026-03-01')
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from prometheus_client import REGISTRY
+
+from services.metrics import timed_get
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_counted_by_endpoint_and_status(client):
+    ok = dict(blueprint='inventory', endpoint='inventory.get_products', method='GET', status='200')
+    missing = dict(blueprint='app', endpoint='unmatched', method='GET', status='404')
+    before_ok, before_missing = sample('http_requests_total', **ok), sample('http_requests_total', **missing)
+    before_latency = sample('http_request_duration_seconds_count', blueprint='inventory', endpoint='inventory.get_products', method='GET')
+
+    client.get('/api/products')
+    client.get('/no-such-page')
+
+    assert sample('http_requests_total', **ok) == before_ok + 1
+    assert sample('http_requests_total', **missing) == before_missing + 1
+    assert sample('http_request_duration_seconds_count', blueprint='inventory', endpoint='inventory.get_products', method='GET') == before_latency + 1
+    assert sample('db_statements_total', blueprint='inventory', endpoint='inventory.get_products') > 0
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_db_duration_seconds_bucket{blueprint="inventory",endpoint="inventory.get_products"' in body
+    assert 'cache_lookups_total' in body
+
+
+def test_dashboard_cache_hits_and_misses(client):
+    before = {result: sample('cache_lookups_total', cache='dashboard', result=result) for result in ('hit', 'miss')}
+    client.get('/')
+    client.get('/')
+    assert sample('cache_lookups_total', cache='dashboard', result='miss') == before['miss'] + 1
+    assert sample('cache_lookups_total', cache='dashboard', result='hit') == before['hit'] + 1
+
+
+@pytest.fixture
+def stub_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200 if self.path == '/ok' else 503)
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_outbound_calls_are_timed_per_host(stub_server):
+    counts = lambda outcome: sample('outbound_http_duration_seconds_count', host='127.0.0.1', outcome=outcome)
+    before = {outcome: counts(outcome) for outcome in ('2xx', '5xx', 'error')}
+
+    timed_get(f'{stub_server}/ok', timeout=5)
+    timed_get(f'{stub_server}/down', timeout=5)
+    with pytest.raises(Exception):
+        timed_get('http://127.0.0.1:9/', timeout=0.5)  # nothing listens on the discard port
+
+    assert counts('2xx') == before['2xx'] + 1
+    assert counts('5xx') == before['5xx'] + 1
+    assert counts('error') == before['error'] + 1
+
+
+def test_worker_processes_are_summed(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    increment = "from services.metrics import REQUESTS; REQUESTS.labels('app', 'home', 'GET', '200').inc(3)"
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', increment], cwd=ROOT, env=env, check=True)
+
+    output = subprocess.run(
+        [sys.executable, '-c', 'import sys; from services.metrics import render_metrics; sys.stdout.write(render_metrics().decode())'],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'http_requests_total{blueprint="app",endpoint="home",method="GET",status="200"} 6.0' in output
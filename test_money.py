@@ -0,0 +1,64 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import login, seed_tenant
+from models import db, Bill, Transaction
+from services.currency import RateSnapshot
+from services.money import Money, from_minor, sum_by_currency, to_minor
+
+
+def test_amounts_become_hundredths_rounded_half_up():
+    assert to_minor(Decimal('19.995')) == 2000
+    assert to_minor(Decimal('-0.005')) == -1
+    assert to_minor(0.1) == 10  # the decimal the float was written as
+    assert to_minor(7) == 700
+    assert to_minor('12.34') == 1234
+    assert from_minor(1234) == Decimal('12.34')
+
+
+def test_money_only_adds_up_within_a_currency():
+    total = sum([Money.of('0.10', 'USD')] * 3)
+    assert total == Money(30, 'USD')
+    assert total.amount == Decimal('0.30')
+    with pytest.raises(ValueError):
+        Money.of(1, 'USD') + Money.of(1, 'EUR')
+    # One rounding, half up, on conversion
+    assert Money.of('0.05', 'USD').convert(Decimal('7300.5')) == Money(36503, 'PYG')
+
+
+def test_columns_store_integers_and_sum_exactly(app, user):
+    with app.app_context():
+        db.session.add_all(Transaction(user_id=user, type='INCOME', amount=0.1, currency='USD', date=date.today())
+                           for _ in range(10))
+        db.session.commit()
+        raw = db.session.execute(db.select(db.func.typeof(Transaction.__table__.c.amount))).scalars().all()
+        assert set(raw) == {'integer'}
+        assert db.session.query(db.func.sum(Transaction.amount)).scalar() == Decimal('1.00')
+        totals = sum_by_currency(db.session, Transaction.amount, Transaction.currency, Transaction.user_id == user)
+        assert totals == {'USD': Decimal('1.00')}
+        assert RateSnapshot(lambda currency: Decimal('7300')).convert_totals(totals) == Decimal('7300.00')
+
+
+def test_api_amounts_stay_numbers(client):
+    created = client.post('/api/transactions', json={
+        'type': 'EXPENSE', 'amount': 19.99, 'description': 'Paper', 'date': date.today().isoformat()
+    })
+    assert created.status_code == 201
+    assert created.get_json()['amount'] == 19.99
+    assert [t['amount'] for t in client.get('/api/transactions').get_json()] == [19.99]
+
+
+def test_bill_total_is_rounded_once(app, user):
+    with app.app_context():
+        seeded = seed_tenant(user, bills=0, invoices=0, transactions=0)
+    client = login(app, user)
+    response = client.post('/api/bills', json={
+        'client_id': seeded['clients'][0], 'issue_date': '2026-03-01', 'due_date': '2026-03-31', 'currency': 'PYG',
+        'items': [{'product_id': product, 'quantity': 1, 'price': '0.35', 'tax_rate': '10'} for product in seeded['products'][1:4]]
+    })
+    assert response.status_code == 201
+    with app.app_context():
+        # 1.05 + 0.105 tax, rounded half up once rather than per line
+        assert db.session.get(Bill, response.get_json()['id']).total_amount == Decimal('1.16')
@@ -0,0 +1,116 @@
+import io
+import os
+import threading
+from datetime import date
+
+import pytest
+
+from conftest import login, make_user, seed_tenant
+from models import db, Bill, DocumentCounter, Product
+from services.numbering import NumberSeries
+
+WORKERS = 8
+
+
+def counter(user_id, series, period=''):
+    return db.session.get(DocumentCounter, (user_id, series, period)).next_value
+
+
+def test_numbers_are_counted_per_user_and_reset_yearly(app):
+    series = NumberSeries('bill', 'BILL-{year}-{seq:06d}', reset='yearly', block_size=3)
+    with app.app_context():
+        owner, neighbour = make_user(), make_user('neighbour')
+        assert series.take(owner, 2, on=date(2025, 12, 31)) == ['BILL-2025-000001', 'BILL-2025-000002']
+        assert series.next(owner, on=date(2026, 1, 1)) == 'BILL-2026-000001'
+        assert series.next(neighbour, on=date(2026, 1, 1)) == 'BILL-2026-000001'
+        assert series.next(owner, on=date(2025, 12, 31)) == 'BILL-2025-000003'
+        # A fourth 2025 number needs a second block
+        assert counter(owner, 'bill', '2025') == 4
+        assert series.next(owner, on=date(2025, 12, 31)) == 'BILL-2025-000004'
+        assert counter(owner, 'bill', '2025') == 7
+
+
+def test_a_yearly_reset_needs_the_year_in_the_format():
+    with pytest.raises(ValueError):
+        NumberSeries('bill', 'BILL-{seq:06d}', reset='yearly')
+    assert NumberSeries('bill', 'BILL-{seq:06d}').reset == 'never'
+
+
+def test_workers_never_hand_out_the_same_number(app, user):
+    # Each worker process has its own series object with its own blocks
+    workers = [NumberSeries('bill', 'BILL-{seq:06d}', block_size=5) for _ in range(WORKERS)]
+    start = threading.Barrier(WORKERS)
+    taken, errors = [], []
+
+    def take(series):
+        try:
+            with app.app_context():
+                start.wait()
+                numbers = [series.next(user) for _ in range(30)]
+            taken.extend(numbers)
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=take, args=(series,)) for series in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    assert len(set(taken)) == WORKERS * 30
+    with app.app_context():
+        # Blocks were claimed whole, so the counter is past every number handed out
+        assert counter(user, 'bill') > WORKERS * 30
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_workers_do_not_reuse_the_parent_block(app, user):
+    series = NumberSeries('bill', 'BILL-{seq:06d}', block_size=10)
+    with app.app_context():
+        assert series.next(user) == 'BILL-000001'
+        db.session.remove()
+        db.engine.dispose()
+
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, series.next(user).encode())
+            os._exit(0)
+        os.close(write)
+        child_number = os.read(read, 64).decode()
+        os.waitpid(pid, 0)
+        assert child_number == 'BILL-000011'
+        assert series.next(user) == 'BILL-000002'
+
+
+def test_bills_and_products_get_numbers_without_lookups(app, user):
+    with app.app_context():
+        seeded = seed_tenant(user, bills=0, invoices=0, transactions=0)
+    client = login(app, user)
+
+    for _ in range(2):
+        response = client.post('/api/bills', json={
+            'client_id': seeded['clients'][0],
+            'issue_date': '2026-03-01',
+            'due_date': '2026-03-31',
+            'items': [{'product_id': seeded['products'][1], 'quantity': 1, 'price': 10}]
+        })
+        assert response.status_code == 201
+    created = client.post('/api/products', json={
+        'name': 'Widget', 'category': 'bench', 'buying_date': '2026-03-01', 'unit': 'piece',
+        'purchase_price': 1, 'sell_price': 2, 'max_stock': 10
+    })
+    assert created.status_code == 201
+    imported = client.post('/api/products/import', data={
+        'file': (io.BytesIO(b'name,category,buying_date,unit,purchase_price,sell_price,max_stock\n'
+                            b'Bolt,bench,2026-03-01,piece,1,2,10\nNut,bench,2026-03-01,piece,1,2,10\n'), 'products.csv')
+    })
+    assert imported.status_code == 200, imported.get_json()
+
+    with app.app_context():
+        assert [number for number, in db.session.query(Bill.bill_number).order_by(Bill.id)] == [
+            'BILL-2026-000001', 'BILL-2026-000002'
+        ]
+        generated = db.session.query(Product.sku).filter(Product.sku.like('SKU-%')).order_by(Product.id)
+        assert [sku for sku, in generated] == [f'SKU-{user}-000001', f'SKU-{user}-000002', f'SKU-{user}-000003']
@@ -0,0 +1,107 @@
+import io
+import json
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from conftest import login
+from models import Product
+
+HEADER = 'sku,name,category,buying_date,unit,purchase_price,sell_price,max_stock,stock_qty\n'
+
+
+@pytest.fixture
+def tenant_sizes():
+    return {'products': 2, 'bills': 0, 'invoices': 0}, {'products': 2, 'bills': 0, 'invoices': 0}
+
+
+def upload(client, body, filename='products.csv', **query):
+    return client.post('/api/products/import', query_string=query, content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(body.encode()), filename)})
+
+
+def line(name, sku='', price='10'):
+    return f'{sku},{name},General,2026-03-01,unit,{price},15,100,5\n'
+
+
+def skus_of(app, user_id):
+    with app.app_context():
+        return {name: sku for name, sku in Product.query.filter_by(user_id=user_id).with_entities(Product.name, Product.sku)}
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(app, tenants):
+    (owner, _), (neighbour, _) = tenants
+    taken = skus_of(app, neighbour)['Product 0']
+    body = HEADER + ''.join([
+        line('Plain'),
+        line('Own SKU', sku='MY-1'),
+        line('Same SKU again', sku='MY-1'),
+        line('Taken elsewhere', sku=taken),
+        line('Bad price', price='ten'),
+        ',,General,2026-03-01,unit,1,1,1,1\n',
+        line('Bad date').replace('2026-03-01', '01/03/2026'),
+    ])
+    response = upload(login(app, owner), body)
+    assert response.status_code == 207
+    report = response.get_json()
+    assert (report['rows'], report['imported'], report['failed']) == (7, 2, 5)
+    assert [(error['row'], error['sku']) for error in report['errors']] == [
+        (4, 'MY-1'), (6, None), (7, None), (8, None), (5, taken)
+    ]
+    assert report['errors'][0]['error'] == 'Duplicate SKU in import file'
+    assert report['errors'][-1]['error'] == 'SKU already exists'
+
+    imported = skus_of(app, owner)
+    assert imported['Own SKU'] == 'MY-1'
+    assert imported['Plain'].startswith(f'SKU-{owner}-')
+
+
+def test_ndjson_lines_fail_one_at_a_time(app, tenants):
+    (owner, _), _ = tenants
+    record = {'name': 'Json', 'category': 'General', 'buying_date': '2026-03-01', 'unit': 'unit',
+              'purchase_price': 1, 'sell_price': 2, 'max_stock': 10}
+    body = '\n'.join([json.dumps(record), '{not json', '[1, 2]', '', json.dumps(dict(record, name='Json 2'))])
+    report = upload(login(app, owner), body, filename='products.ndjson').get_json()
+    assert (report['imported'], report['failed']) == (2, 2)
+    assert [error['row'] for error in report['errors']] == [2, 3]
+    assert report['errors'][1]['error'] == 'Expected a JSON object'
+
+
+def test_a_chunk_that_cannot_be_saved_fails_alone(app, tenants, monkeypatch):
+    (owner, _), _ = tenants
+    insert = Session.bulk_insert_mappings
+
+    def bulk_insert_mappings(self, mapper, mappings, *args, **kwargs):
+        if any(mapping['name'] == 'Breaks its chunk' for mapping in mappings):
+            raise IntegrityError('INSERT INTO products', {}, Exception('constraint failed'))
+        return insert(self, mapper, mappings, *args, **kwargs)
+
+    monkeypatch.setattr(Session, 'bulk_insert_mappings', bulk_insert_mappings)
+    names = ['One', 'Two', 'Three', 'Breaks its chunk', 'Five']
+    report = upload(login(app, owner), HEADER + ''.join(line(name) for name in names), chunk_size=2).get_json()
+    assert (report['chunks'], report['imported'], report['failed']) == (3, 3, 2)
+    assert [error['row'] for error in report['errors']] == [4, 5]
+    assert report['errors'][0]['error'] == 'Chunk could not be saved: IntegrityError'
+    assert {'One', 'Two', 'Five'} <= set(skus_of(app, owner))
+    assert not {'Three', 'Breaks its chunk'} & set(skus_of(app, owner))
+
+
+def test_generated_skus_pass_over_typed_ones(app, tenants):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+
+    def typed(seq):
+        return f'SKU-{owner}-{seq:06d}'
+
+    assert upload(client, HEADER + line('Typed 1', sku=typed(1)) + line('Typed 3', sku=typed(3))).get_json()['failed'] == 0
+
+    # Taken in the database (1, 3) and earlier in the same file (5)
+    report = upload(client, HEADER + line('Typed 5', sku=typed(5)) + line('Plain A') + line('Plain B')).get_json()
+    assert (report['imported'], report['failed']) == (3, 0)
+    product = {'name': 'Posted', 'category': 'General', 'buying_date': '2026-03-01', 'unit': 'unit',
+               'purchase_price': 1, 'sell_price': 2, 'max_stock': 10}
+    assert client.post('/api/products', json=product).get_json()['sku'] == typed(6)
+
+    skus = skus_of(app, owner)
+    assert (skus['Plain A'], skus['Plain B']) == (typed(2), typed(4))
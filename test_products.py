@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+
+from conftest import login
+from models import Product
+
+
+@pytest.fixture
+def tenant_sizes():
+    return {'products': 25}, {}
+
+
+def test_pages_walk_the_catalog_once(app, tenants):
+    (owner, rows), _ = tenants
+    client = login(app, owner)
+    seen, params = [], {'limit': 10, 'fields': 'id,name'}
+    while True:
+        response = client.get('/api/products', query_string=params)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 10 and set(page[0]) == {'id', 'name'}
+        seen.extend(product['id'] for product in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        params['cursor'] = cursor
+    assert sorted(seen) == sorted(rows['products'])
+    assert client.get('/api/products?cursor=nope').status_code == 400
+
+
+def test_search_takes_wildcards_literally(app, tenants):
+    (owner, _), _ = tenants
+    client = login(app, owner)
+    for name in ('100% cotton', '1000 cotton', 'under_score', 'underscore'):
+        assert client.post('/api/products', json={
+            'name': name, 'category': 'Textiles', 'buying_date': date.today().isoformat(), 'unit': 'unit',
+            'purchase_price': 1, 'sell_price': 2, 'max_stock': 10
+        }).status_code == 201
+
+    def names(q):
+        return [product['name'] for product in client.get('/api/products', query_string={'q': q}).get_json()]
+
+    assert names('0% c') == ['100% cotton']
+    assert names('under_') == ['under_score']
+    assert names('COTTON') == ['100% cotton', '1000 cotton']
+    assert names('\\') == []
+
+
+def test_stats_cover_the_whole_catalog(app, tenants):
+    (owner, _), _ = tenants
+    response = login(app, owner).get('/api/products/stats')
+    assert response.status_code == 200
+    with app.app_context():
+        products = Product.query.filter_by(user_id=owner).all()
+    stats = response.get_json()
+    assert stats == {
+        'products': len(products),
+        'low_stock': sum(p.stock_qty <= p.min_stock for p in products),
+        'stock_value': float(sum(p.purchase_price * int(p.stock_qty) for p in products)),
+        'categories': len({p.category for p in products}),
+    }
+    assert stats['low_stock'] and stats['stock_value']
@@ -0,0 +1,73 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import login
+from models import db, Payment, PurchaseInvoice
+
+
+@pytest.fixture
+def tenant_sizes():
+    return {'invoices': 4}, {'invoices': 40}
+
+
+@pytest.fixture
+def tenants(app, tenants):
+    # One invoice without payments and one paid in several instalments
+    (owner, rows), _ = tenants
+    with app.app_context():
+        unpaid, instalments = PurchaseInvoice.query.filter_by(user_id=owner).order_by(PurchaseInvoice.id).limit(2)
+        Payment.query.filter_by(purchase_invoice_id=unpaid.id).delete()
+        db.session.add_all(Payment(purchase_invoice_id=instalments.id, amount=amount, payment_date=date.today(),
+                                   payment_method='transfer') for amount in (Decimal('20.10'), Decimal('0.05')))
+        db.session.commit()
+    return tenants
+
+
+def test_balance_due_agrees_in_python_and_sql(app, tenants):
+    (owner, _), _ = tenants
+    with app.app_context():
+        invoices = PurchaseInvoice.query.filter_by(user_id=owner).all()
+        in_python = {invoice.id: invoice.balance_due for invoice in invoices}
+        in_sql = dict(db.session.query(PurchaseInvoice.id, PurchaseInvoice.balance_due).filter_by(user_id=owner))
+        fully_owed = db.session.query(PurchaseInvoice.id).filter(
+            PurchaseInvoice.user_id == owner, PurchaseInvoice.balance_due == PurchaseInvoice.total
+        ).all()
+    assert in_sql == in_python
+    assert sorted(in_python.values()) == [Decimal('129.85'), Decimal('150.00'), Decimal('150.00'), Decimal('200.00')]
+    assert all(isinstance(balance, Decimal) for balance in in_sql.values())
+    assert len(fully_owed) == 1
+
+
+def test_list_query_count_does_not_grow_with_invoices(app, tenants, capture_sql):
+    counts = []
+    for user_id, _ in tenants:
+        client = login(app, user_id)
+        with capture_sql() as statements:
+            client.get('/api/purchase-invoices').get_data()  # streamed: the query runs as it is read
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+    (owner, _), _ = tenants
+    invoices = login(app, owner).get('/api/purchase-invoices').get_json()
+    with app.app_context():
+        expected = {invoice.id: invoice.total - invoice.balance_due
+                    for invoice in PurchaseInvoice.query.filter_by(user_id=owner)}
+    assert {invoice['id']: Decimal(str(invoice['paid_amount'])) for invoice in invoices} == expected
+    assert {invoice['vendor_name'] for invoice in invoices} == {'Vendor'}
+
+
+def test_limit_pages_through_every_invoice_newest_first(app, tenants):
+    _, (neighbour, _) = tenants
+    client = login(app, neighbour)
+    seen, params = [], {'limit': 15}
+    while True:
+        response = client.get('/api/purchase-invoices', query_string=params)
+        seen.extend((invoice['date'], invoice['id']) for invoice in response.get_json())
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+    assert len(seen) == 40
+    assert seen == sorted(seen, reverse=True)
+    assert client.get('/api/purchase-invoices?limit=2&cursor=bad').status_code == 400
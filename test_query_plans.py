@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+from conftest import login
+from models import db
+
+# Read whole on purpose: the rate history is loaded into memory in one go
+FULL_READ_TABLES = {'exchange_rates'}
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS \w+)?$')
+
+PAGES = [
+    '/',
+    '/bills',
+    '/billing',
+    '/clients',
+    '/vendors',
+    '/products',
+    '/purchase-invoices',
+    '/api/products',
+    '/api/products?category=General&q=Product',
+    '/api/products/stats',
+    '/api/products/low-stock',
+    '/api/products/{product_id}/stock-movements',
+    '/api/transactions',
+    '/api/transactions/summary',
+    '/api/purchase-invoices',
+    '/api/purchase-invoices?limit=2',
+    '/bill/{bill_id}',
+    '/api/exports/transactions',
+    '/api/exports/stock-movements',
+    '/api/exports/bill-items',
+    '/api/exports/purchase-invoices',
+]
+
+
+def full_scans(statement, parameters):
+    """Tables that ``statement`` reads front to back, according to SQLite's planner."""
+    connection = db.engine.raw_connection()
+    try:
+        plan = connection.cursor().execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    finally:
+        connection.close()
+    scans = []
+    for row in plan:
+        match = FULL_SCAN.match(row[-1])
+        if match and match.group(1) not in FULL_READ_TABLES:
+            scans.append(row[-1])
+    return scans
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_page_queries_use_indexes(app, tenants, capture_sql, page):
+    owner_id, rows = tenants[0]
+    url = page.format(product_id=rows['products'][0], bill_id=rows['bills'][0])
+    client = login(app, owner_id)
+
+    with capture_sql() as captured:
+        response = client.get(url)
+        response.get_data()  # streamed bodies query as they are read
+    statements = [(statement, parameters) for statement, parameters in captured
+                  if statement.lstrip().upper().startswith('SELECT')]
+
+    assert response.status_code == 200, response.data[:500]
+    assert statements, f'{url} ran no queries'
+    with app.app_context():
+        plans = [(statement, full_scans(statement, parameters)) for statement, parameters in statements]
+    for statement, scans in plans:
+        assert not scans, f'{url} scans {scans} in:\n{statement}'
@@ -0,0 +1,84 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ExchangeRate
+from services.rate_history import RateHistory
+
+MARCH_1, MARCH_5, MARCH_9 = date(2026, 3, 1), date(2026, 3, 5), date(2026, 3, 9)
+
+
+@pytest.fixture
+def history(app):
+    with app.app_context():
+        history = RateHistory()
+        history.record_many({'USD': 7300, 'EUR': 7900}, on_date=MARCH_1, source='bcp')
+        history.record_many({'USD': 7350}, on_date=MARCH_5, source='bcp')
+        history.record_many({'USD': 7400, 'EUR': 8000}, on_date=MARCH_9, source='bcp')
+        yield history
+
+
+def index_of(history):
+    return {currency: (list(dates), list(rates)) for currency, (dates, rates) in history._index.items()}
+
+
+def test_a_date_takes_the_latest_rate_on_or_before_it(history):
+    assert history.rate_on('USD', MARCH_5) == Decimal('7350')
+    # Gaps between recorded days carry the earlier rate forward
+    assert history.rate_on('USD', date(2026, 3, 7)) == Decimal('7350')
+    assert history.rate_on('EUR', date(2026, 3, 7)) == Decimal('7900')
+    assert history.rate_on('USD', date(2026, 4, 1)) == Decimal('7400')
+    # Before the first record, the earliest rate known
+    assert history.rate_on('USD', date(2026, 1, 1)) == Decimal('7300')
+    assert history.rate_on('GBP', MARCH_5) is None
+    assert history.rate_on('PYG', MARCH_5) == Decimal('1')
+
+
+def test_recording_a_day_again_replaces_its_rate(app, history):
+    history.record_many({'USD': 7360}, on_date=MARCH_5)
+    assert history.rate_on('USD', MARCH_5) == Decimal('7360')
+    assert ExchangeRate.query.filter_by(currency='USD').count() == 3
+    # A fresh load from the table agrees with the index
+    reloaded = RateHistory()
+    reloaded.load()
+    assert index_of(reloaded) == index_of(history)
+
+
+def test_batches_convert_at_each_rows_date_and_ask_for_unknown_currencies_once(history):
+    asked = []
+
+    def fallback(currency):
+        asked.append(currency)
+        return Decimal('9200')
+
+    converted = history.convert_batch([
+        (Decimal('2'), 'USD', MARCH_1), (1, 'USD', date(2026, 3, 6)), (Decimal('5'), 'PYG', MARCH_1),
+        (1, 'GBP', MARCH_1), (2, 'GBP', MARCH_9)
+    ], fallback=fallback)
+    assert converted == [Decimal('14600'), Decimal('7350'), Decimal('5'), Decimal('9200'), Decimal('18400')]
+    assert asked == ['GBP']
+
+
+def test_a_lost_insert_race_keeps_the_index_in_step_with_the_table(app, history, monkeypatch):
+    write = RateHistory._write
+    conflicts = {'EUR': 1, 'BRL': 2}
+
+    def racing_write(self, conn, currency, *args):
+        # EUR loses the race once and is retried; BRL loses it every time
+        if conflicts.get(currency):
+            conflicts[currency] -= 1
+            raise IntegrityError('INSERT INTO exchange_rates', {}, Exception('UNIQUE constraint failed'))
+        return write(self, conn, currency, *args)
+
+    monkeypatch.setattr(RateHistory, '_write', racing_write)
+    history.record_many({'USD': 7500, 'EUR': 8100, 'BRL': 1450}, on_date=date(2026, 3, 12))
+
+    assert history.rate_on('USD', date(2026, 3, 12)) == Decimal('7500')
+    assert history.rate_on('EUR', date(2026, 3, 12)) == Decimal('8100')
+    assert history.rate_on('BRL', date(2026, 3, 12)) is None
+    assert db.session.query(ExchangeRate.currency).filter_by(date=date(2026, 3, 12)).order_by(ExchangeRate.currency).all() == [('EUR',), ('USD',)]
+    reloaded = RateHistory()
+    reloaded.load()
+    assert index_of(reloaded) == index_of(history)
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app as erp
+from services.exchange_rates import RateProvider
+from services.rate_sources import BcpSource, CircuitBreaker, ErApiSource, FirstGoodRates, RateSource, RatesUnavailable
+
+ER_API_TABLE = {'result': 'success', 'base_code': 'PYG', 'rates': {'PYG': 1, 'USD': 0.000137, 'EUR': 0.000125, 'GBP': 0.0001}}
+BCP_PAGE = b"""<html><body><table class="table">
+<tr><th>Moneda</th><th>Codigo</th><th>Compra</th><th>Venta</th></tr>
+<tr><td>Dolar</td><td>USD</td><td>7.280,00</td><td>7.310,50</td></tr>
+<tr><td>Euro</td><td>EUR</td><td>7.900,00</td><td>7.950,00</td></tr>
+</table></body></html>"""
+
+
+@pytest.fixture
+def upstream():
+    """Local stand-ins for er-api and BCP; counts requests per path and TCP connections."""
+    hits, connections = Counter(), set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_GET(self):
+            hits[self.path] += 1
+            connections.add(self.client_address)
+            if self.path == '/slow':
+                time.sleep(1.5)
+            if self.path in ('/er-api', '/slow'):
+                self.reply(200, json.dumps(ER_API_TABLE).encode())
+            elif self.path == '/er-api-error':
+                self.reply(200, json.dumps({'result': 'error', 'error-type': 'unsupported-code'}).encode())
+            elif self.path == '/bcp':
+                self.reply(200, BCP_PAGE)
+            else:
+                self.reply(500, b'down')
+
+        def reply(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    server.hits, server.connections = hits, connections
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_er_api_quotes_are_inverted_to_pyg_per_unit(upstream):
+    rates = ErApiSource(f'{upstream.url}/er-api').fetch()
+    assert rates['USD'] == pytest.approx(7299.2701)
+    assert rates['EUR'] == 8000.0
+    assert 'PYG' not in rates
+    with pytest.raises(ValueError):
+        ErApiSource(f'{upstream.url}/er-api-error').fetch()
+
+
+def test_bcp_sell_rates_are_scraped(upstream):
+    assert BcpSource(f'{upstream.url}/bcp').fetch() == {'USD': 7310.5, 'EUR': 7950.0}
+
+
+def test_the_first_good_answer_wins(upstream):
+    sources = FirstGoodRates([ErApiSource(f'{upstream.url}/slow'), BcpSource(f'{upstream.url}/bcp')])
+    started = time.perf_counter()
+    source, rates = sources()
+    assert source == 'bcp'
+    assert time.perf_counter() - started < 1.0  # did not wait for the slow source
+
+    failing_first = FirstGoodRates([BcpSource(f'{upstream.url}/down'), ErApiSource(f'{upstream.url}/er-api')])
+    assert failing_first()[0] == 'er-api'
+
+
+def test_provider_serves_fallback_when_every_source_fails(upstream):
+    provider = RateProvider(FirstGoodRates([BcpSource(f'{upstream.url}/down')]), fallback={'USD': 7400.0}, background=False)
+    table = provider.get()
+    assert table['source'] == 'fallback'
+    assert table['rates'] == {'USD': 7400.0}
+
+
+def test_a_failing_source_is_skipped_until_its_circuit_resets(upstream):
+    now = [0.0]
+    breaker = CircuitBreaker(failures=2, reset_after=30, clock=lambda: now[0])
+    source = BcpSource(f'{upstream.url}/down', breaker=breaker)
+    sources = FirstGoodRates([source])
+
+    for _ in range(2):
+        with pytest.raises(RatesUnavailable):
+            sources()
+    assert breaker.state == 'open'
+    calls = upstream.hits['/down']
+    with pytest.raises(RatesUnavailable, match='circuit open'):
+        sources()
+    assert upstream.hits['/down'] == calls  # not even tried
+
+    # After the cool-down one trial goes through; it fails, so the circuit reopens
+    now[0] = 31
+    assert breaker.state == 'half-open'
+    with pytest.raises(RatesUnavailable):
+        sources()
+    assert upstream.hits['/down'] > calls
+    assert breaker.state == 'open'
+
+    # A trial that succeeds closes it again
+    now[0] = 62
+    source.url = f'{upstream.url}/bcp'
+    assert sources()[0] == 'bcp'
+    assert breaker.state == 'closed'
+
+
+def test_a_source_reuses_its_connection(upstream):
+    source = ErApiSource(f'{upstream.url}/er-api')
+    for _ in range(3):
+        source.fetch()
+    assert upstream.hits['/er-api'] == 3
+    assert len(upstream.connections) == 1
+
+
+def test_app_converts_with_the_live_table(app, upstream, monkeypatch):
+    provider = RateProvider(FirstGoodRates([ErApiSource(f'{upstream.url}/er-api')]), background=False, source='live')
+    monkeypatch.setattr(erp, 'rate_provider', provider)
+    erp.exchange_rate_cache.cache.pop('GBP_PYG', None)
+
+    assert erp.get_exchange_rate('GBP') == Decimal('10000.0')
+    assert erp.get_exchange_rate('USD', 'EUR') == Decimal('7299.2701') / Decimal('8000.0')
+    assert provider.get()['source'] == 'er-api'
+
+
+def test_a_source_without_fetch_cannot_be_created():
+    class Incomplete(RateSource):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError, match='fetch'):
+        Incomplete()
@@ -0,0 +1,38 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask import g
+
+from app import TRANSACTION_ROWS
+from conftest import make_user, seed_tenant
+from models import db, Transaction
+
+
+def test_rows_serialize_like_the_instances(app, user):
+    with app.app_context():
+        db.session.add(Transaction(user_id=user, type='INCOME', amount=Decimal('12.30'), currency='USD', date=date(2026, 3, 1)))
+        db.session.commit()
+        db.session.remove()
+        rows = TRANSACTION_ROWS.fetch(TRANSACTION_ROWS.select().where(Transaction.user_id == user))
+        # Plain rows: nothing enters the identity map
+        assert len(db.session.identity_map) == 0
+        assert rows[0].amount == Decimal('12.30')
+        # Values stay as read; the JSON provider encodes Decimals and dates
+        assert json.loads(app.json.dumps(list(TRANSACTION_ROWS.dicts(rows)))) == [{
+            'id': rows[0].id, 'type': 'INCOME', 'amount': 12.3, 'currency': 'USD',
+            'date': '2026-03-01', 'description': None, 'status': 'CONFIRMED'
+        }]
+
+def test_rows_are_scoped_to_the_tenant(app):
+    with app.app_context():
+        owner, neighbour = make_user(), make_user('neighbour')
+        seed_tenant(owner)
+        seed_tenant(neighbour)
+    with app.test_request_context():
+        g.tenant_id = owner
+        # No explicit user_id filter: the ORM-enabled select still gets one
+        rows = TRANSACTION_ROWS.fetch(TRANSACTION_ROWS.select())
+        assert rows and {row.id for row in rows} == {
+            t.id for t in Transaction.query.filter(Transaction.user_id == owner)
+        }
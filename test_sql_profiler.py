@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import login, make_user, seed_tenant
+from services.sql_profiler import RequestProfile, sql_profiler, statement_shape
+
+
+@pytest.fixture
+def profiler():
+    sql_profiler.enabled = True
+    sql_profiler.reset()
+    yield sql_profiler
+    sql_profiler.enabled = False
+    sql_profiler.reset()
+
+
+def test_statement_shape_ignores_literals_and_in_list_length():
+    assert statement_shape('SELECT * FROM bills\n WHERE id IN (?, ?, ?) AND total > 10') == \
+        statement_shape("SELECT * FROM bills WHERE id IN (?, ?) AND total > 250")
+    assert statement_shape("SELECT * FROM client WHERE name = 'O''Brien'") == 'SELECT * FROM client WHERE name = ?'
+
+
+def test_repeated_shapes_are_flagged():
+    profile = RequestProfile()
+    for client_id in range(6):
+        profile.record(f'SELECT * FROM client WHERE client.id = {client_id}', 0.001)
+    profile.record('SELECT * FROM bills WHERE bills.user_id = ?', 0.01)
+
+    assert profile.count == 7
+    assert profile.repeated(5) == [(6, 'SELECT * FROM client WHERE client.id = ?')]
+    assert profile.slowest(1)[0][1] == 'SELECT * FROM bills WHERE bills.user_id = ?'
+
+
+def test_requests_get_server_timing_and_endpoint_totals(app, profiler):
+    with app.app_context():
+        user_id = make_user()
+        seed_tenant(user_id, clients=8, bills=16)
+    client = login(app, user_id)
+
+    response = client.get('/billing')
+    assert response.status_code == 200
+    timings = response.headers.getlist('Server-Timing')
+    assert any(timing.startswith('db;dur=') and 'queries' in timing for timing in timings)
+
+    report = client.get('/debug/sql?format=json').get_json()
+    billing = next(row for row in report if row['endpoint'] == 'billing')
+    assert billing['requests'] == 1
+    assert billing['avg_queries'] == billing['max_queries'] > 0
+    assert billing['slowest']
+
+
+def test_disabled_profiler_adds_nothing(client):
+    assert sql_profiler.enabled is False
+    response = client.get('/api/products')
+    assert 'Server-Timing' not in response.headers
+    assert client.get('/debug/sql').status_code == 404
@@ -0,0 +1,140 @@
+import threading
+from datetime import date
+
+from conftest import login, make_user, seed_tenant
+from models import db, Product, StockMovement
+from services.stock import change_stock
+
+WRITERS = 16
+
+
+def stock_of(product_id):
+    return db.session.query(Product.stock_qty).filter(Product.id == product_id).scalar()
+
+
+def run_writers(app, work):
+    """Run ``work(index)`` on WRITERS threads at once, each in its own app context."""
+    start = threading.Barrier(WRITERS)
+    errors = []
+
+    def writer(index):
+        try:
+            with app.app_context():
+                start.wait()
+                work(index)
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+
+
+def test_concurrent_sales_neither_lose_updates_nor_oversell(app, user):
+    with app.app_context():
+        product_id = seed_tenant(user, bills=0, invoices=0, transactions=0)['products'][1]
+        db.session.query(Product).filter(Product.id == product_id).update({'stock_qty': 500})
+        db.session.commit()
+
+    sold, refused = [], []
+    lock = threading.Lock()
+
+    def sell(index):
+        for _ in range(40):
+            shortfalls = change_stock({product_id: -1}, user_id=user)
+            if shortfalls:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            with lock:
+                (refused if shortfalls else sold).append(index)
+
+    # 16 writers try to sell 640 units of a product with 500 in stock
+    run_writers(app, sell)
+
+    assert len(sold) == 500
+    assert len(refused) == 140
+    with app.app_context():
+        assert stock_of(product_id) == 0
+
+
+def test_concurrent_receipts_and_sales_add_up(app, user):
+    with app.app_context():
+        product_id = seed_tenant(user, bills=0, invoices=0, transactions=0)['products'][1]
+        db.session.query(Product).filter(Product.id == product_id).update({'stock_qty': 1000})
+        db.session.commit()
+
+    def move(index):
+        # Half the writers receive, half sell, with no shortfall possible
+        delta = 3 if index % 2 else -2
+        for _ in range(25):
+            assert change_stock({product_id: delta}, user_id=user) == []
+            db.session.commit()
+
+    run_writers(app, move)
+
+    with app.app_context():
+        assert stock_of(product_id) == 1000 + 8 * 25 * 3 - 8 * 25 * 2
+
+
+def test_shortfalls_are_reported_per_line(app, user):
+    with app.app_context():
+        products = seed_tenant(user, bills=0, invoices=0, transactions=0)['products']
+        other_id = seed_tenant(make_user('neighbour'), bills=0, invoices=0, transactions=0)['products'][1]
+        plenty, scarce = products[1], products[0]  # seeded with 50 and 5 units
+
+        shortfalls = change_stock({plenty: -10, scarce: -6, other_id: -1}, user_id=user)
+        assert sorted(shortfalls, key=lambda line: line['product_id']) == sorted([
+            {'product_id': scarce, 'requested': 6.0, 'available': 5.0},
+            {'product_id': other_id, 'requested': 1.0, 'available': None},
+        ], key=lambda line: line['product_id'])
+        # Lines that could be applied were
+        assert stock_of(plenty) == 40
+        db.session.rollback()
+        assert stock_of(plenty) == 50
+
+
+def test_bill_with_a_short_line_is_refused_with_details(app, user):
+    with app.app_context():
+        seeded = seed_tenant(user, bills=0, invoices=0, transactions=0)
+        plenty, scarce = seeded['products'][1], seeded['products'][0]
+    client = login(app, user)
+
+    response = client.post('/api/bills', json={
+        'client_id': seeded['clients'][0],
+        'issue_date': date.today().isoformat(),
+        'due_date': date.today().isoformat(),
+        'items': [
+            {'product_id': plenty, 'quantity': 2, 'price': 10},
+            {'product_id': scarce, 'quantity': 3, 'price': 10},
+            {'product_id': scarce, 'quantity': 3, 'price': 10},
+        ]
+    })
+
+    assert response.status_code == 400
+    assert response.get_json()['lines'] == [
+        {'product_id': scarce, 'name': 'Product 0', 'requested': 6.0, 'available': 5.0}
+    ]
+    with app.app_context():
+        # Nothing was taken, not even for the line that had enough
+        assert stock_of(plenty) == 50
+        assert StockMovement.query.count() == 0
+
+
+def test_adjust_stock_cannot_go_negative(app, user):
+    with app.app_context():
+        scarce = seed_tenant(user, bills=0, invoices=0, transactions=0)['products'][0]
+    client = login(app, user)
+
+    refused = client.post(f'/api/products/{scarce}/adjust-stock', json={'quantity': -6, 'reason': 'count'})
+    assert refused.status_code == 400
+    applied = client.post(f'/api/products/{scarce}/adjust-stock', json={'quantity': -5, 'reason': 'count'})
+    assert applied.status_code == 201
+
+    with app.app_context():
+        assert stock_of(scarce) == 0
+        movement = StockMovement.query.filter_by(product_id=scarce).one()
+        assert movement.source_id == applied.get_json()['id']
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+
+import services.chunking as chunking
+from conftest import login
+from models import db, Product, StockMovement, StockSnapshot
+from services.stock_snapshots import stock_as_of, take_snapshots
+
+START = datetime(2026, 1, 1)
+# Opened with 10 in stock, then +5, -3 and +4 a day apart: 16 after the last
+LEDGER = [(1, 5), (2, -3), (3, 4)]
+
+
+def day(n):
+    return START + timedelta(days=n)
+
+
+def make_products(user_id, count=1):
+    products = [Product(
+        user_id=user_id, sku=f'LEDGER-{i}', name=f'Ledger {i}', category='General', buying_date=date(2026, 1, 1),
+        unit='unit', purchase_price=1, sell_price=2, stock_qty=16, max_stock=100, created_at=START
+    ) for i in range(count)]
+    db.session.add_all(products)
+    db.session.flush()
+    db.session.add_all(StockMovement(product_id=product.id, type='adjustment', quantity=quantity, timestamp=day(n))
+                       for product in products for n, quantity in LEDGER)
+    db.session.commit()
+    return [product.id for product in products]
+
+
+def test_stock_is_replayed_with_and_without_an_anchor(app, user):
+    with app.app_context():
+        product_id, = make_products(user)
+        # No snapshot yet: back from the live stock
+        assert stock_as_of([product_id], day(1.5))[product_id] == {'snapshot_at': None, 'quantity': 15, 'replayed': 2}
+        assert stock_as_of([product_id], day(0.5))[product_id]['quantity'] == 10
+
+        # Stamped with the last movement, not the clock; once per stamp
+        assert take_snapshots(product_ids=[product_id]) == 1
+        assert take_snapshots(product_ids=[product_id]) == 0
+        assert [(s.taken_at, s.quantity) for s in StockSnapshot.query.filter_by(product_id=product_id)] == [(day(3), 16)]
+
+        # Anchored on it, and back from it as a later snapshot
+        assert stock_as_of([product_id], day(4))[product_id] == {'snapshot_at': day(3), 'quantity': 16, 'replayed': 0}
+        assert stock_as_of([product_id], day(1.5))[product_id] == {'snapshot_at': day(3), 'quantity': 15, 'replayed': 2}
+
+        # Movements after the anchor are added on top
+        db.session.add(StockMovement(product_id=product_id, type='sale', quantity=-6, timestamp=day(5)))
+        db.session.query(Product).filter(Product.id == product_id).update({'stock_qty': 10})
+        db.session.commit()
+        assert stock_as_of([product_id], day(6))[product_id] == {'snapshot_at': day(3), 'quantity': 10, 'replayed': 1}
+        assert stock_as_of([product_id], day(4))[product_id]['quantity'] == 16
+
+
+def test_a_movement_committed_after_the_snapshot_is_replayed(app, user):
+    with app.app_context():
+        product_id, = make_products(user)
+        # A sale stamped before the snapshot runs but committed after it
+        stamped = datetime.utcnow()
+        take_snapshots(product_ids=[product_id])
+        db.session.add(StockMovement(product_id=product_id, type='sale', quantity=-2, timestamp=stamped))
+        db.session.query(Product).filter(Product.id == product_id).update({'stock_qty': 14})
+        db.session.commit()
+        assert stock_as_of([product_id], datetime.utcnow())[product_id]['quantity'] == 14
+
+
+def test_products_without_an_anchor_take_a_fixed_number_of_queries(app, user, capture_sql):
+    with app.app_context():
+        product_ids = make_products(user, count=6)
+        take_snapshots(product_ids=product_ids[:2])
+        counts = []
+        for count in (3, 6):
+            with capture_sql() as statements:
+                stock = stock_as_of(product_ids[:count], day(1.5))
+            counts.append(len(statements))
+            assert {product_id: row['quantity'] for product_id, row in stock.items()} == dict.fromkeys(product_ids[:count], 15)
+        assert counts[0] == counts[1]
+
+
+def test_snapshots_of_many_products_go_in_chunks(app, user, capture_sql, monkeypatch):
+    monkeypatch.setattr(chunking, 'IN_CHUNK_SIZE', 2)
+    with app.app_context():
+        product_ids = make_products(user, count=5)
+        with capture_sql() as statements:
+            assert take_snapshots(product_ids=product_ids) == 5
+    assert len([s for s, _ in statements if s.lstrip().startswith('INSERT INTO stock_snapshots')]) == 3
+
+
+def test_route_only_answers_for_the_users_products(app, user):
+    with app.app_context():
+        product_id, = make_products(user)
+    rows = login(app, user).get(f'/api/products/stock-as-of?ids={product_id},99999&at=2026-01-02').get_json()
+    assert rows == [{'product_id': product_id, 'as_of': '2026-01-02T23:59:59.999999', 'stock_qty': 15.0,
+                     'snapshot_at': None, 'movements_replayed': 2}]
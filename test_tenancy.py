@@ -0,0 +1,65 @@
+import pytest
+from flask import g
+from sqlalchemy import select
+
+from conftest import login
+from models import db, Bill, Client, Product, Vendor
+from services.tenancy import UnscopedQuery, unscoped_tables
+
+
+def test_orm_queries_in_a_request_only_see_the_users_rows(app, tenants):
+    (owner, mine), (neighbour, theirs) = tenants
+    with app.test_request_context():
+        g.tenant_id = owner
+        assert {bill.user_id for bill in Bill.query.filter_by(status='Unpaid')} == {owner}
+        assert db.session.get(Bill, theirs['bills'][0]) is None
+        assert db.session.query(Product.id).filter(Product.id.in_(theirs['products'])).all() == []
+        # Lazy loads are scoped too
+        assert db.session.get(Bill, mine['bills'][0]).client.user_id == owner
+        # Explicit opt-out for checks that must see every tenant
+        everyone = Bill.query.execution_options(all_tenants=True).count()
+        assert everyone == len(mine['bills']) + len(theirs['bills'])
+
+
+def test_a_user_cannot_pay_someone_elses_bill(app, tenants):
+    (owner, _), (neighbour, theirs) = tenants
+    response = login(app, owner).post(f"/mark_paid/{theirs['bills'][0]}", data={
+        'payment_amount': '10', 'payment_method': 'cash', 'payment_date': '2026-03-01'
+    })
+    assert response.status_code == 404
+    with app.app_context():
+        assert not db.session.get(Bill, theirs['bills'][0]).bill_payments
+
+
+def test_strict_mode_rejects_sql_without_the_tenant_filter(app, tenants):
+    owner = tenants[0][0]
+    table = Client.__table__
+    with app.test_request_context():
+        g.tenant_id = owner
+        with pytest.raises(UnscopedQuery, match='client'):
+            db.session.execute(select(table.c.id)).all()
+        assert db.session.execute(select(table.c.id).where(table.c.user_id == owner)).all()
+        assert db.session.execute(select(table.c.id).execution_options(all_tenants=True)).all()
+        db.session.rollback()
+
+
+def test_strict_mode_lets_the_unit_of_work_write_loaded_rows(app, tenants):
+    (owner, mine), _ = tenants
+    response = login(app, owner).post(f"/edit_vendor/{mine['vendor']}", data={
+        'name': 'Renamed', 'email': 'vendor@example.com'
+    })
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(Vendor, mine['vendor']).name == 'Renamed'
+
+
+def test_unscoped_tables_follow_aliases():
+    tables = {'bills', 'client'}
+    assert unscoped_tables('SELECT bills_1.id FROM bills AS bills_1 WHERE bills_1.user_id = ?', tables) == []
+    assert unscoped_tables(
+        'SELECT bills.id FROM bills JOIN client ON client.id = bills.client_id WHERE bills.user_id = ?', tables
+    ) == ['client']
+    # Selecting the column is not filtering on it
+    assert unscoped_tables('SELECT bills.id, bills.user_id FROM bills WHERE bills.id = ?', tables) == ['bills']
+    assert unscoped_tables('INSERT INTO bills (user_id) VALUES (?)', tables) == []
+    assert unscoped_tables('SELECT payments.id FROM payments', tables) == []